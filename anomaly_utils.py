@@ -0,0 +1,206 @@
+# anomaly_utils.py
+# -----------------------------------------------------------------------------
+# DETECCIÓN INCREMENTAL DE ANOMALÍAS (CONTEOS MENSUALES POR FRANJA HORARIA)
+# -----------------------------------------------------------------------------
+# Para cada combinación alcaldía × CATEGORIA × franja horaria se mantiene un
+# estado de media y varianza exponenciales (EWMA). Al cargar datos nuevos
+# (data_loader.load_data) solo se procesan los meses posteriores al último
+# ya consolidado: el historial no se recalcula. Un mes se marca como anómalo
+# si su conteo supera la media esperada en más de UMBRAL_Z desviaciones.
+#
+# El mes más reciente de cada carga puede estar incompleto: se evalúa contra
+# el estado consolidado (sus alertas son provisionales) pero no entra a la
+# media ni a la varianza; se vuelve a procesar en la siguiente carga y se
+# consolida cuando aparece un mes posterior.
+#
+# El estado y las anomalías detectadas se guardan en CACHE_DIR, por lo que la
+# página solo lee un archivo pequeño (costo constante).
+# -----------------------------------------------------------------------------
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from config import CACHE_DIR
+
+ALFA_EWMA = 0.2          # peso del mes más reciente
+UMBRAL_Z = 3.0
+MIN_EVENTOS_ANOMALIA = 5 # conteos muy bajos no generan alertas
+MESES_CALENTAMIENTO = 6  # meses de historia antes de emitir alertas
+MAX_ANOMALIAS = 5000
+
+# Franjas horarias (hora inicial incluida, hora final excluida)
+FRANJAS_HORARIAS = (
+    ("Madrugada", 0, 6),
+    ("Mañana", 6, 12),
+    ("Tarde", 12, 18),
+    ("Noche", 18, 24),
+)
+
+_LOCK = threading.Lock()
+_MEMORIA = {}   # ruta -> (mtime, estado) para no releer el archivo en cada vista
+
+
+def franja_de_hora(horas):
+    """Índice de franja (0-3) por hora; -1 si la hora no es válida."""
+    horas = np.asarray(horas, dtype=np.float64)
+    franja = np.full(horas.shape, -1, dtype=np.int64)
+    for i, (_, inicio, fin) in enumerate(FRANJAS_HORARIAS):
+        franja[(horas >= inicio) & (horas < fin)] = i
+    return franja
+
+
+def ruta_estado(fuente, cache_dir=CACHE_DIR):
+    nombre = os.path.splitext(os.path.basename(fuente))[0]
+    return os.path.join(cache_dir, f"anomalias_{nombre}.json")
+
+
+def _estado_vacio():
+    return {"etiquetas": [], "media": [], "varianza": [], "n_meses": [],
+            "ultimo_mes": None, "anomalias": [], "provisional": None}
+
+
+def cargar_estado(fuente):
+    """Estado persistido (o vacío). Se relee solo si el archivo cambió."""
+    ruta = ruta_estado(fuente)
+    try:
+        mtime = os.path.getmtime(ruta)
+    except OSError:
+        return _estado_vacio()
+    with _LOCK:
+        if ruta in _MEMORIA and _MEMORIA[ruta][0] == mtime:
+            return _MEMORIA[ruta][1]
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return _estado_vacio()
+    if "provisional" not in estado:
+        # Formato anterior: pudo consolidar un mes incompleto; se reconstruye
+        return _estado_vacio()
+    with _LOCK:
+        _MEMORIA[ruta] = (mtime, estado)
+    return estado
+
+
+def _guardar_estado(fuente, estado):
+    ruta = ruta_estado(fuente)
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def ingerir(data, fuente):
+    """
+    Actualiza el estado con los meses de 'data' posteriores al último
+    consolidado; el más reciente queda como provisional. Devuelve el número
+    de meses nuevos respecto a la carga anterior.
+    """
+    estado = cargar_estado(fuente)
+    indice_mes = data["anio_hecho"].to_numpy(np.int64) * 12 + data["mes_hecho_num"].to_numpy(np.int64) - 1
+    ultimo = estado["ultimo_mes"]
+    nuevos = np.ones(len(data), dtype=bool) if ultimo is None else indice_mes > ultimo
+    if not nuevos.any():
+        return 0
+
+    # Claves alcaldía × CATEGORIA × franja; las combinaciones nuevas se agregan al final
+    nuevos_df = data.loc[nuevos, ["alcaldia_hecho", "CATEGORIA"]]
+    franja = franja_de_hora(data["hora_hecho_h"].to_numpy()[nuevos])
+    validos = (franja >= 0) & nuevos_df.notna().all(axis=1).to_numpy()
+    if not validos.any():
+        return 0
+
+    nombres_franja = np.array([nombre for nombre, _, _ in FRANJAS_HORARIAS], dtype=object)
+    claves = (
+        nuevos_df["alcaldia_hecho"].astype(str).to_numpy(dtype=object)[validos] + "|"
+        + nuevos_df["CATEGORIA"].astype(str).to_numpy(dtype=object)[validos] + "|"
+        + nombres_franja[franja[validos]]
+    )
+    unicas, codigo = np.unique(claves.astype(str), return_inverse=True)
+
+    posicion = {clave: i for i, clave in enumerate(estado["etiquetas"])}
+    for clave in unicas:
+        if clave not in posicion:
+            posicion[clave] = len(estado["etiquetas"])
+            estado["etiquetas"].append(str(clave))
+            estado["media"].append(0.0)
+            estado["varianza"].append(0.0)
+            estado["n_meses"].append(0)
+    indice_clave = np.array([posicion[c] for c in unicas], dtype=np.int64)[codigo]
+
+    # Conteos (claves × meses nuevos) con un solo bincount
+    meses = indice_mes[nuevos][validos]
+    primero, n_meses_nuevos = meses.min(), int(meses.max() - meses.min() + 1)
+    n_claves = len(estado["etiquetas"])
+    conteos = np.bincount(
+        indice_clave * n_meses_nuevos + (meses - primero), minlength=n_claves * n_meses_nuevos
+    ).reshape(n_claves, n_meses_nuevos).astype(np.float64)
+
+    media = np.array(estado["media"])
+    varianza = np.array(estado["varianza"])
+    n_meses = np.array(estado["n_meses"], dtype=np.int64)
+    anomalias = estado["anomalias"]
+    provisionales = []
+
+    # Un paso por mes nuevo, vectorizado sobre todas las claves
+    for j in range(n_meses_nuevos):
+        x = conteos[:, j]
+        desviacion = np.sqrt(varianza)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(desviacion > 0, (x - media) / desviacion, 0.0)
+        alerta = (n_meses >= MESES_CALENTAMIENTO) & (z > UMBRAL_Z) & (x >= MIN_EVENTOS_ANOMALIA)
+        mes = int(primero + j)
+        ultimo_de_la_carga = j == n_meses_nuevos - 1
+        for k in np.flatnonzero(alerta):
+            alcaldia, categoria, franja_nombre = estado["etiquetas"][k].split("|")
+            (provisionales if ultimo_de_la_carga else anomalias).append({
+                "anio": mes // 12, "mes": mes % 12 + 1, "alcaldia": alcaldia,
+                "categoria": categoria, "franja": franja_nombre, "conteo": int(x[k]),
+                "esperado": round(float(media[k]), 1), "z": round(float(z[k]), 2),
+            })
+        if ultimo_de_la_carga:
+            # Posiblemente incompleto: no se consolida en la media ni en la varianza
+            break
+
+        # Actualización EWMA (media y varianza) de todas las claves
+        primera_vez = n_meses == 0
+        diferencia = x - media
+        media = np.where(primera_vez, x, media + ALFA_EWMA * diferencia)
+        varianza = np.where(primera_vez, 0.0, (1 - ALFA_EWMA) * (varianza + ALFA_EWMA * diferencia ** 2))
+        n_meses += 1
+
+    mas_reciente = int(primero + n_meses_nuevos - 1)
+    anterior = (estado["provisional"] or {}).get("mes", ultimo)
+    estado.update(
+        media=media.tolist(), varianza=varianza.tolist(), n_meses=n_meses.tolist(),
+        ultimo_mes=mas_reciente - 1 if n_meses_nuevos > 1 else ultimo,
+        anomalias=anomalias[-MAX_ANOMALIAS:],
+        provisional={"mes": mas_reciente, "anomalias": provisionales},
+    )
+    _guardar_estado(fuente, estado)
+    return n_meses_nuevos if anterior is None else max(mas_reciente - anterior, 0)
+
+
+def anomalias_detectadas(fuente, categorias=None, ultimos_meses=None):
+    """
+    Lista de anomalías (dicts) del estado persistido, opcionalmente filtradas
+    por categorías y limitadas a los últimos 'ultimos_meses' meses ingeridos.
+    Las del mes más reciente (aún incompleto) llevan provisional=True.
+    """
+    estado = cargar_estado(fuente)
+    provisional = estado["provisional"] or {}
+    anomalias = (
+        [dict(a, provisional=False) for a in estado["anomalias"]]
+        + [dict(a, provisional=True) for a in provisional.get("anomalias", [])]
+    )
+    if categorias is not None:
+        anomalias = [a for a in anomalias if a["categoria"] in categorias]
+    ultimo = provisional.get("mes", estado["ultimo_mes"])
+    if ultimos_meses is not None and ultimo is not None:
+        desde = ultimo - ultimos_meses + 1
+        anomalias = [a for a in anomalias if a["anio"] * 12 + a["mes"] - 1 >= desde]
+    return anomalias
@@ -108,6 +108,13 @@ def requiere_autenticacion(user_types: list = None):
         st.stop()
 
 
+def es_privilegiado() -> bool:
+    """
+    Indica si el usuario de la sesión actual es de tipo privilegiado
+    """
+    return st.session_state.get("authenticated", False) and st.session_state.get("user_type") == "privilegiado"
+
+
 def mostrar_info_usuario_sidebar():
     """
     Muestra información del usuario y botón de logout al final del sidebar
@@ -0,0 +1,264 @@
+# boundary_utils.py
+# -----------------------------------------------------------------------------
+# LÍMITES DE ALCALDÍAS MULTI-RESOLUCIÓN
+# -----------------------------------------------------------------------------
+# Precalcula versiones simplificadas de 'limite-de-las-alcaldias.json' a
+# varias tolerancias, preservando la topología compartida entre alcaldías
+# (shapely.coverage_simplify), con coordenadas cuantizadas a una rejilla y
+# guardadas en un formato binario compacto (.npz) para no volver a parsear
+# el GeoJSON. El mapa usa la versión adecuada para su nivel de zoom.
+#
+# También mantiene la copia persistente del GeoJSON de alcaldías: se sirve
+# siempre desde disco y se actualiza en segundo plano con peticiones
+# condicionales (ETag / Last-Modified) y reemplazo atómico del archivo.
+# -----------------------------------------------------------------------------
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import shapely
+
+from config import CACHE_DIR, GEOJSON_REFRESCO_SEGUNDOS
+
+# Zooms con versión precalculada; la tolerancia es medio pixel a ese zoom,
+# así que la simplificación no es visible en pantalla.
+ZOOMS_LIMITES = (9, 11, 13, 15)
+GRADOS_POR_PIXEL_Z0 = 360.0 / 256.0
+
+
+def tolerancia_para_zoom(zoom):
+    """Medio pixel (en grados) al nivel de zoom indicado."""
+    return GRADOS_POR_PIXEL_Z0 / (2 ** zoom) / 2
+
+
+def zoom_de_nivel(zoom):
+    """Nivel precalculado a usar para un zoom: el más detallado que no lo excede."""
+    candidatos = [z for z in ZOOMS_LIMITES if z <= zoom]
+    return max(candidatos) if candidatos else min(ZOOMS_LIMITES)
+
+
+def leer_geojson(path):
+    """Lee un GeoJSON y devuelve (lista de propiedades, arreglo de geometrías shapely)."""
+    with open(path, encoding="utf-8") as f:
+        geojson = json.load(f)
+    propiedades = [feature["properties"] for feature in geojson["features"]]
+    geoms = np.array([shapely.geometry.shape(feature["geometry"]) for feature in geojson["features"]], dtype=object)
+    return propiedades, geoms
+
+
+def simplificar(geoms, tolerancia):
+    """
+    Simplificación que conserva las aristas compartidas entre polígonos
+    vecinos (sin huecos ni traslapes nuevos) y cuantiza las coordenadas.
+    """
+    if tolerancia <= 0:
+        simplificadas = geoms
+    elif hasattr(shapely, "coverage_simplify"):
+        simplificadas = shapely.coverage_simplify(geoms, tolerancia)
+    else:
+        # GEOS < 3.12: simplificación por polígono (puede abrir huecos mínimos)
+        simplificadas = shapely.simplify(geoms, tolerancia, preserve_topology=True)
+    return shapely.set_precision(simplificadas, max(tolerancia / 4, 1e-6))
+
+
+# --- Formato binario compacto ---
+# Las coordenadas se guardan como enteros (coordenada / rejilla) junto con los
+# offsets de shapely.to_ragged_array; reconstruir las geometrías no requiere
+# parsear texto.
+
+def guardar_binario(path, propiedades, geoms, rejilla=1e-6):
+    """Guarda geometrías y propiedades en un .npz con coordenadas cuantizadas."""
+    tipo, coords, offsets = shapely.to_ragged_array(geoms)
+    enteros = np.round(coords / rejilla).astype(np.int32)
+    contenido = {
+        "tipo": np.array(int(tipo)),
+        "coords": enteros,
+        "rejilla": np.array(rejilla),
+        "propiedades": np.array(json.dumps(propiedades, ensure_ascii=False)),
+    }
+    for i, offset in enumerate(offsets):
+        contenido[f"offsets_{i}"] = offset
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Temporal único por proceso e hilo: varios servidores pueden reconstruir
+    # la misma caché a la vez (np.savez exige la extensión .npz)
+    temporal = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp.npz"
+    try:
+        np.savez_compressed(temporal, **contenido)
+        os.replace(temporal, path)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def cargar_binario(path):
+    """Lee un .npz de 'guardar_binario' y devuelve (propiedades, geometrías)."""
+    with np.load(path) as datos:
+        rejilla = float(datos["rejilla"])
+        decimales = max(int(np.ceil(-np.log10(rejilla))), 0)
+        coords = np.round(datos["coords"].astype(np.float64) * rejilla, decimales)
+        n_offsets = sum(1 for k in datos.files if k.startswith("offsets_"))
+        offsets = tuple(datos[f"offsets_{i}"] for i in range(n_offsets))
+        geoms = shapely.from_ragged_array(shapely.GeometryType(int(datos["tipo"])), coords, offsets)
+        propiedades = json.loads(str(datos["propiedades"]))
+    return propiedades, geoms
+
+
+def ruta_nivel(zoom, nombre="alcaldias", cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{nombre}_z{zoom}.npz")
+
+
+def precalcular_niveles(fuente, nombre="alcaldias", cache_dir=CACHE_DIR):
+    """
+    Genera las versiones simplificadas de 'fuente' (GeoJSON) para todos los
+    ZOOMS_LIMITES. Un nivel se regenera si el archivo fuente es más reciente.
+    """
+    mtime_fuente = os.path.getmtime(fuente)
+    pendientes = [
+        z for z in ZOOMS_LIMITES
+        if not os.path.exists(ruta_nivel(z, nombre, cache_dir))
+        or os.path.getmtime(ruta_nivel(z, nombre, cache_dir)) < mtime_fuente
+    ]
+    if not pendientes:
+        return
+
+    propiedades, geoms = leer_geojson(fuente)
+    for z in pendientes:
+        tolerancia = tolerancia_para_zoom(z)
+        guardar_binario(
+            ruta_nivel(z, nombre, cache_dir),
+            propiedades,
+            simplificar(geoms, tolerancia),
+            rejilla=max(tolerancia / 4, 1e-6)
+        )
+
+
+def cargar_limites(zoom, fuente="limite-de-las-alcaldias.json", nombre="alcaldias", cache_dir=CACHE_DIR):
+    """
+    Devuelve un GeoDataFrame (EPSG:4326) con la versión de los límites adecuada
+    para 'zoom', precalculándola si no existe en la caché.
+    """
+    import geopandas as gpd
+
+    precalcular_niveles(fuente, nombre, cache_dir)
+    propiedades, geoms = cargar_binario(ruta_nivel(zoom_de_nivel(zoom), nombre, cache_dir))
+    return gpd.GeoDataFrame(propiedades, geometry=list(geoms), crs="EPSG:4326")
+
+
+# --- Copia persistente del GeoJSON con actualización en segundo plano ---
+
+RUTA_GEOJSON_CACHE = os.path.join(CACHE_DIR, "limite-de-las-alcaldias.geojson")
+RUTA_META_CACHE = os.path.join(CACHE_DIR, "limite-de-las-alcaldias.meta.json")
+RUTA_BINARIO_CACHE = os.path.join(CACHE_DIR, "limite-de-las-alcaldias.npz")
+REJILLA_COMPLETA = 1e-7  # ~1 cm; cabe en int32 para coordenadas geográficas
+
+_REFRESCO_LOCK = threading.Lock()
+_REFRESCO_EN_CURSO = False
+
+
+def _leer_meta():
+    try:
+        with open(RUTA_META_CACHE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _escribir_atomico(path, contenido):
+    """Escribe en un temporal del mismo directorio y lo renombra (os.replace es atómico)."""
+    temporal = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(contenido)
+    os.replace(temporal, path)
+
+
+def asegurar_cache_local(local_backup):
+    """
+    Garantiza que exista la copia persistente del GeoJSON (sembrada desde
+    'local_backup' la primera vez) y su versión binaria. Devuelve la ruta.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if not os.path.exists(RUTA_GEOJSON_CACHE):
+        temporal = f"{RUTA_GEOJSON_CACHE}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        shutil.copyfile(local_backup, temporal)
+        os.replace(temporal, RUTA_GEOJSON_CACHE)
+
+    if (not os.path.exists(RUTA_BINARIO_CACHE)
+            or os.path.getmtime(RUTA_BINARIO_CACHE) < os.path.getmtime(RUTA_GEOJSON_CACHE)):
+        propiedades, geoms = leer_geojson(RUTA_GEOJSON_CACHE)
+        guardar_binario(RUTA_BINARIO_CACHE, propiedades, geoms, rejilla=REJILLA_COMPLETA)
+    return RUTA_GEOJSON_CACHE
+
+
+def cargar_geojson_cache():
+    """GeoDataFrame completo desde la versión binaria (sin parsear JSON)."""
+    import geopandas as gpd
+
+    propiedades, geoms = cargar_binario(RUTA_BINARIO_CACHE)
+    return gpd.GeoDataFrame(propiedades, geometry=list(geoms), crs="EPSG:4326")
+
+
+def _refrescar(url, timeout):
+    """Petición condicional; si hay una versión nueva y válida, la instala."""
+    import requests
+
+    meta = _leer_meta()
+    encabezados = {}
+    if meta.get("etag"):
+        encabezados["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        encabezados["If-Modified-Since"] = meta["last_modified"]
+
+    meta["ultimo_intento"] = time.time()
+    try:
+        respuesta = requests.get(url, headers=encabezados, timeout=timeout)
+        if respuesta.status_code == 200:
+            contenido = respuesta.content
+            # Validar antes de reemplazar: debe ser una FeatureCollection con geometrías
+            geojson = json.loads(contenido)
+            if not geojson.get("features"):
+                raise ValueError("GeoJSON sin 'features'")
+            _escribir_atomico(RUTA_GEOJSON_CACHE, contenido)
+            propiedades, geoms = leer_geojson(RUTA_GEOJSON_CACHE)
+            guardar_binario(RUTA_BINARIO_CACHE, propiedades, geoms, rejilla=REJILLA_COMPLETA)
+            meta["etag"] = respuesta.headers.get("ETag")
+            meta["last_modified"] = respuesta.headers.get("Last-Modified")
+            meta["actualizado"] = time.time()
+        elif respuesta.status_code != 304:
+            meta["ultimo_error"] = f"HTTP {respuesta.status_code}"
+    except Exception as e:
+        meta["ultimo_error"] = str(e)
+    finally:
+        _escribir_atomico(RUTA_META_CACHE, json.dumps(meta).encode("utf-8"))
+
+
+def refrescar_en_segundo_plano(url, intervalo=GEOJSON_REFRESCO_SEGUNDOS, timeout=30):
+    """
+    Lanza (sin bloquear) la actualización del GeoJSON si pasó 'intervalo'
+    desde el último intento. Devuelve True si se inició un hilo.
+    """
+    global _REFRESCO_EN_CURSO
+    if intervalo is None or intervalo <= 0:
+        return False
+    if time.time() - _leer_meta().get("ultimo_intento", 0) < intervalo:
+        return False
+
+    with _REFRESCO_LOCK:
+        if _REFRESCO_EN_CURSO:
+            return False
+        _REFRESCO_EN_CURSO = True
+
+    def _tarea():
+        global _REFRESCO_EN_CURSO
+        try:
+            _refrescar(url, timeout)
+        finally:
+            with _REFRESCO_LOCK:
+                _REFRESCO_EN_CURSO = False
+
+    threading.Thread(target=_tarea, name="refresco-geojson", daemon=True).start()
+    return True
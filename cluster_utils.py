@@ -0,0 +1,140 @@
+# cluster_utils.py
+# -----------------------------------------------------------------------------
+# CLUSTERING GEOESPACIAL (ZONAS CRÍTICAS)
+# -----------------------------------------------------------------------------
+# Agrupamiento por densidad tipo DBSCAN acelerado con rejilla: en lugar de
+# comparar cada par de eventos (O(n²)), los eventos se cuentan en celdas de
+# lado 'radio_m'. Una celda es "núcleo" si su vecindario 3x3 reúne al menos
+# 'min_eventos'; las celdas núcleo contiguas forman un cluster
+# (scipy.ndimage.label) y las celdas vecinas a un núcleo se suman como borde.
+# El costo es lineal en el número de eventos.
+#
+# Sin 'min_eventos' explícito, el umbral se adapta a los datos filtrados: el
+# percentil PERCENTIL_NUCLEO de los conteos de vecindario.
+# -----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+import shapely
+import streamlit as st
+from scipy import ndimage
+
+from kde_utils import EXTENSION_CDMX
+
+METROS_POR_GRADO = 111320.0
+RADIO_CLUSTER_M = 200
+MIN_EVENTOS_CLUSTER = None   # None = umbral automático
+PERCENTIL_NUCLEO = 95
+VECINDARIO = np.ones((3, 3), dtype=np.int64)
+
+
+def etiquetar_clusters(lat, lon, radio_m=RADIO_CLUSTER_M, min_eventos=MIN_EVENTOS_CLUSTER,
+                       extension=EXTENSION_CDMX):
+    """
+    Devuelve (etiquetas, rejilla) donde etiquetas[i] es el cluster del evento
+    i (1..k, 0 = ruido) y 'rejilla' describe las celdas para construir polígonos.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+
+    # Rejilla FIJA sobre la CDMX (como hotspot_utils.rejilla_cdmx): un punto
+    # atípico no la agranda. Proyección equirectangular local con celdas
+    # cuadradas de 'radio_m' metros; los eventos fuera de la extensión son ruido.
+    oeste, sur, este, norte = extension
+    paso_lat = radio_m / METROS_POR_GRADO
+    paso_lon = radio_m / (METROS_POR_GRADO * np.cos(np.radians((sur + norte) / 2)))
+    n_filas = int(np.ceil((norte - sur) / paso_lat))
+    n_cols = int(np.ceil((este - oeste) / paso_lon))
+    fila = np.floor((lat - sur) / paso_lat)
+    col = np.floor((lon - oeste) / paso_lon)
+    dentro = (fila >= 0) & (fila < n_filas) & (col >= 0) & (col < n_cols)
+    if not dentro.any():
+        return np.zeros(lat.size, dtype=np.int32), None
+    fila, col = fila[dentro].astype(np.int64), col[dentro].astype(np.int64)
+
+    conteos = np.bincount(fila * n_cols + col, minlength=n_filas * n_cols).reshape(n_filas, n_cols)
+    vecindario = ndimage.convolve(conteos, VECINDARIO, mode="constant")
+    if min_eventos is None:
+        min_eventos = max(np.percentile(vecindario[conteos > 0], PERCENTIL_NUCLEO), 3)
+    nucleo = (vecindario >= min_eventos) & (conteos > 0)
+
+    etiquetas_celda, _ = ndimage.label(nucleo, structure=np.ones((3, 3)))
+    # Bordes: celdas no núcleo con eventos que tocan un núcleo toman su etiqueta
+    borde = ndimage.maximum_filter(etiquetas_celda, size=3, mode="constant")
+    etiquetas_celda = np.where(nucleo, etiquetas_celda, np.where(conteos > 0, borde, 0))
+
+    rejilla = {
+        "etiquetas": etiquetas_celda, "sur": sur, "oeste": oeste,
+        "paso_lat": paso_lat, "paso_lon": paso_lon,
+    }
+    etiquetas = np.zeros(lat.size, dtype=np.int32)
+    etiquetas[dentro] = etiquetas_celda[fila, col]
+    return etiquetas, rejilla
+
+
+def poligonos_clusters(rejilla, etiquetas_unicas):
+    """Polígono de cada cluster: unión de sus celdas (sigue la forma real, no el casco convexo)."""
+    etiquetas_celda = rejilla["etiquetas"]
+    filas, cols = np.nonzero(etiquetas_celda)
+    valores = etiquetas_celda[filas, cols]
+    y0 = rejilla["sur"] + filas * rejilla["paso_lat"]
+    x0 = rejilla["oeste"] + cols * rejilla["paso_lon"]
+    cajas = shapely.box(x0, y0, x0 + rejilla["paso_lon"], y0 + rejilla["paso_lat"])
+
+    orden = np.argsort(valores, kind="stable")
+    limites = np.searchsorted(valores[orden], etiquetas_unicas, side="left")
+    finales = np.searchsorted(valores[orden], etiquetas_unicas, side="right")
+    return [
+        shapely.coverage_union_all(cajas[orden[a:b]]) if hasattr(shapely, "coverage_union_all")
+        else shapely.union_all(cajas[orden[a:b]])
+        for a, b in zip(limites, finales)
+    ]
+
+
+def resumen_clusters(df, radio_m=RADIO_CLUSTER_M, min_eventos=MIN_EVENTOS_CLUSTER, max_clusters=100):
+    """
+    Detecta los clusters de 'df' y devuelve un GeoDataFrame (EPSG:4326) con un
+    polígono y estadísticas por cluster, ordenado de mayor a menor número de eventos.
+    """
+    import geopandas as gpd
+
+    columnas = ["cluster", "eventos", "area_km2", "densidad_km2", "pct_violentos",
+                "delito_principal", "alcaldia_principal"]
+    etiquetas, rejilla = etiquetar_clusters(df["latitud"], df["longitud"], radio_m, min_eventos)
+    en_cluster = etiquetas > 0
+    if not en_cluster.any():
+        return gpd.GeoDataFrame(columns=columnas, geometry=[], crs="EPSG:4326")
+
+    miembros = df.loc[en_cluster].assign(cluster=etiquetas[en_cluster])
+    grupos = miembros.groupby("cluster", observed=True)
+    stats = pd.DataFrame({"eventos": grupos.size()})
+    if "Violento" in miembros.columns:
+        stats["pct_violentos"] = grupos["Violento"].apply(lambda s: (s == "Violento").mean() * 100)
+    else:
+        stats["pct_violentos"] = np.nan
+    stats["delito_principal"] = grupos["delito"].agg(lambda s: s.value_counts().index[0])
+    stats["alcaldia_principal"] = grupos["alcaldia_hecho"].agg(lambda s: s.value_counts().index[0])
+    stats = stats.nlargest(max_clusters, "eventos")
+
+    geometrias = poligonos_clusters(rejilla, stats.index.to_numpy())
+    resultado = gpd.GeoDataFrame(stats.reset_index(), geometry=geometrias, crs="EPSG:4326")
+    resultado["area_km2"] = resultado.to_crs(6372).area / 1e6   # EPSG:6372: cónica conforme de México
+    resultado["densidad_km2"] = resultado["eventos"] / resultado["area_km2"]
+    resultado["cluster"] = np.arange(1, len(resultado) + 1)
+    return resultado[columnas + ["geometry"]]
+
+
+@st.cache_data(show_spinner="Detectando zonas críticas...")
+def clusters_por_filtro(_data, version, categoria, anio, radio_m=RADIO_CLUSTER_M, min_eventos=MIN_EVENTOS_CLUSTER):
+    """
+    Clusters para un conjunto de filtros (categoría / año, "TODAS"/"TODOS" =
+    sin filtro). '_data' no se hashea: 'version' (data_loader.version_datos)
+    invalida la caché cuando cambian los datos.
+    """
+    mascara = np.ones(len(_data), dtype=bool)
+    if "fuera_cdmx" in _data.columns:
+        mascara &= ~_data["fuera_cdmx"].to_numpy(bool)
+    if categoria != "TODAS":
+        mascara &= (_data["CATEGORIA"] == categoria).to_numpy()
+    if anio != "TODOS":
+        mascara &= (_data["anio_hecho"] == anio).to_numpy()
+    return resumen_clusters(_data.loc[mascara], radio_m, min_eventos)
@@ -0,0 +1,118 @@
+# colonia_utils.py
+# -----------------------------------------------------------------------------
+# FILTRO Y AGREGADOS POR COLONIA (ALTA CARDINALIDAD)
+# -----------------------------------------------------------------------------
+# Con más de mil colonias, filtrar con una máscara sobre todo el DataFrame y
+# construir listas con sorted(unique()) en cada interacción es lento. Aquí se
+# construye una sola vez un índice CSR sobre los códigos de categoría
+# (alcaldía, colonia): las filas de una colonia, o de toda una alcaldía, son
+# un tramo contiguo del arreglo 'orden'. El catálogo alcaldía -> colonias y
+# los agregados por colonia se calculan en la misma pasada.
+# -----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TODAS = "TODAS"
+# Colonia de las filas sin dato: minúsculas y entre paréntesis, no coincide
+# con el catálogo (normalizado a mayúsculas); aun así se verifica en el índice
+SIN_COLONIA = "(sin colonia)"
+
+
+class IndiceColonias:
+    """
+    Índice de filas por (alcaldía, colonia). Los grupos se numeran en orden
+    alcaldía-mayor, de modo que las colonias de una alcaldía son grupos
+    consecutivos y sus filas forman un solo tramo de 'orden'.
+    """
+
+    def __init__(self, alcaldias, colonias):
+        alcaldias = pd.Series(alcaldias).astype("category")
+        colonias = pd.Series(colonias).astype("category")
+        nombres_a = [str(a) for a in alcaldias.cat.categories]
+        # Las filas sin colonia forman la colonia 'sin_colonia' de su alcaldía
+        nombres_c = [str(c) for c in colonias.cat.categories]
+        self.sin_colonia = SIN_COLONIA
+        while self.sin_colonia in nombres_c or self.sin_colonia == TODAS:
+            self.sin_colonia = f"({self.sin_colonia})"
+        nombres_c.append(self.sin_colonia)
+        codigo_a = alcaldias.cat.codes.to_numpy(np.int64)
+        codigo_c = colonias.cat.codes.to_numpy(np.int64)
+        codigo_c[codigo_c < 0] = len(nombres_c) - 1
+        validos = codigo_a >= 0
+
+        # Códigos (alcaldía, colonia) presentes -> grupo compacto 0..n_grupos-1
+        combinado = codigo_a * len(nombres_c) + codigo_c
+        presentes = np.flatnonzero(np.bincount(combinado[validos], minlength=len(nombres_a) * len(nombres_c)))
+        compacto = np.full(len(nombres_a) * len(nombres_c), -1, dtype=np.int64)
+        compacto[presentes] = np.arange(presentes.size)
+        self.grupo = np.where(validos, compacto[np.where(validos, combinado, 0)], -1)
+
+        # CSR: filas ordenadas por grupo (las filas sin alcaldía van al final)
+        clave_orden = np.where(self.grupo >= 0, self.grupo, presentes.size)
+        self.orden = np.argsort(clave_orden, kind="stable").astype(np.int64)
+        self.conteos = np.bincount(self.grupo[validos], minlength=presentes.size)
+        self.offsets = np.concatenate(([0], np.cumsum(self.conteos)))
+
+        grupo_a, grupo_c = np.divmod(presentes, len(nombres_c))
+        self.alcaldia_de_grupo = np.array(nombres_a, dtype=object)[grupo_a]
+        self.colonia_de_grupo = np.array(nombres_c, dtype=object)[grupo_c]
+        # Catálogo: alcaldía -> {colonia: grupo}, y el tramo de grupos de cada alcaldía
+        self.catalogo = {}
+        self.tramo_alcaldia = {}
+        for g, (a, c) in enumerate(zip(self.alcaldia_de_grupo, self.colonia_de_grupo)):
+            self.catalogo.setdefault(a, {})[c] = g
+            inicio, _ = self.tramo_alcaldia.get(a, (g, g))
+            self.tramo_alcaldia[a] = (inicio, g + 1)
+        self.catalogo = {a: dict(sorted(colonias_a.items())) for a, colonias_a in self.catalogo.items()}
+
+    def colonias(self, alcaldia):
+        """Nombres de las colonias de 'alcaldia', en orden alfabético."""
+        return list(self.catalogo.get(alcaldia, {}))
+
+    def filas(self, alcaldia, colonia=TODAS):
+        """Posiciones (ordenadas) de las filas de la alcaldía o de una de sus colonias."""
+        if colonia == TODAS:
+            g0, g1 = self.tramo_alcaldia.get(alcaldia, (0, 0))
+        else:
+            g0 = self.catalogo.get(alcaldia, {}).get(colonia, -1)
+            g1 = g0 + 1 if g0 >= 0 else 0
+            g0 = max(g0, 0)
+        return np.sort(self.orden[self.offsets[g0]:self.offsets[g1]])
+
+    def agregados(self, data):
+        """
+        DataFrame con una fila por colonia: total, % violentos y categoría
+        principal. Se calcula con np.bincount sobre el grupo de cada fila.
+        """
+        validos = self.grupo >= 0
+        grupo = self.grupo[validos]
+        n = self.conteos.size
+        violento = data["CATEGORIA"].astype(str).str.upper().ne("NO VIOLENTOS").to_numpy()[validos]
+        violentos = np.bincount(grupo, weights=violento, minlength=n)
+
+        categorias = data["CATEGORIA"].astype("category")
+        codigo_cat = categorias.cat.codes.to_numpy(np.int64)[validos]
+        n_cat = len(categorias.cat.categories)
+        por_categoria = np.bincount(
+            grupo[codigo_cat >= 0] * n_cat + codigo_cat[codigo_cat >= 0], minlength=n * n_cat
+        ).reshape(n, n_cat)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(self.conteos > 0, 100 * violentos / self.conteos, 0.0)
+        return pd.DataFrame({
+            "alcaldia": self.alcaldia_de_grupo,
+            "colonia": self.colonia_de_grupo,
+            "total": self.conteos,
+            "pct_violentos": pct.round(1),
+            "categoria_principal": np.array(
+                [str(c) for c in categorias.cat.categories], dtype=object
+            )[por_categoria.argmax(axis=1)],
+        })
+
+
+@st.cache_resource(max_entries=4)
+def indice_colonias(_data, clave):
+    """IndiceColonias de '_data' (uno por 'clave', la versión de los datos) y sus agregados."""
+    indice = IndiceColonias(_data["alcaldia_hecho"], _data["colonia_catalogo"])
+    return indice, indice.agregados(_data)
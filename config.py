@@ -1,5 +1,6 @@
 # ARCHIVO DE CONFIGURACIÓN CENTRAL
 # Almacena las paletas de colores oficiales (del notebook)
+import os
 
 # Paleta Pantone colores del gobierno (para líneas y barras)
 PALETA_PRINCIPAL = [
@@ -28,6 +29,17 @@ COLORES_STACK = [
     "#10312B"   # Verde muy oscuro
 ]
 
+# Clases de puntos calientes / fríos (Getis-Ord Gi*): rojos = caliente, verdes = frío
+COLORES_HOTSPOT = {
+    "Caliente 99%": "#63041C",
+    "Caliente 95%": "#9F2241",
+    "Caliente 90%": "#F07A97",
+    "No significativo": "#D0C9A3",
+    "Frío 90%": "#8FB3A6",
+    "Frío 95%": "#235B4E",
+    "Frío 99%": "#10312B"
+}
+
 # === CONFIGURACIÓN DE USUARIOS Y AUTENTICACIÓN ===
 # Contraseñas almacenadas como hash SHA256
 # Para generar un hash: hashlib.sha256("tu_contraseña".encode()).hexdigest()
@@ -38,4 +50,74 @@ USUARIOS = {
         "tipo": "privilegiado",
         "nombre_completo": "Administrador"
     }
-}
\ No newline at end of file
+}
+
+# === CACHÉ PERSISTENTE EN DISCO ===
+# Geometrías precalculadas y otros artefactos derivados
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", ".cache")
+# Cada cuánto se intenta actualizar (en segundo plano) el GeoJSON de alcaldías.
+# 0 desactiva la actualización (servidores sin internet).
+GEOJSON_REFRESCO_SEGUNDOS = int(os.environ.get("DASHBOARD_GEOJSON_REFRESCO", str(24 * 3600)))
+
+# === CONFIGURACIÓN DE TESELAS PRECALCULADAS (MAPA) ===
+# Directorio generado con: python tile_utils.py construir --datos hour_crimes_optimized.csv
+# y servidor estático local que lo expone al navegador.
+TILES_DIR = os.environ.get("DASHBOARD_TILES_DIR", "tiles")
+TILES_HOST = os.environ.get("DASHBOARD_TILES_HOST", "127.0.0.1")
+TILES_PUERTO = int(os.environ.get("DASHBOARD_TILES_PUERTO", "8765"))
+# URL con la que el NAVEGADOR alcanza el servidor de teselas
+TILES_URL_PUBLICA = os.environ.get("DASHBOARD_TILES_URL", f"http://localhost:{TILES_PUERTO}")
+
+# === DESCARGAS DE EXPORTACIÓN ===
+# Los archivos exportados se escriben por bloques en disco. Por omisión se
+# descargan con st.download_button desde la propia app. Solo si
+# DASHBOARD_EXPORT_URL está configurada (un proxy que expone el servidor de
+# descargas en un puerto accesible) el navegador los descarga de un servidor
+# HTTP local, como las teselas, sin pasar por la memoria de la app.
+EXPORT_DIR = os.environ.get("DASHBOARD_EXPORT_DIR", os.path.join(CACHE_DIR, "exportaciones"))
+EXPORT_HOST = os.environ.get("DASHBOARD_EXPORT_HOST", "127.0.0.1")
+EXPORT_PUERTO = int(os.environ.get("DASHBOARD_EXPORT_PUERTO", "8766"))
+# URL con la que el NAVEGADOR alcanza el servidor de descargas ("" = descarga en la app)
+EXPORT_URL_PUBLICA = os.environ.get("DASHBOARD_EXPORT_URL", "")
+# Tiempo que un archivo no descargado permanece disponible
+EXPORT_VIGENCIA_SEGUNDOS = int(os.environ.get("DASHBOARD_EXPORT_VIGENCIA", "3600"))
+
+# === CACHÉ DE MAPAS RENDERIZADOS (HTML) ===
+# Compartida entre sesiones del mismo proceso; se desalojan los mapas menos
+# usados recientemente al superar este tamaño.
+MAPA_HTML_CACHE_MB = int(os.environ.get("DASHBOARD_MAPA_CACHE_MB", "64"))
+
+# === PORCENTAJE DE VIOLENTOS POR HORA (COROPLÉTICO) ===
+# Vista del mapa con el % de delitos violentos por polígono para la hora (o
+# rango de horas) elegida con un slider. Los polígonos son los cuadrantes del
+# GeoJSON indicado o, si no se configura, las alcaldías.
+MAPA_VIOLENCIA_HORA = os.environ.get("DASHBOARD_MAPA_VIOLENCIA_HORA", "1") == "1"
+CUADRANTES_GEOJSON = os.environ.get("DASHBOARD_CUADRANTES_GEOJSON", "")
+
+# === INSTRUMENTACIÓN DE RENDIMIENTO ===
+# Medición de tiempos por tramo (perf_utils). Desactivada por defecto; los
+# usuarios privilegiados pueden activarla desde el panel del sidebar.
+PERF_HABILITADO = os.environ.get("DASHBOARD_PERF", "0") == "1"
+# Registro estructurado (una línea JSON por tramo medido)
+PERF_LOG = os.environ.get("DASHBOARD_PERF_LOG", os.path.join(CACHE_DIR, "perf.jsonl"))
+# Muestras recientes por tramo para los percentiles p50 / p95
+PERF_VENTANA = int(os.environ.get("DASHBOARD_PERF_VENTANA", "500"))
+
+# === CONTABILIDAD DE MEMORIA ===
+# Rastreo de asignaciones por rerun con tracemalloc (memory_utils). Desactivado
+# por defecto: vuelve más lentos los reruns; se puede activar desde la vista de
+# administración.
+MEMORIA_TRACEMALLOC = os.environ.get("DASHBOARD_TRACEMALLOC", "0") == "1"
+# Marcos de pila guardados por asignación (1 = solo la línea que asigna)
+MEMORIA_TRACEMALLOC_MARCOS = int(os.environ.get("DASHBOARD_TRACEMALLOC_MARCOS", "1"))
+# Mediciones de reruns recientes que se conservan para detectar fugas
+MEMORIA_HISTORIAL = int(os.environ.get("DASHBOARD_MEMORIA_HISTORIAL", "200"))
+# Métricas en formato de texto de Prometheus y cada cuánto se reescriben (0 = solo desde la vista)
+MEMORIA_METRICAS = os.environ.get("DASHBOARD_MEMORIA_METRICAS", os.path.join(CACHE_DIR, "metricas_memoria.prom"))
+MEMORIA_EXPORTAR_SEGUNDOS = int(os.environ.get("DASHBOARD_MEMORIA_EXPORTAR", "60"))
+
+# === DATASET COMPARTIDO ENTRE PROCESOS ===
+# Directorio con los datasets materializados por 'python shared_data.py materializar'.
+# Si se define, cada servidor abre esos archivos (mmap, solo lectura) en lugar
+# de cargar su propia copia de los CSV. Vacío = cada proceso carga sus datos.
+DATOS_COMPARTIDOS_DIR = os.environ.get("DASHBOARD_DATOS_COMPARTIDOS", "")
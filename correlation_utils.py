@@ -0,0 +1,108 @@
+# correlation_utils.py
+# -----------------------------------------------------------------------------
+# CORRELACIONES ENTRE ALCALDÍAS (PERFILES DÍA DE LA SEMANA × HORA)
+# -----------------------------------------------------------------------------
+# Cada alcaldía se describe por su perfil temporal: la proporción de sus
+# delitos en cada una de las 7 × 24 combinaciones (día, hora). La matriz de
+# perfiles se construye con un solo np.bincount y la correlación entre todas
+# las alcaldías es un producto matricial de los perfiles estandarizados. El
+# orden de filas/columnas proviene de un agrupamiento jerárquico (scipy).
+# -----------------------------------------------------------------------------
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import squareform
+
+import data_loader
+
+DIAS_SEMANA = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO"]
+HORAS_DIA = 24
+METODO_ENLACE = "average"
+TODAS = "TODAS"
+TODOS = "TODOS"
+
+
+def perfiles_temporales(data, columna="alcaldia_hecho"):
+    """
+    Matriz (n_alcaldias, 7 * 24) de conteos por (día, hora), columnas en el
+    orden día-major. Devuelve (conteos, nombres de las filas).
+    """
+    grupos = data[columna].astype("category")
+    dias = data["dia_semana"].astype("category")
+    # Los días pueden venir con o sin acentos: se mapean por nombre normalizado
+    codigo_dia = np.array(
+        [DIAS_SEMANA.index(data_loader.normalizar_nombre_alcaldia(d)) for d in dias.cat.categories], dtype=np.int64
+    )[dias.cat.codes.to_numpy()]
+    codigo_dia[dias.cat.codes.to_numpy() < 0] = -1
+    hora = data["hora_hecho_h"].to_numpy(np.float64)
+    codigo_grupo = grupos.cat.codes.to_numpy(np.int64)
+
+    validos = (codigo_grupo >= 0) & (codigo_dia >= 0) & (hora >= 0) & (hora < HORAS_DIA)
+    n_celdas = len(DIAS_SEMANA) * HORAS_DIA
+    plano = codigo_grupo[validos] * n_celdas + codigo_dia[validos] * HORAS_DIA + hora[validos].astype(np.int64)
+    conteos = np.bincount(plano, minlength=len(grupos.cat.categories) * n_celdas)
+    return conteos.reshape(-1, n_celdas), [str(c) for c in grupos.cat.categories]
+
+
+def matriz_correlacion(perfiles):
+    """Correlación de Pearson entre filas: Z Zᵀ / m con filas estandarizadas."""
+    P = np.asarray(perfiles, dtype=np.float64)
+    Z = P - P.mean(axis=1, keepdims=True)
+    norma = np.linalg.norm(Z, axis=1, keepdims=True)
+    Z = np.divide(Z, norma, out=np.zeros_like(Z), where=norma > 0)
+    return np.clip(Z @ Z.T, -1.0, 1.0)
+
+
+def orden_jerarquico(correlacion, metodo=METODO_ENLACE):
+    """Orden de hojas del agrupamiento jerárquico con distancia 1 − r."""
+    if len(correlacion) < 3:
+        return np.arange(len(correlacion))
+    distancia = 1.0 - correlacion
+    np.fill_diagonal(distancia, 0.0)
+    enlace = hierarchy.linkage(squareform(distancia, checks=False), method=metodo)
+    return hierarchy.leaves_list(hierarchy.optimal_leaf_ordering(enlace, squareform(distancia, checks=False)))
+
+
+@st.cache_data(show_spinner="Calculando correlaciones...")
+def correlaciones_alcaldias(_data, version, categoria=TODAS, anio=TODOS):
+    """
+    Correlación y distancia entre los perfiles día × hora de las alcaldías
+    para un filtro. Devuelve un dict con 'alcaldias' (ya en orden jerárquico),
+    'correlacion', 'distancia' y 'eventos' por alcaldía. '_data' no se
+    hashea: 'version' (data_loader.version_datos) invalida la caché.
+    """
+    data = _data
+    if categoria != TODAS:
+        data = data[data["CATEGORIA"] == categoria]
+    if anio != TODOS:
+        data = data[data["anio_hecho"] == anio]
+
+    conteos, alcaldias = perfiles_temporales(data)
+    eventos = conteos.sum(axis=1)
+    conservar = eventos > 0
+    conteos, eventos = conteos[conservar], eventos[conservar]
+    alcaldias = [a for a, c in zip(alcaldias, conservar) if c]
+
+    # Proporciones: compara la forma del patrón, no el volumen de cada alcaldía
+    correlacion = matriz_correlacion(conteos / eventos[:, None])
+    orden = orden_jerarquico(correlacion)
+    correlacion = correlacion[np.ix_(orden, orden)]
+    return {
+        "alcaldias": [alcaldias[i] for i in orden],
+        "correlacion": correlacion,
+        "distancia": 1.0 - correlacion,
+        "eventos": eventos[orden],
+    }
+
+
+def pares_similares(resultado, n=10):
+    """Los 'n' pares de alcaldías distintas con mayor correlación."""
+    r = resultado["correlacion"]
+    i, j = np.triu_indices(len(r), k=1)
+    mejores = np.argsort(r[i, j])[::-1][:n]
+    return pd.DataFrame({
+        "Alcaldía A": [resultado["alcaldias"][k] for k in i[mejores]],
+        "Alcaldía B": [resultado["alcaldias"][k] for k in j[mejores]],
+        "Correlación": r[i[mejores], j[mejores]].round(3),
+    })
@@ -5,6 +5,13 @@
 import pandas as pd
 import streamlit as st
 import numpy as np
+import unicodedata
+import spatial_utils
+import anomaly_utils
+import perf_utils
+import memory_utils
+import shared_data
+from config import DATOS_COMPARTIDOS_DIR
 
 
 '''
@@ -201,6 +208,62 @@ def load_data(path=None): # path se ignora, usa la URL
 # Carga 'df_streamlit.csv' y aplica una adaptación de 'categorizar'.
 # --------------------------------------------------------------------------
 
+def normalizar_nombre_alcaldia(nombre):
+    """
+    Convierte un nombre de alcaldía del GeoJSON (NOMGEO, ej. 'Álvaro Obregón')
+    al formato de 'alcaldia_hecho' en los datos (ej. 'ALVARO OBREGON').
+    """
+    if pd.isna(nombre):
+        return nombre
+    sin_acentos = unicodedata.normalize("NFKD", str(nombre))
+    sin_acentos = "".join(c for c in sin_acentos if not unicodedata.combining(c))
+    return " ".join(sin_acentos.replace(".", " ").upper().split())
+
+def agregar_alcaldia_geografica(df, local_backup="limite-de-las-alcaldias.json"):
+    """
+    Asigna a cada evento la alcaldía cuyo polígono contiene sus coordenadas.
+    Agrega 'alcaldia_geo' (categórica, mismo formato que 'alcaldia_hecho') y
+    'fuera_cdmx' (True si el punto no cae en ninguna alcaldía).
+    """
+    propiedades, indice = spatial_utils.indice_alcaldias(local_backup)
+    nombres = [normalizar_nombre_alcaldia(p["NOMGEO"]) for p in propiedades]
+    codigos = indice.asignar(df["longitud"].to_numpy(), df["latitud"].to_numpy())
+    # -1 = fuera de todos los polígonos (queda como NaN en la categórica)
+    df["alcaldia_geo"] = pd.Categorical.from_codes(codigos.astype(np.int8), categories=nombres)
+    df["fuera_cdmx"] = codigos < 0
+    return df
+
+SEMILLA_MUESTREO = 20240601
+
+def agregar_rango_muestreo(df, columna_estrato="alcaldia_hecho", semilla=SEMILLA_MUESTREO):
+    """
+    Asigna a cada evento un rango aleatorio estable 'rango_muestreo' en (0, 1),
+    uniforme DENTRO de cada alcaldía: la muestra de X% es simplemente
+    rango_muestreo < X, reproducible entre recargas y estratificada.
+    """
+    n = len(df)
+    aleatorio = np.random.default_rng(semilla).random(n)
+    if columna_estrato in df.columns:
+        estrato = pd.Categorical(df[columna_estrato]).codes.astype(np.int64)
+    else:
+        estrato = np.zeros(n, dtype=np.int64)
+
+    # Posición de cada evento dentro de su estrato según el orden aleatorio
+    orden = np.lexsort((aleatorio, estrato))
+    tamanos = np.bincount(estrato + 1)           # +1: el código -1 (NaN) es un estrato más
+    inicio = np.concatenate(([0], np.cumsum(tamanos)[:-1]))
+    posicion = np.empty(n, dtype=np.int64)
+    posicion[orden] = np.arange(n) - np.repeat(inicio, tamanos)
+
+    df["rango_muestreo"] = ((posicion + 0.5) / tamanos[estrato + 1]).astype(np.float32)
+    return df
+
+def muestra_estable(df, fraccion):
+    """Muestra reproducible del 'fraccion' de los eventos (selección por prefijo del rango)."""
+    if fraccion >= 1 or "rango_muestreo" not in df.columns:
+        return df
+    return df[df["rango_muestreo"] < fraccion]
+
 def categorizar_dummy(df):
     """
     Versión adaptada de 'categorizar' para el df_streamlit.csv.
@@ -272,6 +335,10 @@ def process_dummy_data(df):
          
     if 'hora_hecho_h' in df.columns:
         df['hora_hecho_h'] = df['hora_hecho_h'].fillna(-1).astype(int)
+
+    # Más de mil colonias: como categoría ocupa 2 bytes por fila y se indexa por código
+    if 'colonia_catalogo' in df.columns:
+        df['colonia_catalogo'] = df['colonia_catalogo'].astype('category')
     
     # Mapeo de días (por si acaso no viene en mayúsculas)
     if 'dia_semana' in df.columns:
@@ -303,6 +370,7 @@ def process_hour_crimes_data(df):
         'latitud_N': 'latitud',
         'longitud_N': 'longitud',
         'alcaldia_hecho_N': 'alcaldia_hecho',
+        'colonia_catalogo_N': 'colonia_catalogo',
         'delito_N': 'delito',
         'anio_hecho_N': 'anio_hecho',
         'mes_hecho_N': 'mes_hecho_num'
@@ -337,26 +405,53 @@ def process_hour_crimes_data(df):
     
     return df
 
-@st.cache_data
+@perf_utils.medir("load_data")
+@memory_utils.rastrear_datasets
 def load_data(path="df_streamlit.csv"):
+    """
+    Dataset procesado de 'path'. Con DATOS_COMPARTIDOS_DIR configurado se
+    adjunta, de solo lectura, la versión materializada por shared_data (la
+    misma memoria para todos los procesos); si no existe o está
+    desactualizada, se carga y procesa en este proceso.
+    """
+    if DATOS_COMPARTIDOS_DIR:
+        data = shared_data.dataset_compartido(path)
+        if data is not None:
+            return data
+    return _load_data_local(path)
+
+def version_datos(data):
+    """
+    Identificador de la versión de 'data' para las claves de caché: la versión
+    compartida adjuntada (shared_data) o la firma (tamaño, mtime) del archivo
+    del que se cargó. Cambia si el archivo fuente se actualiza.
+    """
+    return data.attrs.get("compartido") or data.attrs.get("version") or len(data)
+
+@st.cache_data
+def _load_data_local(path="df_streamlit.csv"):
     """
     Carga y procesa el dataset DUMMY 'df_streamlit.csv' o 'hour_crimes_optimized.csv'.
     Optimizado para reducir uso de memoria.
     """
+    # Firma del archivo antes de leerlo: identifica esta versión (ver version_datos)
+    firma = shared_data.firma_fuente(path)
     try:
         st.info(f"Cargando dataset local ({path})...")
         
         # Para hour_crimes_optimized.csv, solo cargar columnas necesarias
         if path == "hour_crimes_optimized.csv":
             # Definir solo las columnas que realmente necesitamos
+            # 'colonia_catalogo_N' es opcional (no todas las versiones del archivo la traen)
             usecols = [
-                'latitud_N', 'longitud_N', 'alcaldia_hecho_N', 'delito_N',
+                'latitud_N', 'longitud_N', 'alcaldia_hecho_N', 'colonia_catalogo_N', 'delito_N',
                 'anio_hecho_N', 'mes_hecho_N', 'hora', 'dia_semana', 'CATEGORIA'
             ]
             
             # Definir tipos de datos para reducir memoria
             dtype = {
                 'alcaldia_hecho_N': 'category',
+                'colonia_catalogo_N': 'category',
                 'delito_N': 'category',
                 'dia_semana': 'category',
                 'CATEGORIA': 'category',
@@ -367,7 +462,7 @@ def load_data(path="df_streamlit.csv"):
                 'longitud_N': 'float32'
             }
             
-            data = pd.read_csv(path, usecols=usecols, dtype=dtype, low_memory=False)
+            data = pd.read_csv(path, usecols=lambda c: c in usecols, dtype=dtype, low_memory=False)
             st.success(f"Datos locales cargados (optimizado): {len(data)} registros.")
         else:
             data = pd.read_csv(path, low_memory=False)
@@ -391,10 +486,24 @@ def load_data(path="df_streamlit.csv"):
         # Verificar que las columnas existan antes de dropna
         if 'latitud' in data_limpio.columns and 'longitud' in data_limpio.columns:
             data_limpio = data_limpio.dropna(subset=["latitud", "longitud"])
+            try:
+                data_limpio = agregar_alcaldia_geografica(data_limpio)
+                st.info(f"Alcaldía geográfica asignada. {int(data_limpio['fuera_cdmx'].sum())} puntos fuera de CDMX.")
+            except Exception as e:
+                st.warning(f"No se pudo asignar la alcaldía geográfica: {e}")
+            data_limpio = agregar_rango_muestreo(data_limpio)
+            try:
+                meses_nuevos = anomaly_utils.ingerir(data_limpio, path)
+                if meses_nuevos:
+                    st.info(f"Detector de anomalías actualizado con {meses_nuevos} meses nuevos.")
+            except Exception as e:
+                st.warning(f"No se pudo actualizar el detector de anomalías: {e}")
             st.success(f"Procesamiento finalizado. {len(data_limpio)} registros válidos.")
         else:
             st.warning(f"Columnas disponibles: {data_limpio.columns.tolist()}")
             st.success(f"Procesamiento finalizado. {len(data_limpio)} registros.")
+        if firma is not None:
+            data_limpio.attrs["version"] = f"{path}:{firma['tamano']}:{firma['mtime_ns']}"
     else:
         data_limpio = pd.DataFrame()
     
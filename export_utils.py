@@ -0,0 +1,192 @@
+# export_utils.py
+# -----------------------------------------------------------------------------
+# EXPORTACIÓN DE DATOS FILTRADOS (CSV / PARQUET) POR BLOQUES
+# -----------------------------------------------------------------------------
+# Nunca se construye el DataFrame filtrado completo: un generador recorre los
+# datos en bloques de filas contiguas, aplica la máscara del filtro a cada
+# bloque y lo escribe directamente en un archivo temporal. La memoria usada
+# depende del tamaño del bloque, no del tamaño de la exportación.
+#
+# El archivo queda en EXPORT_DIR bajo un token aleatorio. Por omisión la
+# página lo entrega con st.download_button; si DASHBOARD_EXPORT_URL está
+# configurada, el navegador lo descarga de un servidor HTTP local que lo envía
+# por bloques desde el disco. En ambos casos se borra al vencer su vigencia.
+# -----------------------------------------------------------------------------
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+import numpy as np
+
+from config import EXPORT_DIR, EXPORT_HOST, EXPORT_PUERTO, EXPORT_URL_PUBLICA, EXPORT_VIGENCIA_SEGUNDOS
+
+TAMANO_BLOQUE = 200_000
+TODAS = "TODAS"
+TODOS = "TODOS"
+# Columnas internas de la app que no forman parte de los datos exportados
+COLUMNAS_INTERNAS = ("rango_muestreo", "alcaldia_geo", "fuera_cdmx")
+
+FORMATOS = {
+    "CSV": {"extension": ".csv", "mime": "text/csv"},
+    "Parquet": {"extension": ".parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+
+def mascara_filtro(data, categoria=TODAS, anio=TODOS):
+    """Máscara booleana (un byte por fila) de la selección actual."""
+    mascara = np.ones(len(data), dtype=bool)
+    if categoria != TODAS:
+        mascara &= (data["CATEGORIA"] == categoria).to_numpy(dtype=bool, na_value=False)
+    if anio != TODOS:
+        mascara &= (data["anio_hecho"] == anio).to_numpy(dtype=bool, na_value=False)
+    return mascara
+
+
+def bloques_filtrados(data, mascara, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Genera DataFrames con las filas seleccionadas, bloque por bloque. Si no
+    hay ninguna, genera un solo bloque vacío (para escribir el encabezado).
+    """
+    columnas = [c for c in data.columns if c not in COLUMNAS_INTERNAS]
+    vacio = True
+    for inicio in range(0, len(data), tamano_bloque):
+        seleccion = mascara[inicio:inicio + tamano_bloque]
+        if seleccion.any():
+            vacio = False
+            yield data.iloc[inicio:inicio + tamano_bloque].loc[seleccion, columnas]
+    if vacio:
+        yield data.iloc[:0][columnas]
+
+
+def escribir_csv(bloques, destino):
+    """Escribe los bloques en 'destino' (ruta); el encabezado solo en el primero."""
+    with open(destino, "w", encoding="utf-8", newline="") as f:
+        for i, bloque in enumerate(bloques):
+            bloque.to_csv(f, index=False, header=(i == 0))
+
+
+def escribir_parquet(bloques, destino):
+    """Escribe cada bloque como un grupo de filas del mismo archivo Parquet."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloque in bloques:
+            if escritor is None:
+                tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+                escritor = pq.ParquetWriter(destino, tabla.schema, compression="snappy")
+            else:
+                tabla = pa.Table.from_pandas(bloque, schema=escritor.schema, preserve_index=False)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar(data, mascara, formato="CSV", directorio=None):
+    """Escribe la selección en un archivo temporal y devuelve su ruta."""
+    descriptor, ruta = tempfile.mkstemp(suffix=FORMATOS[formato]["extension"], prefix="exportacion_", dir=directorio)
+    os.close(descriptor)
+    try:
+        if formato == "Parquet":
+            escribir_parquet(bloques_filtrados(data, mascara), ruta)
+        else:
+            escribir_csv(bloques_filtrados(data, mascara), ruta)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return ruta
+
+
+# --- Descarga desde el servidor local ---
+
+def limpiar_vencidas(directorio=EXPORT_DIR, vigencia=EXPORT_VIGENCIA_SEGUNDOS):
+    """Borra las exportaciones que nadie descargó dentro de su vigencia."""
+    limite = time.time() - vigencia
+    try:
+        entradas = list(os.scandir(directorio))
+    except OSError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.is_dir() and entrada.stat().st_mtime < limite:
+                shutil.rmtree(entrada.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def preparar_descarga(data, nombre_archivo, categoria=TODAS, anio=TODOS, formato="CSV", directorio=EXPORT_DIR):
+    """
+    Escribe la exportación en '<directorio>/<token>/<nombre_archivo>' y
+    devuelve su ruta. El token aleatorio es la única forma de llegar al
+    archivo desde el servidor de descargas.
+    """
+    limpiar_vencidas(directorio)
+    token = uuid.uuid4().hex
+    carpeta = os.path.join(directorio, token)
+    os.makedirs(carpeta)
+    try:
+        ruta = exportar(data, mascara_filtro(data, categoria, anio), formato, carpeta)
+        destino = os.path.join(carpeta, nombre_archivo)
+        os.replace(ruta, destino)
+    except BaseException:
+        shutil.rmtree(carpeta, ignore_errors=True)
+        raise
+    return destino
+
+
+def url_descarga(ruta, base_url=EXPORT_URL_PUBLICA):
+    """URL del servidor de descargas para un archivo de 'preparar_descarga'."""
+    token = os.path.basename(os.path.dirname(ruta))
+    return f"{base_url}/{token}/{quote(os.path.basename(ruta))}"
+
+
+class _ManejadorDescargas(SimpleHTTPRequestHandler):
+    """
+    Envía un archivo exportado como adjunto. No se borra al descargarlo (una
+    vista previa del enlace lo consumiría): vence con 'limpiar_vencidas'.
+    """
+
+    def end_headers(self):
+        self.send_header("Content-Disposition", "attachment")
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def list_directory(self, path):
+        self.send_error(404)
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+_SERVIDOR = None
+_SERVIDOR_LOCK = threading.Lock()
+
+
+def iniciar_servidor_descargas(directorio=EXPORT_DIR, host=EXPORT_HOST, puerto=EXPORT_PUERTO):
+    """
+    Inicia (una sola vez por proceso) el servidor de descargas en segundo
+    plano. Si el puerto ya está ocupado se asume que otro proceso del
+    dashboard lo sirve: los archivos están en el mismo directorio.
+    """
+    global _SERVIDOR
+    with _SERVIDOR_LOCK:
+        if _SERVIDOR is not None:
+            return _SERVIDOR
+        os.makedirs(directorio, exist_ok=True)
+        manejador = functools.partial(_ManejadorDescargas, directory=os.path.abspath(directorio))
+        try:
+            _SERVIDOR = ThreadingHTTPServer((host, puerto), manejador)
+        except OSError:
+            return None
+        hilo = threading.Thread(target=_SERVIDOR.serve_forever, name="servidor-descargas", daemon=True)
+        hilo.start()
+        return _SERVIDOR
@@ -0,0 +1,203 @@
+# forecast_utils.py
+# -----------------------------------------------------------------------------
+# PRONÓSTICOS MENSUALES EN LOTE (ANÁLISIS PREDICTIVO)
+# -----------------------------------------------------------------------------
+# Todas las series mensuales alcaldía × CATEGORIA (más sus totales) se
+# guardan en un solo arreglo 2-D (series × meses). Holt-Winters aditivo se
+# ajusta a TODAS las series y a una rejilla de parámetros al mismo tiempo: el
+# único ciclo de Python recorre los meses; cada paso actualiza un arreglo
+# (series × combinaciones de parámetros). Se elige por serie la combinación
+# con menor error de un paso adelante, y entre Holt-Winters y la línea base
+# estacional, el modelo con menor error en el último año fuera de muestra.
+# Con menos de tres años de historia (dos para ajustar, uno para validar) se
+# usa solo la línea base estacional.
+# -----------------------------------------------------------------------------
+import itertools
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import data_loader
+
+PERIODO = 12
+HORIZONTE_MESES = 12
+TODAS = "TODAS"
+Z_INTERVALO = 1.96   # intervalo de 95%
+# Rejilla de parámetros (nivel, tendencia, estacionalidad) evaluada en lote
+ALFAS = (0.1, 0.3, 0.5, 0.8)
+BETAS = (0.0, 0.05, 0.2)
+GAMMAS = (0.05, 0.2, 0.4)
+
+
+def series_mensuales(data, col_a="alcaldia_hecho", col_b="CATEGORIA"):
+    """
+    Matriz Y (n_series, n_meses) de conteos mensuales por (col_a, col_b),
+    incluidos los totales (TODAS, b), (a, TODAS) y (TODAS, TODAS).
+    Devuelve (Y, etiquetas, meses) con 'meses' como pd.PeriodIndex mensual.
+    """
+    anio = data["anio_hecho"].to_numpy(np.int64)
+    mes = data["mes_hecho_num"].to_numpy(np.int64)
+    indice_mes = anio * 12 + (mes - 1)
+    primero, ultimo = indice_mes.min(), indice_mes.max()
+    n_meses = int(ultimo - primero + 1)
+
+    a = data[col_a].astype("category")
+    b = data[col_b].astype("category")
+    n_a, n_b = len(a.cat.categories), len(b.cat.categories)
+    codigo = a.cat.codes.to_numpy(np.int64) * n_b + b.cat.codes.to_numpy(np.int64)
+    validos = (a.cat.codes.to_numpy() >= 0) & (b.cat.codes.to_numpy() >= 0)
+
+    plano = codigo[validos] * n_meses + (indice_mes[validos] - primero)
+    cubo = np.bincount(plano, minlength=n_a * n_b * n_meses).reshape(n_a, n_b, n_meses)
+    # Totales como sumas del cubo (fila/columna 0 = TODAS)
+    cubo = np.concatenate([cubo.sum(axis=0, keepdims=True), cubo], axis=0)
+    cubo = np.concatenate([cubo.sum(axis=1, keepdims=True), cubo], axis=1)
+
+    nombres_a = [TODAS] + [str(x) for x in a.cat.categories]
+    nombres_b = [TODAS] + [str(x) for x in b.cat.categories]
+    etiquetas = list(itertools.product(nombres_a, nombres_b))
+    meses = pd.period_range(
+        start=pd.Period(year=int(primero // 12), month=int(primero % 12) + 1, freq="M"),
+        periods=n_meses, freq="M"
+    )
+    return cubo.reshape(-1, n_meses).astype(np.float64), etiquetas, meses
+
+
+def estacional_ingenuo(Y, horizonte=HORIZONTE_MESES, periodo=PERIODO):
+    """
+    Línea base: cada mes futuro repite el mismo mes del último ciclo observado.
+    Con menos de un ciclo de historia se repiten los meses disponibles.
+    """
+    periodo = min(periodo, Y.shape[1])
+    pasos = np.arange(horizonte)
+    return Y[:, Y.shape[1] - periodo + (pasos % periodo)]
+
+
+def holt_winters(Y, horizonte=HORIZONTE_MESES, periodo=PERIODO,
+                 alfas=ALFAS, betas=BETAS, gammas=GAMMAS):
+    """
+    Holt-Winters aditivo ajustado en lote. Devuelve (pronóstico, sigma,
+    parámetros) con pronóstico (n_series, horizonte), sigma (n_series,) el
+    error típico de un paso y parámetros (n_series, 3) = (alfa, beta, gamma).
+    """
+    n, T = Y.shape
+    if T < 2 * periodo:
+        raise ValueError(f"Se requieren al menos {2 * periodo} meses para Holt-Winters.")
+
+    combos = np.array(list(itertools.product(alfas, betas, gammas)))      # (m, 3)
+    a, b, g = (combos[:, i][None, :] for i in range(3))                    # (1, m)
+    m = combos.shape[0]
+
+    # Estado inicial a partir de los dos primeros ciclos (igual para todas las combinaciones)
+    ciclo1 = Y[:, :periodo].mean(axis=1)
+    ciclo2 = Y[:, periodo:2 * periodo].mean(axis=1)
+    nivel = np.repeat(ciclo1[:, None], m, axis=1)
+    tendencia = np.repeat(((ciclo2 - ciclo1) / periodo)[:, None], m, axis=1)
+    estacion = np.repeat((Y[:, :periodo] - ciclo1[:, None])[:, None, :], m, axis=1)   # (n, m, P)
+
+    sse = np.zeros((n, m))
+    for t in range(T):
+        s = t % periodo
+        y = Y[:, t][:, None]
+        estimado = nivel + tendencia + estacion[:, :, s]
+        if t >= periodo:   # el primer ciclo solo inicializa
+            sse += (y - estimado) ** 2
+        nivel_nuevo = a * (y - estacion[:, :, s]) + (1 - a) * (nivel + tendencia)
+        tendencia = b * (nivel_nuevo - nivel) + (1 - b) * tendencia
+        estacion[:, :, s] = g * (y - nivel_nuevo) + (1 - g) * estacion[:, :, s]
+        nivel = nivel_nuevo
+
+    mejor = sse.argmin(axis=1)
+    filas = np.arange(n)
+    pasos = np.arange(1, horizonte + 1)
+    indices_estacion = (T + pasos - 1) % periodo
+    pronostico = (
+        nivel[filas, mejor][:, None]
+        + pasos[None, :] * tendencia[filas, mejor][:, None]
+        + estacion[filas, mejor][:, indices_estacion]
+    )
+    sigma = np.sqrt(sse[filas, mejor] / (T - periodo))
+    return np.clip(pronostico, 0, None), sigma, combos[mejor]
+
+
+def pronosticos(data, horizonte=HORIZONTE_MESES):
+    """
+    Pronósticos precalculados de 'data' (el dataset que ya cargó la página);
+    se recalculan si cambia su versión (archivo local o versión compartida,
+    ver data_loader.version_datos).
+    """
+    return _pronosticos(data, horizonte, data_loader.version_datos(data))
+
+
+@st.cache_data(persist="disk", show_spinner="Calculando pronósticos...")
+def _pronosticos(_data, horizonte, version):
+    """
+    Precálculo de TODAS las series: historia, pronósticos Holt-Winters y
+    estacional ingenuo, y su error de validación (último año fuera de
+    muestra). Para cada serie se reporta el modelo con menor error, con su
+    intervalo de 95%. Se guarda en disco (st.cache_data persist) para que la
+    página abra al instante también tras reiniciar. '_data' no se hashea:
+    'version' identifica el dataset.
+    """
+    Y, etiquetas, meses = series_mensuales(_data)
+    n, T = Y.shape
+
+    # Validación: ajustar sin el último año y comparar contra lo observado
+    # (el error queda en NaN si no hay historia suficiente para ese modelo)
+    mae_hw = np.full(n, np.nan)
+    mae_ingenuo = np.full(n, np.nan)
+    if T >= 2 * PERIODO:
+        entrenamiento, prueba = Y[:, :-PERIODO], Y[:, -PERIODO:]
+        mae_ingenuo = np.abs(estacional_ingenuo(entrenamiento, horizonte=PERIODO) - prueba).mean(axis=1)
+        if T >= 3 * PERIODO:
+            validacion_hw, _, _ = holt_winters(entrenamiento, horizonte=PERIODO)
+            mae_hw = np.abs(validacion_hw - prueba).mean(axis=1)
+
+    pronostico_ingenuo = estacional_ingenuo(Y, horizonte)
+    desfase = PERIODO if T > PERIODO else 1
+    sigma_ingenuo = (
+        np.sqrt(((Y[:, desfase:] - Y[:, :-desfase]) ** 2).mean(axis=1)) if T > desfase else np.zeros(n)
+    )
+    pasos = np.arange(1, horizonte + 1)[None, :]
+    ancho = sigma_ingenuo[:, None] * np.sqrt((pasos - 1) // desfase + 1)
+    pronostico = pronostico_ingenuo
+    parametros = np.full((n, 3), np.nan)
+
+    # Holt-Winters solo donde ganó la validación (nunca en series cortas: su error es NaN)
+    usar_hw = mae_hw <= mae_ingenuo
+    if usar_hw.any():
+        pronostico_hw, sigma_hw, parametros = holt_winters(Y, horizonte)
+        ancho = np.where(usar_hw[:, None], sigma_hw[:, None] * np.sqrt(pasos), ancho)
+        pronostico = np.where(usar_hw[:, None], pronostico_hw, pronostico_ingenuo)
+    ancho = ancho * Z_INTERVALO
+
+    return {
+        "etiquetas": etiquetas,
+        "meses": meses.to_timestamp(),
+        "meses_futuros": pd.period_range(meses[-1] + 1, periods=horizonte, freq="M").to_timestamp(),
+        "historia": Y,
+        "pronostico": pronostico,
+        "inferior": np.clip(pronostico - ancho, 0, None),
+        "superior": pronostico + ancho,
+        "modelo": np.where(usar_hw, "Holt-Winters", "Estacional ingenuo"),
+        "parametros": parametros,
+        "mae_hw": mae_hw,
+        "mae_ingenuo": mae_ingenuo,
+    }
+
+
+def serie_pronostico(resultado, alcaldia=TODAS, categoria=TODAS):
+    """DataFrame largo (fecha, valor, tipo, inferior, superior) de una serie para graficar."""
+    i = resultado["etiquetas"].index((alcaldia, categoria))
+    historia = pd.DataFrame({
+        "fecha": resultado["meses"], "valor": resultado["historia"][i], "tipo": "Observado"
+    })
+    futuro = pd.DataFrame({
+        "fecha": resultado["meses_futuros"],
+        "valor": resultado["pronostico"][i],
+        "tipo": "Pronóstico",
+        "inferior": resultado["inferior"][i],
+        "superior": resultado["superior"][i],
+    })
+    return pd.concat([historia, futuro], ignore_index=True)
@@ -0,0 +1,209 @@
+# hotspot_utils.py
+# -----------------------------------------------------------------------------
+# PUNTOS CALIENTES / FRÍOS (GETIS-ORD Gi*)
+# -----------------------------------------------------------------------------
+# Los eventos se agregan en una rejilla regular sobre la CDMX o en polígonos
+# como los cuadrantes (config.CUADRANTES_GEOJSON) y la vecindad se representa con una matriz dispersa
+# (scipy.sparse) de contigüidad tipo reina que incluye a la propia unidad.
+# Gi* se calcula para todas las unidades y para todos los grupos
+# (categoría × año) a la vez: una multiplicación matriz dispersa × matriz densa.
+# -----------------------------------------------------------------------------
+import os
+
+import numpy as np
+import shapely
+import streamlit as st
+from scipy import sparse
+
+import boundary_utils
+import data_loader
+import spatial_utils
+from kde_utils import EXTENSION_CDMX
+
+METROS_POR_GRADO = 111320.0
+TAMANO_CELDA_HOTSPOT_M = 500
+# Valores críticos de z (dos colas) y su nivel de confianza
+Z_CRITICOS = ((2.576, "99%"), (1.960, "95%"), (1.645, "90%"))
+NO_SIGNIFICATIVO = "No significativo"
+TODAS = "TODAS"
+TODOS = "TODOS"
+
+
+# --- Unidades espaciales y pesos ---
+
+def rejilla_cdmx(tamano_m=TAMANO_CELDA_HOTSPOT_M, extension=EXTENSION_CDMX):
+    """
+    Rejilla regular sobre la CDMX. Solo se conservan las celdas cuyo centro
+    cae en alguna alcaldía (las celdas fuera de la ciudad sesgarían Gi*).
+    Devuelve un dict con la geometría de la rejilla y las celdas válidas.
+    """
+    oeste, sur, este, norte = extension
+    paso_lat = tamano_m / METROS_POR_GRADO
+    paso_lon = tamano_m / (METROS_POR_GRADO * np.cos(np.radians((sur + norte) / 2)))
+    n_filas = int(np.ceil((norte - sur) / paso_lat))
+    n_cols = int(np.ceil((este - oeste) / paso_lon))
+
+    filas, cols = np.divmod(np.arange(n_filas * n_cols), n_cols)
+    centro_lat = sur + (filas + 0.5) * paso_lat
+    centro_lon = oeste + (cols + 0.5) * paso_lon
+    _, indice = spatial_utils.indice_alcaldias()
+    validas = np.flatnonzero(indice.asignar(centro_lon, centro_lat) >= 0)
+
+    return {
+        "sur": sur, "oeste": oeste, "paso_lat": paso_lat, "paso_lon": paso_lon,
+        "n_filas": n_filas, "n_cols": n_cols, "validas": validas,
+    }
+
+
+def celda_de_eventos(rejilla, lat, lon):
+    """Índice compacto (0..n_validas-1) de la celda de cada evento; -1 si queda fuera."""
+    fila = np.floor((np.asarray(lat, dtype=np.float64) - rejilla["sur"]) / rejilla["paso_lat"]).astype(np.int64)
+    col = np.floor((np.asarray(lon, dtype=np.float64) - rejilla["oeste"]) / rejilla["paso_lon"]).astype(np.int64)
+    dentro = (fila >= 0) & (fila < rejilla["n_filas"]) & (col >= 0) & (col < rejilla["n_cols"])
+
+    compacto = np.full(rejilla["n_filas"] * rejilla["n_cols"], -1, dtype=np.int64)
+    compacto[rejilla["validas"]] = np.arange(rejilla["validas"].size)
+    celda = np.full(fila.size, -1, dtype=np.int64)
+    celda[dentro] = compacto[fila[dentro] * rejilla["n_cols"] + col[dentro]]
+    return celda
+
+
+def pesos_reina_rejilla(rejilla):
+    """Matriz dispersa binaria (CSR) de vecinos tipo reina entre celdas válidas, con diagonal."""
+    n_filas, n_cols, validas = rejilla["n_filas"], rejilla["n_cols"], rejilla["validas"]
+    compacto = np.full(n_filas * n_cols, -1, dtype=np.int64)
+    compacto[validas] = np.arange(validas.size)
+    filas, cols = np.divmod(validas, n_cols)
+
+    origen, destino = [], []
+    for dfila in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            f, c = filas + dfila, cols + dc
+            en_rango = (f >= 0) & (f < n_filas) & (c >= 0) & (c < n_cols)
+            vecino = np.full(validas.size, -1, dtype=np.int64)
+            vecino[en_rango] = compacto[f[en_rango] * n_cols + c[en_rango]]
+            existe = vecino >= 0
+            origen.append(np.flatnonzero(existe))
+            destino.append(vecino[existe])
+    origen, destino = np.concatenate(origen), np.concatenate(destino)
+    return sparse.csr_matrix((np.ones(origen.size), (origen, destino)), shape=(validas.size, validas.size))
+
+
+def pesos_reina_poligonos(geoms):
+    """Contigüidad tipo reina entre polígonos (comparten al menos un punto), con diagonal."""
+    geoms = np.asarray(geoms, dtype=object)
+    origen, destino = shapely.STRtree(geoms).query(geoms, predicate="intersects")
+    return sparse.csr_matrix((np.ones(origen.size), (origen, destino)), shape=(geoms.size, geoms.size))
+
+
+def geometria_celdas(rejilla):
+    """Polígonos (cajas) de las celdas válidas, en el orden compacto."""
+    filas, cols = np.divmod(rejilla["validas"], rejilla["n_cols"])
+    y0 = rejilla["sur"] + filas * rejilla["paso_lat"]
+    x0 = rejilla["oeste"] + cols * rejilla["paso_lon"]
+    return shapely.box(x0, y0, x0 + rejilla["paso_lon"], y0 + rejilla["paso_lat"])
+
+
+# --- Estadístico ---
+
+def conteos_por_grupo(unidad, grupo, n_unidades, n_grupos):
+    """Matriz (n_unidades, n_grupos) de conteos con un solo np.bincount."""
+    validos = (unidad >= 0) & (grupo >= 0)
+    plano = unidad[validos] * n_grupos + grupo[validos]
+    return np.bincount(plano, minlength=n_unidades * n_grupos).reshape(n_unidades, n_grupos).astype(np.float64)
+
+
+def gi_estrella(X, W):
+    """
+    Puntajes z de Getis-Ord Gi* para cada unidad (filas) y cada variable
+    (columnas) de X, con pesos W (dispersa, diagonal incluida):
+
+        Gi* = (Σ w_ij x_j − x̄ Σ w_ij) / (S √((n Σ w_ij² − (Σ w_ij)²) / (n − 1)))
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[:, None]
+    n = X.shape[0]
+    media = X.mean(axis=0)
+    S = np.sqrt((X ** 2).mean(axis=0) - media ** 2)
+
+    suma_w = np.asarray(W.sum(axis=1)).ravel()
+    suma_w2 = np.asarray(W.multiply(W).sum(axis=1)).ravel()
+    lag = W @ X
+
+    denominador = np.sqrt((n * suma_w2 - suma_w ** 2) / (n - 1))[:, None] * S[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (lag - suma_w[:, None] * media[None, :]) / denominador
+    return np.nan_to_num(z, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def clasificar(z):
+    """Clase de cada puntaje: 'Caliente 99%' ... 'No significativo' ... 'Frío 99%'."""
+    z = np.asarray(z)
+    clases = np.full(z.shape, NO_SIGNIFICATIVO, dtype=object)
+    for critico, nivel in reversed(Z_CRITICOS):
+        clases[z >= critico] = f"Caliente {nivel}"
+        clases[z <= -critico] = f"Frío {nivel}"
+    return clases
+
+
+# --- Lote completo (todas las categorías y años) ---
+
+@st.cache_data(show_spinner="Calculando puntos calientes (Gi*)...")
+def hotspots_lote(_data, version, tamano_m=TAMANO_CELDA_HOTSPOT_M, poligonos="", version_poligonos=None):
+    """
+    Gi* para TODAS las combinaciones categoría × año (más los totales
+    TODAS / TODOS) en un solo cálculo. Las unidades son la rejilla de
+    'tamano_m' metros o, si 'poligonos' es un GeoJSON (cuadrantes), sus
+    polígonos. '_data' no se hashea: 'version' (data_loader.version_datos) y
+    'version_poligonos' (mtime) invalidan la caché. Devuelve
+    (celdas, z, conteos, columnas): 'celdas' es un GeoDataFrame de las
+    unidades, z y conteos son (n_unidades, n_grupos) y 'columnas' lista las
+    tuplas (categoria, anio) de cada columna.
+    """
+    import geopandas as gpd
+
+    lat, lon = _data["latitud"].to_numpy(), _data["longitud"].to_numpy()
+    if poligonos:
+        _, geoms = boundary_utils.leer_geojson(poligonos)
+        unidad = spatial_utils.IndicePoligonos(geoms).asignar(lon, lat).astype(np.int64)
+        pesos = pesos_reina_poligonos(geoms)
+    else:
+        rejilla = rejilla_cdmx(tamano_m)
+        unidad = celda_de_eventos(rejilla, lat, lon)
+        pesos = pesos_reina_rejilla(rejilla)
+        geoms = geometria_celdas(rejilla)
+
+    categorias = _data["CATEGORIA"].astype("category")
+    anios = _data["anio_hecho"].astype("category")
+    n_cat, n_anio = len(categorias.cat.categories), len(anios.cat.categories)
+    grupo = categorias.cat.codes.to_numpy(np.int64) * n_anio + anios.cat.codes.to_numpy(np.int64)
+    grupo[(categorias.cat.codes.to_numpy() < 0) | (anios.cat.codes.to_numpy() < 0)] = -1
+
+    # Conteos por categoría × año; los totales son sumas (Gi* se calcula después)
+    n_celdas = len(geoms)
+    cubo = conteos_por_grupo(unidad, grupo, n_celdas, n_cat * n_anio).reshape(n_celdas, n_cat, n_anio)
+    cubo = np.concatenate([cubo.sum(axis=1, keepdims=True), cubo], axis=1)
+    cubo = np.concatenate([cubo.sum(axis=2, keepdims=True), cubo], axis=2)
+
+    nombres_cat = [TODAS] + [str(c) for c in categorias.cat.categories]
+    nombres_anio = [TODOS] + [int(a) for a in anios.cat.categories]
+    columnas = [(c, a) for c in nombres_cat for a in nombres_anio]
+
+    conteos = cubo.reshape(n_celdas, -1)
+    z = gi_estrella(conteos, pesos).astype(np.float32)
+    celdas = gpd.GeoDataFrame({"celda": np.arange(n_celdas)}, geometry=list(geoms), crs="EPSG:4326")
+    return celdas, z, conteos.astype(np.int32), columnas
+
+
+def hotspots_filtro(data, categoria=TODAS, anio=TODOS, tamano_m=TAMANO_CELDA_HOTSPOT_M, poligonos=""):
+    """
+    GeoDataFrame de unidades con 'z', 'clase' y 'eventos' para un filtro
+    (consulta al lote). 'poligonos' vacío = rejilla; si no, GeoJSON de cuadrantes.
+    """
+    version_poligonos = os.path.getmtime(poligonos) if poligonos else None
+    celdas, z, conteos, columnas = hotspots_lote(
+        data, data_loader.version_datos(data), tamano_m, poligonos, version_poligonos
+    )
+    j = columnas.index((categoria, anio))
+    return celdas.assign(eventos=conteos[:, j], z=z[:, j], clase=clasificar(z[:, j]))
@@ -0,0 +1,107 @@
+# kde_utils.py
+# -----------------------------------------------------------------------------
+# DENSIDAD DE KERNEL (KDE) EN EL SERVIDOR CON CONVOLUCIÓN FFT
+# -----------------------------------------------------------------------------
+# Los eventos se agrupan en un histograma sobre una rejilla FIJA que cubre la
+# CDMX y se convolucionan con un kernel gaussiano vía FFT. La superficie se
+# envía al navegador como una sola imagen PNG (ImageOverlay): el costo en el
+# cliente es constante y la densidad no cambia con el nivel de zoom.
+#
+# La rejilla es regular en coordenadas Web Mercator (como el mapa de Leaflet),
+# así que la imagen se alinea exactamente al estirarla entre sus esquinas.
+# -----------------------------------------------------------------------------
+import base64
+from io import BytesIO
+
+import numpy as np
+
+from tile_utils import colorear_densidad
+
+EXTENSION_CDMX = (-99.37, 19.04, -98.94, 19.60)   # oeste, sur, este, norte
+RESOLUCION_KDE_M = 100    # metros por pixel
+ANCHO_BANDA_M = 400       # desviación estándar del kernel gaussiano
+RADIO_TIERRA_M = 6378137.0
+
+
+def _mercator_y(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def _lat_de_mercator(y):
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+
+def _kernel_gaussiano(sigma_px):
+    """Kernel 2-D separable normalizado (suma 1), truncado a 4 sigmas."""
+    radio = max(int(np.ceil(4 * sigma_px)), 1)
+    eje = np.arange(-radio, radio + 1)
+    g = np.exp(-0.5 * (eje / sigma_px) ** 2)
+    g /= g.sum()
+    return np.outer(g, g)
+
+
+def _convolucion_fft(rejilla, kernel):
+    """Convolución lineal (con relleno de ceros, sin efecto de borde circular)."""
+    ky, kx = kernel.shape
+    forma = (rejilla.shape[0] + ky - 1, rejilla.shape[1] + kx - 1)
+    completa = np.fft.irfft2(np.fft.rfft2(rejilla, forma) * np.fft.rfft2(kernel, forma), forma)
+    r0, c0 = ky // 2, kx // 2
+    return completa[r0:r0 + rejilla.shape[0], c0:c0 + rejilla.shape[1]]
+
+
+def kde_rejilla(lat, lon, ancho_banda_m=ANCHO_BANDA_M, resolucion_m=RESOLUCION_KDE_M,
+                extension=EXTENSION_CDMX):
+    """
+    Superficie de densidad (eventos por km²) sobre la rejilla fija.
+    Devuelve (densidad, limites): la fila 0 es el borde norte y 'limites' es
+    [[sur, oeste], [norte, este]] para folium.
+    """
+    oeste, sur, este, norte = extension
+    # Pixeles cuadrados en Mercator: en la latitud central miden 'resolucion_m'
+    escala = np.cos(np.radians((sur + norte) / 2))
+    paso = resolucion_m / (RADIO_TIERRA_M * escala)          # radianes Mercator
+    x0, x1 = np.radians(oeste), np.radians(este)
+    y0, y1 = _mercator_y(sur), _mercator_y(norte)
+    nx = int(np.ceil((x1 - x0) / paso))
+    ny = int(np.ceil((y1 - y0) / paso))
+
+    x = np.radians(np.asarray(lon, dtype=np.float64))
+    y = _mercator_y(np.asarray(lat, dtype=np.float64))
+    col = np.floor((x - x0) / paso).astype(np.int64)
+    fila = np.floor((y1 - y) / paso).astype(np.int64)
+    dentro = (col >= 0) & (col < nx) & (fila >= 0) & (fila < ny)
+    conteos = np.bincount(fila[dentro] * nx + col[dentro], minlength=ny * nx).reshape(ny, nx)
+
+    suavizada = _convolucion_fft(conteos.astype(np.float64), _kernel_gaussiano(ancho_banda_m / resolucion_m))
+    densidad = np.clip(suavizada, 0, None) / (resolucion_m / 1000) ** 2
+
+    limites = [[float(_lat_de_mercator(y1 - ny * paso)), oeste],
+               [norte, float(np.degrees(x0 + nx * paso))]]
+    return densidad, limites
+
+
+def densidad_a_png(densidad, percentil=99.5):
+    """
+    Colorea la superficie con ESCALA_ROJOS (escala logarítmica hasta el
+    percentil indicado) y devuelve los bytes PNG.
+    """
+    from PIL import Image
+
+    positivos = densidad[densidad > 1e-6]
+    if positivos.size == 0:
+        normalizada = np.zeros_like(densidad)
+    else:
+        referencia = np.log1p(np.percentile(positivos, percentil))
+        normalizada = np.log1p(densidad) / referencia
+        normalizada[densidad <= positivos.max() * 1e-4] = 0
+
+    buffer = BytesIO()
+    Image.fromarray(colorear_densidad(normalizada), mode="RGBA").save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def kde_data_url(lat, lon, **opciones):
+    """(URL 'data:image/png;base64,...', limites) listos para folium.raster_layers.ImageOverlay."""
+    densidad, limites = kde_rejilla(lat, lon, **opciones)
+    png = densidad_a_png(densidad)
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii"), limites
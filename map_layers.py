@@ -0,0 +1,128 @@
+# map_layers.py
+# -----------------------------------------------------------------------------
+# CAPAS LEAFLET PERSONALIZADAS (FOLIUM)
+# -----------------------------------------------------------------------------
+# Elementos de folium que envían los datos al navegador como un único
+# arreglo columnar y los dibujan en JavaScript, en lugar de crear un objeto
+# de Python por evento.
+# -----------------------------------------------------------------------------
+import json
+
+import numpy as np
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from folium.plugins import MarkerCluster
+from jinja2 import Template
+
+
+def columnas_json(decimales=5, **columnas):
+    """Serializa arreglos numéricos a un objeto JSON columnar {nombre: [...]}."""
+    return json.dumps({
+        nombre: np.round(np.asarray(valores, dtype=np.float64), decimales).tolist()
+        for nombre, valores in columnas.items()
+    }, separators=(",", ":"))
+
+
+class CanvasPointLayer(JSCSSMixin, MacroElement):
+    """
+    Capa de puntos dibujada con un solo renderer <canvas> de Leaflet.
+
+    Los eventos viajan como {"lat": [...], "lon": [...]} y los marcadores se
+    crean en el navegador. Con cluster=True se agrupan con Leaflet.markercluster.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                var datos = {{ this.datos_json }};
+                var renderer = L.canvas({padding: 0.5});
+                var estilo = {{ this.estilo_json }};
+                estilo.renderer = renderer;
+                var n = datos.lat.length;
+                var marcadores = new Array(n);
+                for (var i = 0; i < n; i++) {
+                    marcadores[i] = L.circleMarker([datos.lat[i], datos.lon[i]], estilo);
+                }
+                {% if this.cluster %}
+                var capa = L.markerClusterGroup({
+                    chunkedLoading: true,
+                    disableClusteringAtZoom: {{ this.disable_clustering_at_zoom }}
+                });
+                capa.addLayers(marcadores);
+                {% else %}
+                var capa = L.featureGroup(marcadores);
+                {% endif %}
+                return capa.addTo({{ this._parent.get_name() }});
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, lat, lon, color="#9F2241", radius=1, fill_opacity=0.6,
+                 cluster=False, disable_clustering_at_zoom=16):
+        super().__init__()
+        self._name = "CanvasPointLayer"
+        self.datos_json = columnas_json(lat=lat, lon=lon)
+        self.estilo_json = json.dumps({
+            "radius": radius,
+            "color": color,
+            "fillColor": color,
+            "fillOpacity": fill_opacity,
+            "weight": 1,
+            "interactive": False,
+        })
+        self.cluster = cluster
+        self.disable_clustering_at_zoom = int(disable_clustering_at_zoom)
+        # Los recursos de markercluster solo se agregan si se usan
+        self.default_js = list(MarkerCluster.default_js) if cluster else []
+        self.default_css = list(MarkerCluster.default_css) if cluster else []
+
+
+class PointTileLayer(MacroElement):
+    """
+    Capa de puntos por teselas (L.GridLayer): el navegador descarga solo las
+    teselas JSON visibles ({"n": total, "p": [x0, y0, ...]} en pixeles locales)
+    y las dibuja en un <canvas> por tesela.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                var CapaPuntos = L.GridLayer.extend({
+                    createTile: function(coords, done) {
+                        var tesela = L.DomUtil.create("canvas", "leaflet-tile");
+                        var tamano = this.getTileSize();
+                        tesela.width = tamano.x;
+                        tesela.height = tamano.y;
+                        var url = L.Util.template(this.options.urlPlantilla, coords);
+                        var color = this.options.color;
+                        fetch(url).then(function(r) { return r.ok ? r.json() : null; })
+                            .then(function(d) {
+                                if (d) {
+                                    var ctx = tesela.getContext("2d");
+                                    ctx.fillStyle = color;
+                                    ctx.globalAlpha = 0.7;
+                                    for (var i = 0; i < d.p.length; i += 2) {
+                                        ctx.fillRect(d.p[i] - 1, d.p[i + 1] - 1, 3, 3);
+                                    }
+                                }
+                                done(null, tesela);
+                            })
+                            .catch(function() { done(null, tesela); });
+                        return tesela;
+                    }
+                });
+                return new CapaPuntos({{ this.opciones_json }}).addTo({{ this._parent.get_name() }});
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url_plantilla, min_zoom=13, max_native_zoom=16, color="#9F2241"):
+        super().__init__()
+        self._name = "PointTileLayer"
+        self.opciones_json = json.dumps({
+            "urlPlantilla": url_plantilla,
+            "minZoom": int(min_zoom),
+            "maxNativeZoom": int(max_native_zoom),
+            "color": color,
+            "pane": "overlayPane",
+        })
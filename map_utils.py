@@ -2,18 +2,24 @@
 # -----------------------------------------------------------------------------
 # MÓDULO DE UTILIDADES DE MAPAS (FOLIUM)
 # -----------------------------------------------------------------------------
-import folium
-from folium.plugins import HeatMap
-import geopandas as gpd
+# folium y las capas de map_layers se importan dentro de las funciones que
+# construyen mapas: importar este módulo (p. ej. para load_boundaries) no
+# carga folium / branca / jinja2 hasta que se dibuja el primer mapa.
 import streamlit as st
-import requests
-from io import BytesIO
+import os
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 
 # --- Importar colores ---
 # Ambas secciones (Dummy y Prod) usan los colores de config.py
-from config import PALETA_PRINCIPAL, ESCALA_ROJOS
+from config import PALETA_PRINCIPAL, ESCALA_ROJOS, MAPA_HTML_CACHE_MB, COLORES_HOTSPOT, CUADRANTES_GEOJSON
+import tile_utils
+import boundary_utils
+import spatial_utils
+import kde_utils
+import perf_utils
 
 
 '''
@@ -24,8 +30,11 @@ from config import PALETA_PRINCIPAL, ESCALA_ROJOS
 # coropléticos.
 # --------------------------------------------------------------------------
 
+import folium
+import geopandas as gpd
 from matplotlib.colors import ListedColormap
 from folium.plugins import BeautifyIcon
+import spatial_utils
 
 # --- Funciones Helper del Notebook ---
 
@@ -74,46 +83,22 @@ def tag_points_with_polygons(points: gpd.GeoDataFrame, polygons: gpd.GeoDataFram
         tagged = tagged.drop(columns=["index_right"])
     return tagged
 
-# --- Función de procesamiento de datos (La que faltaba) ---
-def calculate_percentage_by_cuadrante(data, cuadrantes_gdf, specific_hour):
+# El precálculo cuadrante × hora (una sola unión espacial) vive en la
+# sección 2: poligonos_violencia / tabla_violencia_hora.
+
+def calculate_percentage_by_cuadrante(cuadrantes_gdf, tabla, specific_hour):
     """
-    Calcula el % de delitos violentos por cuadrante para una hora específica.
-    Este es el pre-procesamiento que tu notebook hacía antes de 'make_violent_crime_percentage_map'.
+    Calcula el % de delitos violentos por cuadrante para una hora (o lista de
+    horas) a partir de la tabla precalculada.
     """
-    st.info(f"Procesando datos para la hora: {specific_hour}")
-    
-    # 1. Filtrar data por hora
-    data_hora = data[data['hora_hecho_h'] == specific_hour].copy()
-    if data_hora.empty:
+    total, violentos, porcentaje = spatial_utils.porcentaje_violento(tabla, specific_hour)
+    if total.sum() == 0:
         st.warning(f"No hay datos para la hora {specific_hour}")
-        return cuadrantes_gdf.assign(violent_crime_percentage=0.0)
-
-    # 2. Convertir eventos a GeoDataFrame
-    event_points = to_points(data_hora, lat_col='latitud', lon_col='longitud')
-
-    # 3. Etiquetar puntos con polígonos (cuadrantes)
-    tagged_events = tag_points_with_polygons(event_points, cuadrantes_gdf)
-
-    # 4. Calcular total de delitos por cuadrante
-    total_delitos = tagged_events.groupby('cuadrante_id').size().reset_index(name='total_delitos')
-    
-    # 5. Calcular delitos violentos por cuadrante
-    violentos = tagged_events[tagged_events['CATEGORIA'] != 'No violentos']
-    total_violentos = violentos.groupby('cuadrante_id').size().reset_index(name='delitos_violentos')
-    
-    # 6. Unir todo al GDF de cuadrantes
-    cuadrantes_stats = cuadrantes_gdf.merge(total_delitos, on='cuadrante_id', how='left')
-    cuadrantes_stats = cuadrantes_stats.merge(total_violentos, on='cuadrante_id', how='left')
-    
-    cuadrantes_stats['total_delitos'] = cuadrantes_stats['total_delitos'].fillna(0)
-    cuadrantes_stats['delitos_violentos'] = cuadrantes_stats['delitos_violentos'].fillna(0)
-    
-    # 7. Calcular porcentaje
-    cuadrantes_stats['violent_crime_percentage'] = (
-        (cuadrantes_stats['delitos_violentos'] / cuadrantes_stats['total_delitos']) * 100
-    ).fillna(0).replace([np.inf, -np.inf], 0)
-    
-    return cuadrantes_stats
+    return cuadrantes_gdf.assign(
+        total_delitos=total,
+        delitos_violentos=violentos,
+        violent_crime_percentage=porcentaje
+    )
 
 
 # --- Función de renderizado de mapa (Copiada 1:1 del Notebook y Corregida) ---
@@ -295,33 +280,33 @@ def make_violent_crime_percentage_map(
     return m
 
 # --- Función de Carga Principal (Producción) ---
-@st.cache_data
-def create_notebook_map(data, map_choice, url_cuadrantes):
+HORAS_MAPA = {"Mapa 6:00": 6, "Mapa 12:00": 12, "Mapa 21:00": 21}
+
+def create_notebook_map(_data, map_choice, url_cuadrantes, hora=None, version_datos=None):
     """
     Función principal que la App llamará.
-    Carga los polígonos, calcula los datos y genera el mapa seleccionado.
+    'map_choice' conserva los tres mapas del notebook; 'hora' (0-23, ej. desde
+    un st.slider) permite cualquier otra hora. Ambos son una consulta a la
+    tabla precalculada.
     """
-    
-    # 1. Cargar polígonos (cacheado)
+    if version_datos is None:
+        version_datos = (len(_data), tuple(_data.columns))
+
+    # 1. Cargar polígonos y tabla cuadrante × hora (cacheado, se calcula una vez)
     try:
-        cuadrantes_gdf = load_polygons(url_cuadrantes)
+        cuadrantes_gdf = poligonos_violencia(url_cuadrantes)
+        tabla = tabla_violencia_hora(_data, version_datos, url_cuadrantes)
     except Exception as e:
         st.error(f"Error al cargar GDF de cuadrantes: {e}")
         return folium.Map(location=[19.4326, -99.1332], zoom_start=11)
-    
+
     # 2. Asignar hora y título
-    if map_choice == "Mapa 6:00":
-        hour = 6
-        title = "Porcentaje Crímenes Violentos por Cuadrante - 06:00"
-    elif map_choice == "Mapa 12:00":
-        hour = 12
-        title = "Porcentaje Crímenes Violentos por Cuadrante - 12:00"
-    else: # map_choice == "Mapa 21:00"
-        hour = 21
-        title = "Porcentaje Crímenes Violentos por Cuadrante - 21:00"
-        
-    # 3. Calcular datos (pesado, pero cacheado por 'create_notebook_map')
-    poly_with_percentage = calculate_percentage_by_cuadrante(data, cuadrantes_gdf, hour)
+    if hora is None:
+        hora = HORAS_MAPA.get(map_choice, 21)
+    title = f"Porcentaje Crímenes Violentos por Cuadrante - {int(hora):02d}:00"
+
+    # 3. Consultar la tabla (sin unión espacial)
+    poly_with_percentage = calculate_percentage_by_cuadrante(cuadrantes_gdf, tabla, int(hora))
     
     # 4. Renderizar mapa
     folium_map = make_violent_crime_percentage_map(
@@ -341,31 +326,135 @@ def create_notebook_map(data, map_choice, url_cuadrantes):
 # Provee el mapa simple de Puntos/Heatmap sobre ALCALDÍAS.
 # --------------------------------------------------------------------------
 
-@st.cache_data
 def load_geojson(url, local_backup="limite-de-las-alcaldias.json"):
-    """Carga el GeoJSON de ALCALDÍAS desde una URL; si falla, usa una copia local."""
+    """
+    Carga el GeoJSON de ALCALDÍAS desde la copia persistente en disco (sembrada
+    con 'local_backup'), sin esperar a la red. La versión publicada en 'url'
+    se consulta en segundo plano con peticiones condicionales.
+    """
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        st.success("✅ GeoJSON de Alcaldías cargado correctamente")
-        return gpd.read_file(BytesIO(response.content))
+        boundary_utils.asegurar_cache_local(local_backup)
     except Exception as e:
-        st.warning(f"⚠️ No se pudo cargar GeoJSON de alcaldías desde la web ({e}). Intentando archivo local...")
-        try:
-            return gpd.read_file(local_backup)
-        except Exception as e2:
-            st.error(f"❌ Error al cargar el GeoJSON local de alcaldías: {e2}")
-            st.stop()
-            
-def render_folium_map(df, delegaciones, show_points=True, show_heatmap=True):
-    """Construye un mapa Folium simple (Puntos/Heatmap) con límites de alcaldías."""
-    
+        st.error(f"❌ Error al cargar el GeoJSON local de alcaldías: {e}")
+        st.stop()
+
+    boundary_utils.refrescar_en_segundo_plano(url)
+    return _load_geojson_cache(os.path.getmtime(boundary_utils.RUTA_BINARIO_CACHE))
+
+@st.cache_data
+def _load_geojson_cache(version):
+    """Lee la versión binaria; 'version' (mtime) invalida la caché tras una actualización."""
+    return boundary_utils.cargar_geojson_cache()
+
+def load_boundaries(zoom=11, local_backup="limite-de-las-alcaldias.json", url=None):
+    """
+    Límites de alcaldías simplificados para el 'zoom' del mapa: menos vértices
+    en el HTML y en Leaflet, sin diferencias visibles a ese nivel de zoom.
+    Con 'url' también se programa la actualización en segundo plano de la
+    copia local (como en load_geojson), sin cargar el GeoDataFrame completo.
+    """
+    fuente = boundary_utils.asegurar_cache_local(local_backup)
+    if url:
+        boundary_utils.refrescar_en_segundo_plano(url)
+    return _load_boundaries(zoom, fuente, os.path.getmtime(fuente))
+
+@st.cache_data
+def _load_boundaries(zoom, fuente, version):
+    return boundary_utils.cargar_limites(zoom, fuente)
+
+def version_limites():
+    """mtime de la copia local de los límites: cambia tras una actualización en segundo plano."""
+    try:
+        return os.path.getmtime(boundary_utils.RUTA_GEOJSON_CACHE)
+    except OSError:
+        return None
+
+# --- Agregación en rejilla para el Heatmap ---
+# Tamaño del pixel en grados de longitud a zoom 0 (teselas de 256 px)
+GRADOS_POR_PIXEL_Z0 = 360.0 / 256.0
+MAX_CELDAS_HEATMAP = 20000
+
+def bin_points_grid(lat, lon, zoom=11, radius_px=12, max_cells=MAX_CELDAS_HEATMAP):
+    """
+    Agrupa los puntos en una rejilla regular con np.histogram2d y devuelve
+    solo las celdas no vacías como arreglo (k, 3) de [lat, lon, peso].
+
+    El tamaño de celda es la mitad del radio del heatmap en pixeles al
+    'zoom' indicado; si la extensión de los datos exige más de 'max_cells'
+    celdas, la rejilla se hace más gruesa. Así el tamaño de la capa queda
+    acotado sin importar el número de eventos.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if lat.size == 0:
+        return np.empty((0, 3))
+
+    min_lat, max_lat = lat.min(), lat.max()
+    min_lon, max_lon = lon.min(), lon.max()
+
+    # En Web Mercator un pixel abarca cos(lat) veces menos grados de latitud
+    celda_lon = GRADOS_POR_PIXEL_Z0 / (2 ** zoom) * max(radius_px / 2, 1)
+    celda_lat = celda_lon * np.cos(np.radians((min_lat + max_lat) / 2))
+
+    nx = max(int(np.ceil((max_lon - min_lon) / celda_lon)), 1)
+    ny = max(int(np.ceil((max_lat - min_lat) / celda_lat)), 1)
+    if nx * ny > max_cells:
+        factor = np.sqrt(nx * ny / max_cells)
+        nx = max(int(nx / factor), 1)
+        ny = max(int(ny / factor), 1)
+
+    conteos, bordes_lat, bordes_lon = np.histogram2d(
+        lat, lon,
+        bins=[ny, nx],
+        range=[[min_lat, max_lat + 1e-9], [min_lon, max_lon + 1e-9]]
+    )
+
+    iy, ix = np.nonzero(conteos)
+    pesos = conteos[iy, ix]
+    centros_lat = (bordes_lat[iy] + bordes_lat[iy + 1]) / 2
+    centros_lon = (bordes_lon[ix] + bordes_lon[ix + 1]) / 2
+
+    # Se recorta en el percentil 99 para que una sola celda muy densa no
+    # "apague" al resto (Leaflet.heat escala respecto al peso máximo)
+    tope = np.percentile(pesos, 99)
+    pesos = np.minimum(pesos, tope)
+
+    return np.column_stack([
+        np.round(centros_lat, 5),
+        np.round(centros_lon, 5),
+        np.round(pesos, 2)
+    ])
+
+@st.cache_resource
+def iniciar_servidor_tiles():
+    """Inicia una sola vez el servidor local que expone las teselas precalculadas."""
+    return tile_utils.iniciar_servidor_tiles()
+
+@perf_utils.medir()
+def render_folium_map(df, delegaciones, show_points=True, show_heatmap=True,
+                      heatmap_mode="grid", zoom_start=11, points_mode="canvas",
+                      tiles_partition=None):
+    """
+    Construye un mapa Folium simple (Puntos/Heatmap) con límites de alcaldías.
+
+    heatmap_mode: "grid" agrega los eventos en una rejilla ponderada antes de
+    enviarlos al navegador; "kde" calcula la densidad en el servidor y envía
+    una sola imagen (ver kde_utils); "raw" envía cada coordenada.
+    points_mode: "canvas" dibuja todos los puntos en una sola capa <canvas>,
+    "cluster" además los agrupa, "markers" crea un CircleMarker por evento.
+    tiles_partition: tupla (categoria, anio) para agregar las capas de teselas
+    precalculadas (ver tile_utils); el navegador solo descarga las visibles.
+    """
+    import folium
+    from folium.plugins import HeatMap
+    from map_layers import CanvasPointLayer, PointTileLayer
+
     if not df.empty:
         map_center = [df["latitud"].mean(), df["longitud"].mean()]
     else:
         map_center = [19.4326, -99.1332] # Centro CDMX
 
-    m = folium.Map(location=map_center, zoom_start=11, tiles="Cartodb positron")
+    m = folium.Map(location=map_center, zoom_start=zoom_start, tiles="Cartodb positron")
 
     # 1. Capa de límites de alcaldías
     folium.GeoJson(
@@ -376,17 +465,38 @@ def render_folium_map(df, delegaciones, show_points=True, show_heatmap=True):
     ).add_to(m)
 
     df_map = df[["latitud", "longitud"]].dropna()
-    locations = list(zip(df_map["latitud"], df_map["longitud"]))
 
     # 2. Capa de Heatmap
     if show_heatmap and not df_map.empty:
-        HeatMap(locations, radius=12, blur=10).add_to(m)
+        if heatmap_mode == "grid":
+            celdas = bin_points_grid(df_map["latitud"], df_map["longitud"], zoom=zoom_start, radius_px=12)
+            HeatMap(celdas, radius=12, blur=10).add_to(m)
+        elif heatmap_mode == "kde":
+            imagen, limites = kde_utils.kde_data_url(df_map["latitud"].to_numpy(), df_map["longitud"].to_numpy())
+            folium.raster_layers.ImageOverlay(
+                image=imagen,
+                bounds=limites,
+                opacity=0.85,
+                name="Densidad (KDE)",
+            ).add_to(m)
+        else:
+            HeatMap(df_map.to_numpy(), radius=12, blur=10).add_to(m)
 
     # 3. Capa de Puntos (Círculos)
-    if show_points and not df_map.empty:
-        # --- CORREGIDO: Usar el color principal de la paleta ---
-        color_puntos = PALETA_PRINCIPAL[0] # El rojo principal
-        
+    # --- CORREGIDO: Usar el color principal de la paleta ---
+    color_puntos = PALETA_PRINCIPAL[0] # El rojo principal
+
+    if show_points and not df_map.empty and points_mode in ("canvas", "cluster"):
+        # Una sola capa <canvas> alimentada por un arreglo columnar
+        CanvasPointLayer(
+            df_map["latitud"].to_numpy(),
+            df_map["longitud"].to_numpy(),
+            color=color_puntos,
+            cluster=(points_mode == "cluster")
+        ).add_to(m)
+
+    elif show_points and not df_map.empty:
+        locations = list(zip(df_map["latitud"], df_map["longitud"]))
         for loc in locations:
             folium.CircleMarker(
                 location=loc,
@@ -397,4 +507,306 @@ def render_folium_map(df, delegaciones, show_points=True, show_heatmap=True):
                 fill_opacity=0.6
             ).add_to(m)
 
-    return m
\ No newline at end of file
+    # 4. Capas de teselas precalculadas (servidor estático local)
+    if tiles_partition is not None:
+        manifiesto = tile_utils.leer_manifiesto() or {}
+        zooms_densidad = manifiesto.get("zooms_densidad", list(tile_utils.ZOOMS_DENSIDAD))
+        zooms_puntos = manifiesto.get("zooms_puntos", list(tile_utils.ZOOMS_PUNTOS))
+        categoria_t, anio_t = tiles_partition
+
+        folium.TileLayer(
+            tiles=tile_utils.url_tiles("densidad", categoria_t, anio_t),
+            attr="Delitos CDMX",
+            name="Densidad (teselas)",
+            overlay=True,
+            control=False,
+            opacity=0.85,
+            max_native_zoom=max(zooms_densidad),
+            minNativeZoom=min(zooms_densidad),
+        ).add_to(m)
+
+        PointTileLayer(
+            tile_utils.url_tiles("puntos", categoria_t, anio_t),
+            min_zoom=min(zooms_puntos),
+            max_native_zoom=max(zooms_puntos),
+            color=color_puntos
+        ).add_to(m)
+
+    return m
+
+# --- Caché de mapas renderizados (HTML) ---
+# LRU a nivel de proceso (compartida entre sesiones) acotada por tamaño en
+# bytes: un mapa repetido no vuelve a construir folium ni a generar HTML.
+_CACHE_HTML = OrderedDict()
+_CACHE_HTML_LOCK = threading.Lock()
+_CACHE_HTML_STATS = {"bytes": 0, "aciertos": 0, "fallos": 0, "desalojos": 0}
+
+
+def html_mapa_cacheado(clave, construir, max_bytes=MAPA_HTML_CACHE_MB * 1024 * 1024):
+    """
+    Devuelve el HTML del mapa asociado a 'clave'. Si no está en la caché,
+    llama a 'construir()' (que devuelve un folium.Map), lo renderiza y lo guarda.
+    """
+    with _CACHE_HTML_LOCK:
+        if clave in _CACHE_HTML:
+            _CACHE_HTML.move_to_end(clave)
+            _CACHE_HTML_STATS["aciertos"] += 1
+            return _CACHE_HTML[clave]
+        _CACHE_HTML_STATS["fallos"] += 1
+
+    # Construcción fuera del lock: otras sesiones pueden leer mientras tanto
+    html = construir().get_root().render()
+    tamano = len(html.encode("utf-8"))
+    if tamano > max_bytes:
+        return html
+
+    with _CACHE_HTML_LOCK:
+        if clave not in _CACHE_HTML:
+            _CACHE_HTML[clave] = html
+            _CACHE_HTML_STATS["bytes"] += tamano
+        while _CACHE_HTML_STATS["bytes"] > max_bytes:
+            _, desalojado = _CACHE_HTML.popitem(last=False)
+            _CACHE_HTML_STATS["bytes"] -= len(desalojado.encode("utf-8"))
+            _CACHE_HTML_STATS["desalojos"] += 1
+    return html
+
+
+def estadisticas_cache_html():
+    """Entradas, bytes, aciertos, fallos y desalojos de la caché de mapas."""
+    with _CACHE_HTML_LOCK:
+        return dict(_CACHE_HTML_STATS, entradas=len(_CACHE_HTML))
+
+
+def render_folium_map_html(clave, df, delegaciones, **opciones):
+    """
+    HTML de 'render_folium_map' para la combinación 'clave' (alcaldía,
+    categoría, tasa de muestreo, capas...). Requiere que 'df' sea determinista
+    para esa clave (ver data_loader.muestra_estable).
+    """
+    return html_mapa_cacheado(clave, lambda: render_folium_map(df, delegaciones, **opciones))
+
+
+# --- Modo por vista (nivel de detalle según zoom y encuadre) ---
+ZOOM_DETALLE = 15          # desde este zoom se envían eventos individuales
+MAX_PUNTOS_VISTA = 20000   # tope de puntos por vista (muestra estable si se excede)
+
+
+@st.cache_resource(max_entries=8)
+def indice_espacial(_df, clave):
+    """
+    Índice de rejilla (spatial_utils.IndiceRejilla) de '_df', uno por 'clave'
+    de filtros. La rejilla cubre solo la CDMX y excluye las filas 'fuera_cdmx'.
+    """
+    validos = ~_df["fuera_cdmx"].to_numpy(bool) if "fuera_cdmx" in _df.columns else None
+    return spatial_utils.IndiceRejilla(_df["latitud"].to_numpy(), _df["longitud"].to_numpy(), validos=validos)
+
+
+def capa_por_vista(df, indice, bounds, zoom, color=PALETA_PRINCIPAL[0]):
+    """
+    FeatureGroup con solo los eventos del encuadre 'bounds' (formato de
+    st_folium: {"_southWest": {...}, "_northEast": {...}}): puntos individuales
+    a partir de ZOOM_DETALLE, celdas agregadas (heatmap ponderado) antes.
+    Devuelve (capa, eventos en la vista, modo).
+    """
+    import folium
+    from folium.plugins import HeatMap
+    from map_layers import CanvasPointLayer
+
+    capa = folium.FeatureGroup(name="Eventos en la vista")
+    try:
+        so, ne = bounds["_southWest"], bounds["_northEast"]
+        idx = indice.consultar(so["lat"], so["lng"], ne["lat"], ne["lng"])
+    except (TypeError, KeyError):
+        # Sin encuadre reportado todavía: toda la extensión de los datos
+        idx = np.arange(len(df))
+
+    if idx.size == 0:
+        return capa, 0, "vacío"
+
+    lat = indice.lat[idx]
+    lon = indice.lon[idx]
+    if zoom >= ZOOM_DETALLE:
+        if idx.size > MAX_PUNTOS_VISTA and "rango_muestreo" in df.columns:
+            # Los de menor rango: la misma muestra en cada recarga
+            rango = df["rango_muestreo"].to_numpy()[idx]
+            sel = np.argpartition(rango, MAX_PUNTOS_VISTA)[:MAX_PUNTOS_VISTA]
+            lat, lon = lat[sel], lon[sel]
+        elif idx.size > MAX_PUNTOS_VISTA:
+            lat, lon = lat[:MAX_PUNTOS_VISTA], lon[:MAX_PUNTOS_VISTA]
+        CanvasPointLayer(lat, lon, color=color, radius=3, fill_opacity=0.7).add_to(capa)
+        return capa, int(idx.size), "puntos"
+
+    celdas = bin_points_grid(lat, lon, zoom=zoom, radius_px=12)
+    HeatMap(celdas, radius=12, blur=10).add_to(capa)
+    return capa, int(idx.size), "agregado"
+
+
+# --- Porcentaje de violentos por polígono y hora ---
+# Cada evento se asigna a su polígono UNA sola vez por conjunto de filtros y
+# se cuenta en la tabla polígono × hora × (no violento, violento) de
+# spatial_utils; cualquier hora o rango del slider es una consulta a la tabla.
+
+def poligonos_violencia(fuente=CUADRANTES_GEOJSON, zoom=11):
+    """
+    GeoDataFrame de los polígonos de 'fuente' (GeoJSON de cuadrantes) o, si
+    está vacía, de las alcaldías simplificadas para 'zoom'. Mismo orden que
+    el índice de 'indice_violencia'.
+    """
+    if not fuente:
+        return load_boundaries(zoom=zoom)
+    return _poligonos_fuente(fuente, os.path.getmtime(fuente))[0]
+
+@st.cache_resource(max_entries=2)
+def _poligonos_fuente(fuente, version):
+    """(GeoDataFrame, IndicePoligonos) de un GeoJSON; 'version' (mtime) invalida la caché."""
+    import geopandas as gpd
+
+    propiedades, geoms = boundary_utils.leer_geojson(fuente)
+    gdf = gpd.GeoDataFrame(propiedades, geometry=list(geoms), crs="EPSG:4326")
+    return gdf, spatial_utils.IndicePoligonos(geoms)
+
+def indice_violencia(fuente=CUADRANTES_GEOJSON):
+    """IndicePoligonos de los polígonos de 'poligonos_violencia'."""
+    if not fuente:
+        return spatial_utils.indice_alcaldias()[1]
+    return _poligonos_fuente(fuente, os.path.getmtime(fuente))[1]
+
+def tabla_violencia_hora(df, clave, fuente=CUADRANTES_GEOJSON):
+    """
+    Tabla polígono × hora × (no violento, violento) de 'df'. 'clave'
+    identifica el dataset y los filtros; la versión de los polígonos (mtime)
+    se agrega a la clave de la caché.
+    """
+    version_poligonos = os.path.getmtime(fuente) if fuente else version_limites()
+    return _tabla_violencia_hora(df, clave, fuente, version_poligonos)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+@perf_utils.medir("tabla_violencia_hora")
+def _tabla_violencia_hora(_df, clave, fuente, version_poligonos):
+    indice = indice_violencia(fuente)
+    codigos = indice.asignar(_df["longitud"].to_numpy(), _df["latitud"].to_numpy())
+    if "Violento" in _df.columns:
+        violento = (_df["Violento"] == "Violento").to_numpy()
+    else:
+        violento = (_df["CATEGORIA"].astype(str).str.upper() != "NO VIOLENTOS").to_numpy()
+    return spatial_utils.tabla_poligono_hora(
+        codigos, _df["hora_hecho_h"].to_numpy(), violento, indice.n_poligonos
+    )
+
+@perf_utils.medir()
+def render_violencia_hora_map(poligonos, tabla, horas, delegaciones, zoom_start=11):
+    """
+    Coroplético del % de violentos por polígono para 'horas' (una hora, una
+    lista o None = todo el día), en clases de 20 puntos con ESCALA_ROJOS.
+    Los polígonos sin eventos en esas horas no se envían.
+    """
+    import folium
+
+    vacio = pd.DataFrame(columns=["latitud", "longitud"])
+    m = render_folium_map(vacio, delegaciones, show_points=False, show_heatmap=False, zoom_start=zoom_start)
+
+    total, violentos, porcentaje = spatial_utils.porcentaje_violento(tabla, horas)
+    clase = np.minimum(porcentaje // 20, len(ESCALA_ROJOS) - 1).astype(int)
+    capa = poligonos.assign(
+        eventos=total,
+        violentos=violentos,
+        pct_violentos=porcentaje.round(1),
+        color=[ESCALA_ROJOS[i] for i in clase],
+    )[total > 0]
+    if capa.empty:
+        return m
+
+    nombre = next((c for c in ("cuadrante_id", "NOMGEO") if c in capa.columns), None)
+    campos = ([nombre] if nombre else []) + ["eventos", "violentos", "pct_violentos"]
+    alias = (["Polígono:"] if nombre else []) + ["Eventos:", "Violentos:", "% violentos:"]
+    folium.GeoJson(
+        capa[campos + ["color", "geometry"]],
+        name="% de violentos por hora",
+        style_function=lambda f: {
+            "color": "#555",
+            "fillColor": f["properties"]["color"],
+            "weight": 1,
+            "fillOpacity": 0.6,
+        },
+        tooltip=folium.GeoJsonTooltip(fields=campos, aliases=alias),
+    ).add_to(m)
+    return m
+
+
+# --- Zonas críticas (clusters) ---
+
+@perf_utils.medir()
+def render_cluster_map(clusters, delegaciones, zoom_start=11):
+    """
+    Mapa de zonas críticas: límites de alcaldías (render_folium_map) más los
+    polígonos de 'clusters' (ver cluster_utils.resumen_clusters), coloreados
+    por densidad con ESCALA_ROJOS.
+    """
+    import folium
+
+    vacio = pd.DataFrame(columns=["latitud", "longitud"])
+    m = render_folium_map(vacio, delegaciones, show_points=False, show_heatmap=False, zoom_start=zoom_start)
+    if clusters.empty:
+        return m
+
+    densidad = clusters["densidad_km2"].to_numpy(dtype=np.float64)
+    rango = np.ptp(densidad) or 1.0
+    indices = ((densidad - densidad.min()) / rango * (len(ESCALA_ROJOS) - 1)).round().astype(int)
+    capa = clusters.assign(
+        color=[ESCALA_ROJOS[i] for i in indices],
+        area_km2=clusters["area_km2"].round(2),
+        densidad_km2=clusters["densidad_km2"].round(0),
+        pct_violentos=clusters["pct_violentos"].round(1),
+    )
+
+    folium.GeoJson(
+        capa,
+        name="Zonas críticas",
+        style_function=lambda f: {
+            "color": f["properties"]["color"],
+            "fillColor": f["properties"]["color"],
+            "weight": 1,
+            "fillOpacity": 0.6,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=["cluster", "eventos", "densidad_km2", "pct_violentos", "delito_principal", "alcaldia_principal"],
+            aliases=["Zona:", "Eventos:", "Eventos/km²:", "% violentos:", "Delito principal:", "Alcaldía:"],
+        ),
+    ).add_to(m)
+    return m
+
+
+# --- Puntos calientes (Gi*) ---
+
+@perf_utils.medir()
+def render_hotspot_map(celdas, delegaciones, zoom_start=11, solo_significativas=True):
+    """
+    Coroplético de Gi* (ver hotspot_utils.hotspots_filtro): cada celda se
+    colorea por su clase (COLORES_HOTSPOT). Por defecto solo se envían las
+    celdas significativas para mantener ligero el mapa.
+    """
+    import folium
+
+    vacio = pd.DataFrame(columns=["latitud", "longitud"])
+    m = render_folium_map(vacio, delegaciones, show_points=False, show_heatmap=False, zoom_start=zoom_start)
+    if solo_significativas:
+        celdas = celdas[celdas["clase"] != "No significativo"]
+    if celdas.empty:
+        return m
+
+    capa = celdas[["eventos", "z", "clase", "geometry"]].assign(z=celdas["z"].round(2))
+    folium.GeoJson(
+        capa,
+        name="Puntos calientes (Gi*)",
+        style_function=lambda f: {
+            "color": COLORES_HOTSPOT[f["properties"]["clase"]],
+            "fillColor": COLORES_HOTSPOT[f["properties"]["clase"]],
+            "weight": 0.5,
+            "fillOpacity": 0.65,
+        },
+        tooltip=folium.GeoJsonTooltip(
+            fields=["clase", "z", "eventos"],
+            aliases=["Clase:", "Gi* (z):", "Eventos:"],
+        ),
+    ).add_to(m)
+    return m
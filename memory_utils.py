@@ -0,0 +1,428 @@
+# memory_utils.py
+# -----------------------------------------------------------------------------
+# CONTABILIDAD DE MEMORIA (DATASETS, CACHÉS Y ASIGNACIONES POR RERUN)
+# -----------------------------------------------------------------------------
+# Responde a "¿quién ocupa la memoria del proceso?":
+#   - Datasets: cada DataFrame que devuelve data_loader.load_data se registra
+#     con una referencia débil. st.cache_data entrega una COPIA (deserializada)
+#     en cada llamada, así que el número de copias vivas de un mismo archivo
+#     revela sesiones o trabajos que retienen su propia copia.
+#   - Cachés: entradas y bytes de cada función con st.cache_data /
+#     st.cache_resource, más las cachés propias de los módulos del dashboard.
+#   - Reruns: con tracemalloc activo se toma una instantánea al inicio y al
+#     final de cada rerun (memoria neta retenida, pico transitorio y las
+#     líneas que más asignaron).
+# Las cifras se exportan en formato de texto de Prometheus (MEMORIA_METRICAS)
+# para fijar presupuestos y detectar fugas desde fuera del proceso.
+# -----------------------------------------------------------------------------
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import auth_utils
+from config import (
+    MEMORIA_EXPORTAR_SEGUNDOS, MEMORIA_HISTORIAL, MEMORIA_METRICAS,
+    MEMORIA_TRACEMALLOC, MEMORIA_TRACEMALLOC_MARCOS
+)
+
+TOP_LINEAS = 10
+_DATASETS = {}                 # nombre -> [weakref.ref(DataFrame), ...]
+_DATASETS_LOCK = threading.Lock()
+_estado = threading.local()    # instantánea del rerun en curso (un hilo por sesión)
+_HISTORIAL = deque(maxlen=MEMORIA_HISTORIAL)   # mediciones de reruns de todo el proceso
+_HISTORIAL_LOCK = threading.Lock()
+_ULTIMA_EXPORTACION = [0.0]
+_FILTRO_PROPIO = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+
+def activar_tracemalloc(valor=True):
+    """Activa o desactiva el rastreo de asignaciones para todo el proceso."""
+    if valor and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORIA_TRACEMALLOC_MARCOS)
+    elif not valor and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+if MEMORIA_TRACEMALLOC:
+    activar_tracemalloc(True)
+
+
+# --- Tamaños ---
+
+def tamano_profundo(objeto):
+    """
+    Bytes aproximados de 'objeto' y de todo lo que contiene. DataFrames, Series
+    y arreglos de NumPy se miden por sus datos (memory_usage(deep=True) /
+    nbytes); los contenedores y objetos de Python se recorren sin contar dos
+    veces el mismo objeto.
+    """
+    vistos = set()
+    pendientes = [objeto]
+    total = 0
+    while pendientes:
+        obj = pendientes.pop()
+        if id(obj) in vistos:
+            continue
+        vistos.add(id(obj))
+        if isinstance(obj, pd.DataFrame):
+            total += int(obj.memory_usage(deep=True, index=True).sum())
+        elif isinstance(obj, (pd.Series, pd.Index)):
+            total += int(obj.memory_usage(deep=True))
+        elif isinstance(obj, np.ndarray):
+            total += obj.nbytes
+        elif isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+            total += sys.getsizeof(obj)
+        elif isinstance(obj, dict):
+            total += sys.getsizeof(obj)
+            pendientes.extend(obj.keys())
+            pendientes.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            total += sys.getsizeof(obj)
+            pendientes.extend(obj)
+        else:
+            total += sys.getsizeof(obj, 0)
+            if hasattr(obj, "__dict__"):
+                pendientes.append(vars(obj))
+            for nombre in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, nombre):
+                    pendientes.append(getattr(obj, nombre))
+    return total
+
+
+def memoria_columnas(data):
+    """DataFrame con los bytes (profundos) de cada columna de 'data' y su porcentaje."""
+    bytes_columna = data.memory_usage(deep=True, index=True)
+    tabla = pd.DataFrame({
+        "columna": bytes_columna.index.astype(str),
+        "dtype": ["índice" if c == "Index" else str(data[c].dtype) for c in bytes_columna.index],
+        "bytes": bytes_columna.to_numpy(np.int64),
+    })
+    tabla["pct"] = (100 * tabla["bytes"] / max(int(tabla["bytes"].sum()), 1)).round(1)
+    return tabla.sort_values("bytes", ascending=False, ignore_index=True)
+
+
+def memoria_proceso():
+    """Memoria residente actual y pico del proceso (bytes; None si el sistema no la expone)."""
+    rss = pico = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss viene en KiB en Linux y en bytes en macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        pass
+    return {"rss": rss, "rss_pico": pico}
+
+
+# --- Datasets ---
+
+def registrar_dataset(nombre, data):
+    """Registra (con referencia débil) un DataFrame cargado de 'nombre'."""
+    with _DATASETS_LOCK:
+        vivas = [r for r in _DATASETS.get(nombre, []) if r() is not None and r() is not data]
+        vivas.append(weakref.ref(data))
+        _DATASETS[nombre] = vivas
+
+
+def rastrear_datasets(funcion):
+    """Decorador para cargadores 'funcion(path, ...)': registra cada DataFrame que devuelven."""
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        data = funcion(*args, **kwargs)
+        if isinstance(data, pd.DataFrame):
+            registrar_dataset(str(args[0] if args else kwargs.get("path", funcion.__name__)), data)
+        return data
+    return envoltura
+
+
+def copias_dataset(nombre):
+    """DataFrames vivos registrados para 'nombre'."""
+    with _DATASETS_LOCK:
+        referencias = list(_DATASETS.get(nombre, []))
+    return [d for d in (r() for r in referencias) if d is not None]
+
+
+def datasets():
+    """DataFrame con copias vivas, filas y bytes (por copia y en total) de cada dataset."""
+    with _DATASETS_LOCK:
+        nombres = list(_DATASETS)
+    filas = []
+    for nombre in nombres:
+        copias = copias_dataset(nombre)
+        if not copias:
+            continue
+        bytes_copias = [int(c.memory_usage(deep=True, index=True).sum()) for c in copias]
+        filas.append({
+            "dataset": nombre, "copias": len(copias), "filas": len(copias[-1]),
+            "columnas": copias[-1].shape[1], "bytes_copia": bytes_copias[-1], "bytes_total": sum(bytes_copias),
+            # Mapeado desde shared_data: sus páginas se comparten con los demás procesos
+            "compartido": bool(copias[-1].attrs.get("compartido")),
+        })
+    return pd.DataFrame(
+        filas, columns=["dataset", "copias", "filas", "columnas", "bytes_copia", "bytes_total", "compartido"]
+    )
+
+
+# --- Cachés ---
+
+def _caches_streamlit(proveedor, tipo):
+    # Las cachés por función no son API pública de Streamlit: si su estructura
+    # cambia se recurre a las estadísticas agregadas (sin número de entradas).
+    try:
+        with proveedor._caches_lock:
+            por_funcion = [c for por_sesion in proveedor._function_caches.values() for c in por_sesion.values()]
+    except AttributeError:
+        return [
+            {"tipo": tipo, "cache": s.cache_name, "entradas": None, "bytes": s.byte_length}
+            for estadisticas in proveedor.get_stats().values() for s in estadisticas
+        ]
+
+    filas = []
+    for cache in por_funcion:
+        if hasattr(cache, "_mem_cache"):
+            # st.cache_resource guarda el objeto mismo: se mide su tamaño profundo
+            with cache._mem_cache_lock:
+                valores = [resultado.value for resultado in cache._mem_cache.values()]
+            entradas, total = len(valores), sum(tamano_profundo(v) for v in valores)
+        else:
+            # st.cache_data guarda cada entrada serializada: bytes del pickle
+            estadisticas = [s for lista in cache.get_stats().values() for s in lista]
+            entradas, total = len(estadisticas), sum(s.byte_length for s in estadisticas)
+        filas.append({"tipo": tipo, "cache": cache.display_name, "entradas": entradas, "bytes": total})
+    return filas
+
+
+def _caches_propias():
+    # Solo se consultan los módulos ya importados por alguna página
+    filas = []
+    map_utils = sys.modules.get("map_utils")
+    if map_utils is not None:
+        html = map_utils.estadisticas_cache_html()
+        filas.append({"tipo": "propia", "cache": "map_utils.html_mapa_cacheado",
+                      "entradas": html["entradas"], "bytes": html["bytes"]})
+    report_utils = sys.modules.get("report_utils")
+    if report_utils is not None:
+        with report_utils._TRABAJOS_LOCK:
+            resultados = [t.resultado for t in report_utils._TRABAJOS.values()]
+        filas.append({"tipo": "propia", "cache": "report_utils._TRABAJOS", "entradas": len(resultados),
+                      "bytes": sum(len(r) for r in resultados if r is not None)})
+    anomaly_utils = sys.modules.get("anomaly_utils")
+    if anomaly_utils is not None:
+        with anomaly_utils._LOCK:
+            estados = dict(anomaly_utils._MEMORIA)
+        filas.append({"tipo": "propia", "cache": "anomaly_utils._MEMORIA", "entradas": len(estados),
+                      "bytes": tamano_profundo(estados)})
+    perf_utils = sys.modules.get("perf_utils")
+    if perf_utils is not None:
+        with perf_utils._MUESTRAS_LOCK:
+            muestras = {n: list(m) for n, m in perf_utils._MUESTRAS.items()}
+        filas.append({"tipo": "propia", "cache": "perf_utils._MUESTRAS",
+                      "entradas": sum(len(m) for m in muestras.values()), "bytes": tamano_profundo(muestras)})
+    return filas
+
+
+def caches():
+    """DataFrame con entradas y bytes de cada caché (Streamlit y propias), de mayor a menor."""
+    from streamlit.runtime.caching import cache_data_api, cache_resource_api
+
+    filas = (
+        _caches_streamlit(cache_data_api.get_data_cache_stats_provider(), "st.cache_data")
+        + _caches_streamlit(cache_resource_api.get_resource_cache_stats_provider(), "st.cache_resource")
+        + _caches_propias()
+    )
+    return pd.DataFrame(filas, columns=["tipo", "cache", "entradas", "bytes"]).sort_values(
+        "bytes", ascending=False, ignore_index=True
+    )
+
+
+# --- Asignaciones por rerun (tracemalloc) ---
+
+def iniciar_rerun(pagina=None):
+    """
+    Toma la instantánea inicial del rerun (llamar al inicio de cada página).
+    tracemalloc es global al proceso: con varias sesiones activas a la vez,
+    las asignaciones de las demás también aparecen en la medición.
+    """
+    _estado.inicio = None
+    if not tracemalloc.is_tracing():
+        return
+    tracemalloc.reset_peak()
+    _estado.inicio = (pagina, time.time(), tracemalloc.take_snapshot().filter_traces(_FILTRO_PROPIO),
+                      tracemalloc.get_traced_memory()[0])
+
+
+def finalizar_rerun():
+    """
+    Compara con la instantánea inicial y guarda la medición en la sesión
+    ('memoria_rerun') y en el historial del proceso. También exporta las
+    métricas si pasó MEMORIA_EXPORTAR_SEGUNDOS desde la última vez.
+    """
+    inicio = getattr(_estado, "inicio", None)
+    _estado.inicio = None
+    if inicio is not None and tracemalloc.is_tracing():
+        pagina, ts, instantanea, actual_inicio = inicio
+        actual, pico = tracemalloc.get_traced_memory()
+        diferencias = tracemalloc.take_snapshot().filter_traces(_FILTRO_PROPIO).compare_to(instantanea, "lineno")
+        medicion = {
+            "pagina": pagina, "ts": ts, "usuario": st.session_state.get("username"),
+            "neto": actual - actual_inicio,
+            "transitorio": max(pico - actual_inicio, 0),
+            "lineas": [
+                {"linea": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                 "bytes": d.size_diff, "bloques": d.count_diff}
+                for d in sorted(diferencias, key=lambda d: abs(d.size_diff), reverse=True)[:TOP_LINEAS]
+            ],
+        }
+        st.session_state["memoria_rerun"] = medicion
+        with _HISTORIAL_LOCK:
+            _HISTORIAL.append({k: v for k, v in medicion.items() if k != "lineas"})
+
+    if MEMORIA_EXPORTAR_SEGUNDOS > 0 and time.time() - _ULTIMA_EXPORTACION[0] >= MEMORIA_EXPORTAR_SEGUNDOS:
+        exportar_metricas()
+
+
+def historial_reruns():
+    """DataFrame con las mediciones recientes de reruns de todo el proceso."""
+    with _HISTORIAL_LOCK:
+        filas = list(_HISTORIAL)
+    tabla = pd.DataFrame(filas, columns=["pagina", "ts", "usuario", "neto", "transitorio"])
+    tabla["ts"] = pd.to_datetime(tabla["ts"], unit="s")
+    return tabla
+
+
+# --- Métricas ---
+
+def _etiquetas(**valores):
+    def escapar(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in valores.items()) + "}"
+
+
+def metricas_texto():
+    """Métricas de memoria en el formato de texto de exposición de Prometheus."""
+    lineas = []
+
+    def metrica(nombre, ayuda, muestras):
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} gauge")
+        lineas.extend(f"{nombre}{_etiquetas(**e)} {v}" for e, v in muestras if v is not None)
+
+    proceso = memoria_proceso()
+    metrica("dashboard_proceso_bytes", "Memoria residente del proceso.",
+            [({"tipo": "rss"}, proceso["rss"]), ({"tipo": "rss_pico"}, proceso["rss_pico"])])
+
+    tabla_datasets = datasets()
+    metrica("dashboard_dataset_copias", "Copias vivas de cada dataset cargado.",
+            [({"dataset": f.dataset}, f.copias) for f in tabla_datasets.itertuples()])
+    metrica("dashboard_dataset_bytes", "Bytes (profundos) de todas las copias vivas de cada dataset.",
+            [({"dataset": f.dataset}, f.bytes_total) for f in tabla_datasets.itertuples()])
+    columnas = []
+    for nombre in tabla_datasets["dataset"]:
+        copias = copias_dataset(nombre)
+        if copias:
+            columnas.extend(({"dataset": nombre, "columna": f.columna}, f.bytes)
+                            for f in memoria_columnas(copias[-1]).itertuples())
+    metrica("dashboard_dataset_columna_bytes", "Bytes (profundos) de cada columna de una copia del dataset.", columnas)
+
+    tabla_caches = caches()
+    metrica("dashboard_cache_entradas", "Entradas de cada caché.",
+            [({"tipo": f.tipo, "cache": f.cache}, f.entradas) for f in tabla_caches.itertuples()])
+    metrica("dashboard_cache_bytes", "Bytes de cada caché.",
+            [({"tipo": f.tipo, "cache": f.cache}, f.bytes) for f in tabla_caches.itertuples()])
+
+    with _HISTORIAL_LOCK:
+        ultimas = {m["pagina"]: m for m in _HISTORIAL}   # la medición más reciente por página
+    metrica("dashboard_rerun_neto_bytes", "Memoria retenida por el último rerun medido de cada página.",
+            [({"pagina": p}, m["neto"]) for p, m in ultimas.items()])
+    metrica("dashboard_rerun_transitorio_bytes", "Pico transitorio del último rerun medido de cada página.",
+            [({"pagina": p}, m["transitorio"]) for p, m in ultimas.items()])
+    return "\n".join(lineas) + "\n"
+
+
+def exportar_metricas(ruta=MEMORIA_METRICAS):
+    """Escribe las métricas en 'ruta' (reemplazo atómico) y devuelve el texto."""
+    _ULTIMA_EXPORTACION[0] = time.time()
+    texto = metricas_texto()
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+    return texto
+
+
+# --- Vista de administración ---
+
+def _mb(valor):
+    return "N/D" if valor is None else f"{valor / 1e6:,.1f} MB"
+
+
+def renderizar_vista_admin():
+    """Contabilidad de memoria del proceso (solo usuarios privilegiados)."""
+    if not auth_utils.es_privilegiado():
+        return
+    proceso = memoria_proceso()
+    tabla_datasets = datasets()
+    tabla_caches = caches()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Memoria residente", _mb(proceso["rss"]))
+    col2.metric("Pico del proceso", _mb(proceso["rss_pico"]))
+    col3.metric("Datasets (copias vivas)", _mb(int(tabla_datasets["bytes_total"].sum())))
+    col4.metric("Cachés", _mb(int(tabla_caches["bytes"].fillna(0).sum())))
+
+    st.markdown("**Datasets cargados**")
+    if tabla_datasets.empty:
+        st.info("Aún no se ha cargado ningún dataset en este proceso.")
+    else:
+        if (tabla_datasets["copias"] > 1).any():
+            st.warning(
+                "⚠️ Hay datasets con más de una copia viva: alguna sesión o trabajo en segundo plano "
+                "conserva su propia copia."
+            )
+        st.dataframe(tabla_datasets, hide_index=True, use_container_width=True)
+        nombre = st.selectbox("Memoria por columna de:", list(tabla_datasets["dataset"]))
+        copias = copias_dataset(nombre)
+        if copias:
+            st.dataframe(memoria_columnas(copias[-1]), hide_index=True, use_container_width=True)
+
+    st.markdown("**Cachés**")
+    st.dataframe(tabla_caches, hide_index=True, use_container_width=True)
+
+    st.markdown("**Asignaciones por rerun (tracemalloc)**")
+    # Sin 'key': el control refleja el estado global aunque otra sesión lo cambie
+    activo = st.toggle("Medir asignaciones por rerun", value=tracemalloc.is_tracing())
+    if activo != tracemalloc.is_tracing():
+        activar_tracemalloc(activo)
+        st.rerun()
+    if not activo:
+        st.caption("Medición desactivada (se activa para todo el proceso y vuelve más lentos los reruns).")
+    else:
+        medicion = st.session_state.get("memoria_rerun")
+        if medicion is None:
+            st.caption("Aún no hay un rerun medido en esta sesión.")
+        else:
+            st.caption(
+                f"Último rerun medido ({medicion['pagina']}): neto {_mb(medicion['neto'])}, "
+                f"pico transitorio {_mb(medicion['transitorio'])}."
+            )
+            st.dataframe(pd.DataFrame(medicion["lineas"]), hide_index=True, use_container_width=True)
+        st.dataframe(historial_reruns(), hide_index=True, use_container_width=True)
+
+    texto = exportar_metricas()
+    st.download_button("⬇️ Descargar métricas", data=texto, file_name="metricas_memoria.prom",
+                       mime="text/plain", on_click="ignore")
+    st.caption(f"Métricas (formato Prometheus): {MEMORIA_METRICAS}")
@@ -0,0 +1,162 @@
+# near_repeat_utils.py
+# -----------------------------------------------------------------------------
+# ANÁLISIS NEAR-REPEAT (PRUEBA DE KNOX CON MONTE CARLO)
+# -----------------------------------------------------------------------------
+# ¿Los delitos cercanos en el espacio también ocurren cercanos en el tiempo
+# más de lo que se esperaría por azar? Los pares de eventos a menos de
+# 'distancia_max' metros se obtienen con un KD-tree (scipy cKDTree) sobre
+# coordenadas proyectadas, sin comparar todos contra todos. Cada par se
+# clasifica en una banda espacial × banda temporal (tabla de Knox).
+#
+# Significancia: las fechas se permutan entre los eventos (las posiciones y,
+# por tanto, los pares y sus distancias no cambian) y se recuenta la tabla.
+# Las permutaciones se reparten entre procesos (ProcessPoolExecutor).
+# -----------------------------------------------------------------------------
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.spatial import cKDTree
+
+import data_loader
+
+METROS_POR_GRADO = 111320.0
+RUTA_DATOS_FECHAS = "df_streamlit.csv"   # el análisis requiere la fecha del hecho
+DISTANCIA_MAX_M = 400
+PASO_ESPACIAL_M = 100
+PASO_TEMPORAL_DIAS = 7
+BANDAS_TEMPORALES = 4                    # más una banda final "más de ..."
+N_PERMUTACIONES = 99
+MAX_EVENTOS_NEAR_REPEAT = 50_000         # muestra estable si el filtro tiene más
+NIVEL_SIGNIFICANCIA = 0.05
+TODAS = "TODAS"
+TODOS = "TODOS"
+
+
+def proyectar(lat, lon):
+    """Coordenadas en metros (equirectangular local, suficiente a escala de ciudad)."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat0 = np.radians(np.mean(lat)) if lat.size else 0.0
+    return np.column_stack([lon * METROS_POR_GRADO * np.cos(lat0), lat * METROS_POR_GRADO])
+
+
+def pares_cercanos(xy, distancia_max=DISTANCIA_MAX_M):
+    """
+    Pares (i, j), i < j, a no más de 'distancia_max' metros, y su distancia.
+    Los índices son int32: la mitad de memoria y de tráfico en las permutaciones.
+    """
+    pares = cKDTree(xy).query_pairs(distancia_max, output_type="ndarray").astype(np.int32)
+    if pares.size == 0:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0)
+    i, j = pares[:, 0], pares[:, 1]
+    return i, j, np.hypot(*(xy[i] - xy[j]).T)
+
+
+def banda_temporal(dias, paso=PASO_TEMPORAL_DIAS, n_bandas=BANDAS_TEMPORALES):
+    """Índice de banda temporal (0..n_bandas; la última es 'más de n_bandas * paso')."""
+    return np.minimum(dias // paso, n_bandas).astype(np.int32, copy=False)
+
+
+def tabla_knox(banda_s, banda_t, n_s, n_t):
+    """Conteo de pares por banda espacial (filas) × banda temporal (columnas)."""
+    return np.bincount(banda_s * n_t + banda_t, minlength=n_s * n_t).reshape(n_s, n_t)
+
+
+def _simular(i, j, banda_s, dias, n_s, paso, n_bandas, semilla, n_permutaciones):
+    """Tablas de Knox con las fechas permutadas (se ejecuta en un proceso aparte)."""
+    rng = np.random.default_rng(semilla)
+    n_t = n_bandas + 1
+    tablas = np.empty((n_permutaciones, n_s, n_t), dtype=np.int64)
+    for k in range(n_permutaciones):
+        permutado = dias[rng.permutation(dias.size)]
+        tablas[k] = tabla_knox(banda_s, banda_temporal(np.abs(permutado[i] - permutado[j]), paso, n_bandas), n_s, n_t)
+    return tablas
+
+
+def monte_carlo(i, j, banda_s, dias, n_s, paso=PASO_TEMPORAL_DIAS, n_bandas=BANDAS_TEMPORALES,
+                n_permutaciones=N_PERMUTACIONES, semilla=data_loader.SEMILLA_MUESTREO, procesos=None):
+    """
+    Tablas simuladas (n_permutaciones, n_s, n_t) repartidas en 'procesos'
+    procesos. Si no se pueden crear procesos se calculan en este mismo.
+    Se usa 'spawn': el servidor de Streamlit es multihilo y 'fork' podría
+    heredar candados tomados.
+    """
+    procesos = max(1, min(procesos or os.cpu_count() or 1, n_permutaciones))
+    tamanos = [len(b) for b in np.array_split(np.arange(n_permutaciones), procesos)]
+    semillas = np.random.SeedSequence(semilla).spawn(procesos)
+    argumentos = [
+        (i, j, banda_s, dias, n_s, paso, n_bandas, s, n) for s, n in zip(semillas, tamanos) if n > 0
+    ]
+    if procesos > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as ejecutor:
+                return np.concatenate(list(ejecutor.map(_simular, *zip(*argumentos))))
+        except (OSError, BrokenProcessPool):
+            pass
+    return np.concatenate([_simular(*a) for a in argumentos])
+
+
+@st.cache_data(show_spinner="Calculando patrones near-repeat...")
+def analisis_near_repeat(_data, version, categoria=TODAS, anio=TODOS,
+                         distancia_max=DISTANCIA_MAX_M, paso_espacial=PASO_ESPACIAL_M,
+                         paso_temporal=PASO_TEMPORAL_DIAS, n_permutaciones=N_PERMUTACIONES):
+    """
+    Tabla de Knox para un filtro. Devuelve un dict con 'observados',
+    'esperados' (media simulada), 'razon' (observados / esperados) y 'p'
+    como DataFrames (bandas espaciales × temporales), más 'eventos',
+    'pares' y 'muestreado'. '_data' (el dataset de RUTA_DATOS_FECHAS) no
+    se hashea: 'version' (data_loader.version_datos) invalida la caché.
+    """
+    data = _data
+    if categoria != TODAS:
+        data = data[data["CATEGORIA"] == categoria]
+    if anio != TODOS:
+        data = data[data["anio_hecho"] == anio]
+    data = data.dropna(subset=["fecha_hecho"])
+
+    muestreado = len(data) > MAX_EVENTOS_NEAR_REPEAT
+    if muestreado:
+        data = data.nsmallest(MAX_EVENTOS_NEAR_REPEAT, "rango_muestreo")
+
+    # Días enteros desde 1970: la aritmética entera es más rápida en las permutaciones
+    dias = data["fecha_hecho"].to_numpy("datetime64[D]").astype(np.int32)
+    i, j, distancia = pares_cercanos(proyectar(data["latitud"], data["longitud"]), distancia_max)
+
+    n_s = int(np.ceil(distancia_max / paso_espacial))
+    n_t = BANDAS_TEMPORALES + 1
+    banda_s = np.minimum(distancia // paso_espacial, n_s - 1).astype(np.int32)
+    observados = tabla_knox(banda_s, banda_temporal(np.abs(dias[i] - dias[j]), paso_temporal), n_s, n_t)
+    simuladas = monte_carlo(i, j, banda_s, dias, n_s, paso_temporal, n_permutaciones=n_permutaciones)
+
+    esperados = simuladas.mean(axis=0)
+    p = (1 + (simuladas >= observados[None]).sum(axis=0)) / (n_permutaciones + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        razon = np.where(esperados > 0, observados / esperados, np.nan)
+
+    filas = [f"{k * paso_espacial}-{(k + 1) * paso_espacial} m" for k in range(n_s)]
+    columnas = [f"{k * paso_temporal}-{(k + 1) * paso_temporal} días" for k in range(BANDAS_TEMPORALES)]
+    columnas.append(f"más de {BANDAS_TEMPORALES * paso_temporal} días")
+
+    def marco(valores):
+        return pd.DataFrame(valores, index=filas, columns=columnas)
+
+    return {
+        "observados": marco(observados),
+        "esperados": marco(esperados),
+        "razon": marco(razon),
+        "p": marco(p),
+        "eventos": len(data),
+        "pares": int(i.size),
+        "muestreado": muestreado,
+    }
+
+
+def tabla_resumen(resultado, nivel=NIVEL_SIGNIFICANCIA):
+    """Razón de Knox con '*' en las celdas significativas (p < nivel)."""
+    razon, p = resultado["razon"], resultado["p"]
+    return razon.round(2).astype(str).where(p >= nivel, razon.round(2).astype(str) + " *")
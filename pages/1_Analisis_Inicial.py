@@ -3,6 +3,9 @@ import streamlit as st
 import data_loader
 import plot_utils
 import auth_utils
+import colonia_utils
+import perf_utils
+import memory_utils
 
 # 1. CONFIGURACIÓN DE LA PÁGINA
 st.set_page_config(
@@ -13,6 +16,8 @@ st.set_page_config(
 
 # Control de acceso: requiere autenticación (todos los tipos de usuario)
 auth_utils.requiere_autenticacion()
+perf_utils.iniciar_rerun("Analisis Inicial")
+memory_utils.iniciar_rerun("Analisis Inicial")
 
 # 2. CARGA DE DATOS
 data = data_loader.load_data("df_streamlit.csv") 
@@ -33,8 +38,9 @@ st.sidebar.header("Filtros Globales")
 # a. Filtro de Alcaldía
 col_alcaldia = 'alcaldia_hecho'
 
-# Se genera el dataframe filtrado con el original
-data_completo_filtered = data_completo.copy()
+# Se parte del original sin copiarlo: los filtros crean DataFrames nuevos
+# (con copy-on-write de pandas nunca se modifica 'data_completo')
+data_completo_filtered = data_completo
 
 #Se verifica que la columna exista para generar el listado
 if col_alcaldia in data_completo.columns:
@@ -46,12 +52,31 @@ if col_alcaldia in data_completo.columns:
         index=0
     )
     
+    # Filtro de colonia anidado en la alcaldía: el índice precalculado da las
+    # filas de la alcaldía/colonia sin recorrer todo el DataFrame
+    colonia_seleccionada = "TODAS"
+    if alcaldia_seleccionada != "TODAS" and 'colonia_catalogo' in data_completo.columns:
+        indice_colonias, agregados_colonias = colonia_utils.indice_colonias(
+            data_completo, data_loader.version_datos(data_completo)
+        )
+        colonia_seleccionada = st.sidebar.selectbox(
+            "Selecciona Colonia:",
+            options=["TODAS"] + indice_colonias.colonias(alcaldia_seleccionada),
+            index=0,
+            help="Escribe para buscar una colonia."
+        )
+        with perf_utils.span("filtro_colonia"):
+            data_completo_filtered = data_completo.iloc[
+                indice_colonias.filas(alcaldia_seleccionada, colonia_seleccionada)
+            ]
     # Aplicar filtro de alcaldía
-    if alcaldia_seleccionada != "TODAS":
-        data_completo_filtered = data_completo_filtered[data_completo_filtered[col_alcaldia] == alcaldia_seleccionada]
+    elif alcaldia_seleccionada != "TODAS":
+        with perf_utils.span("filtro_alcaldia"):
+            data_completo_filtered = data_completo_filtered[data_completo_filtered[col_alcaldia] == alcaldia_seleccionada]
 else:
     st.sidebar.warning("Columna 'alcaldia_hecho' no encontrada en el dataset.")
     alcaldia_seleccionada = "TODAS"
+    colonia_seleccionada = "TODAS"
 
 st.sidebar.markdown("---")
 
@@ -86,10 +111,13 @@ if year_col in data_completo.columns:
     
     # Aplicar filtro de año sobre los datos
     if selected_years:
-        data_completo_filtered = data_completo_filtered[data_completo_filtered[year_col].isin(selected_years)]
+        with perf_utils.span("filtro_anio"):
+            data_completo_filtered = data_completo_filtered[data_completo_filtered[year_col].isin(selected_years)]
         
         # Texto resumen de filtros activos para mayor comprensión
         filtro_alcaldia_txt = f"📍 **Alcaldía:** {alcaldia_seleccionada}"
+        if colonia_seleccionada != "TODAS":
+            filtro_alcaldia_txt += f" | 🏘️ **Colonia:** {colonia_seleccionada}"
         filtro_anio_txt = f"🗓️ **Años:** {min(selected_years)} - {max(selected_years)}" if usar_todos else f"🗓️ **Años:** {', '.join(map(str, selected_years))}"
         st.markdown(f"{filtro_alcaldia_txt} | {filtro_anio_txt}")
         
@@ -99,6 +127,17 @@ if year_col in data_completo.columns:
 else:
     st.warning(f"Columna de año no encontrada.")
 
+# Resumen por colonia de la alcaldía seleccionada (agregados precalculados)
+if alcaldia_seleccionada != "TODAS" and 'colonia_catalogo' in data_completo.columns:
+    with st.expander(f"🏘️ Colonias de {alcaldia_seleccionada} (todos los años)"):
+        st.dataframe(
+            agregados_colonias[agregados_colonias["alcaldia"] == alcaldia_seleccionada]
+            .drop(columns="alcaldia")
+            .sort_values("total", ascending=False),
+            hide_index=True,
+            use_container_width=True
+        )
+
 st.markdown("---")
 
 # 5. VISUALIZACIONES
@@ -151,5 +190,7 @@ else:
     chart_polar = plot_utils.plot_polar_violencia_hora(data_completo_filtered)
     st.altair_chart(chart_polar, use_container_width=True)
 
-# Botón de cerrar sesión al final del sidebar
+# Medición de memoria del rerun; panel de rendimiento (solo privilegiados) y botón de cerrar sesión al final del sidebar
+memory_utils.finalizar_rerun()
+perf_utils.renderizar_panel_sidebar()
 auth_utils.renderizar_logout_sidebar()
\ No newline at end of file
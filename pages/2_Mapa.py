@@ -1,10 +1,14 @@
 import streamlit as st
-from streamlit_folium import st_folium
+import streamlit.components.v1 as components
 import data_loader   # Módulo local de carga de datos
 import map_utils     # Módulo local de utilidades de mapa
 import plot_utils    # Módulo local de visualizaciones (Altair)
 import numpy as np
 import auth_utils
+import perf_utils    # Medición de tiempos por tramo
+import memory_utils  # Contabilidad de memoria por rerun
+import tile_utils    # Teselas precalculadas (puntos/densidad)
+from config import MAPA_VIOLENCIA_HORA
 
 # === 1. Configuración de la Página ===
 # Nota: Si usas st.navigation en el archivo principal, esta config es opcional pero recomendada para títulos de pestaña.
@@ -16,10 +20,16 @@ st.set_page_config(
 
 # Control de acceso: requiere autenticación (todos los tipos de usuario)
 auth_utils.requiere_autenticacion()
+perf_utils.iniciar_rerun("Mapa")
+memory_utils.iniciar_rerun("Mapa")
 
 # === 2. Carga de Datos ===
 URL_GEOJSON_ALCALDIAS = "https://datos.cdmx.gob.mx/dataset/alcaldias/resource/8648431b-4f34-4f1a-a4b1-19142f944300/download/limite-de-las-alcaldias.json"
-delegaciones = map_utils.load_geojson(URL_GEOJSON_ALCALDIAS, local_backup="limite-de-las-alcaldias.json")
+
+# Versión simplificada de los límites para el zoom inicial del mapa
+# (la copia local se sigue actualizando en segundo plano desde la URL)
+ZOOM_MAPA = 11
+delegaciones_mapa = map_utils.load_boundaries(zoom=ZOOM_MAPA, url=URL_GEOJSON_ALCALDIAS)
 
 data = data_loader.load_data("df_streamlit.csv")
 
@@ -40,6 +50,16 @@ alcaldia = st.sidebar.selectbox(
     ["TODAS"] + sorted(data["alcaldia_hecho"].dropna().unique())
 )
 
+# La alcaldía capturada puede no coincidir con la ubicación del punto;
+# 'alcaldia_geo' se asigna en la carga con los polígonos oficiales.
+filtro_geografico = st.sidebar.checkbox(
+    "Filtrar por polígono de la alcaldía",
+    value=False,
+    disabled="alcaldia_geo" not in data.columns,
+    help="Usa la alcaldía en la que cae cada punto en lugar del campo 'alcaldia_hecho'."
+)
+columna_alcaldia = "alcaldia_geo" if filtro_geografico else "alcaldia_hecho"
+
 # Filtro Categoría (Usamos CATEGORIA si existe, o 'delito' si prefieres algo más específico)
 # Asumimos que data_loader crea la columna 'CATEGORIA'.
 if "CATEGORIA" in data.columns:
@@ -54,6 +74,15 @@ categoria = st.sidebar.selectbox(
     lista_categorias
 )
 
+# Filtro Año (también elige la partición por año de las teselas precalculadas)
+lista_anios = ["TODOS"]
+if "anio_hecho" in data.columns:
+    lista_anios += [int(a) for a in sorted(data["anio_hecho"].dropna().unique())]
+anio = st.sidebar.selectbox(
+    "Selecciona Año:",
+    lista_anios
+)
+
 # Configuración Técnica del Mapa (Crucial para que funcione bien)
 st.sidebar.markdown("---")
 st.sidebar.header("🗺️ Configuración del Mapa")
@@ -81,16 +110,86 @@ with st.sidebar.form(key="map_config_form"):
     )
     
     porcentaje_seleccionado = opciones_muestreo[seleccion_muestreo_texto]
+
+    # Teselas precalculadas (python tile_utils.py construir): solo si existen
+    manifiesto_tiles = tile_utils.leer_manifiesto()
+    usar_teselas = st.checkbox(
+        "Usar teselas precalculadas (servidor local)",
+        value=False,
+        disabled=manifiesto_tiles is None,
+        help="El navegador descarga solo las teselas visibles al zoom actual. "
+             "Requiere construirlas con 'python tile_utils.py construir'."
+    )
+
+    # El heatmap en rejilla agrega en el servidor: su tamaño no depende del número de eventos
+    heatmap_agregado = st.checkbox(
+        "Heatmap agregado en rejilla (recomendado)",
+        value=True,
+        help="Agrupa los eventos en celdas ponderadas antes de enviarlos al navegador."
+    )
+
+    densidad_kde = st.checkbox(
+        "Densidad calculada en el servidor (imagen KDE)",
+        value=False,
+        help="Estimación de densidad de kernel sobre una rejilla fija de la CDMX; "
+             "se envía como una sola imagen y no cambia con el zoom."
+    )
+
+    vista_dinamica = st.checkbox(
+        "Detalle según zoom y encuadre",
+        value=False,
+        help="El mapa informa su encuadre al servidor, que envía solo los eventos visibles: "
+             "agregados al alejarse y puntos individuales al acercarse."
+    )
+
+    agrupar_puntos = st.checkbox(
+        "Agrupar puntos cercanos (clusters)",
+        value=False,
+        help="Agrupa los puntos en burbujas con el número de eventos al alejar el mapa."
+    )
+
+    # Coroplético por hora: la tabla polígono × hora se calcula una vez por
+    # filtro y cada rango de horas es una consulta (ver map_utils.tabla_violencia_hora)
+    violencia_hora = False
+    horas_violencia = (0, 23)
+    if MAPA_VIOLENCIA_HORA:
+        violencia_hora = st.checkbox(
+            "% de violentos por hora (coroplético)",
+            value=False,
+            help="Colorea cada polígono según el porcentaje de delitos violentos en las horas elegidas."
+        )
+        horas_violencia = st.slider(
+            "Horas del día:",
+            min_value=0,
+            max_value=23,
+            value=(0, 23)
+        )
     map_submit_button = st.form_submit_button(label="🔄 Actualizar Mapa")
 
+# Versión de los datos, de los límites y de las teselas en las claves de los
+# mapas cacheados: si cualquiera cambia, el HTML se vuelve a generar
+version_mapa = (
+    data_loader.version_datos(data),
+    map_utils.version_limites(),
+    manifiesto_tiles.get("generado") if manifiesto_tiles else None,
+)
+
 # === 4. Filtrado de Datos ===
-df_filtrado = data.copy()
+# Sin copia: los filtros crean DataFrames nuevos y nunca se modifica 'data'
+# (con copy-on-write de pandas una escritura tampoco la alcanzaría)
+df_filtrado = data
 
 if alcaldia != "TODAS":
-    df_filtrado = df_filtrado[df_filtrado["alcaldia_hecho"] == alcaldia]
+    with perf_utils.span("filtro_alcaldia"):
+        df_filtrado = df_filtrado[df_filtrado[columna_alcaldia] == alcaldia]
 
 if categoria != "TODAS":
-    df_filtrado = df_filtrado[df_filtrado[columna_filtro] == categoria]
+    with perf_utils.span("filtro_categoria"):
+        df_filtrado = df_filtrado[df_filtrado[columna_filtro] == categoria]
+
+if anio != "TODOS":
+    with perf_utils.span("filtro_anio"):
+        df_filtrado = df_filtrado[df_filtrado["anio_hecho"] == anio]
 
 # === 5. KPIs (Indicadores Clave) - Recuperados de tu archivo ===
 st.markdown("### 📊 Indicadores Clave")
@@ -132,35 +231,111 @@ col_map, col_charts = st.columns((6, 4))
 with col_map:
     st.subheader(f"📍 Mapa de Incidencias ({alcaldia})")
     
-    if df_filtrado.empty:
+    if usar_teselas:
+        # Las capas salen del servidor de teselas: no se envían eventos en la página
+        map_utils.iniciar_servidor_tiles()
+        if categoria != "TODAS" and categoria not in manifiesto_tiles.get("categorias", []):
+            st.warning(f"No hay teselas para la categoría '{categoria}'. Se muestran todas.")
+            categoria_tiles = tile_utils.TODAS
+        else:
+            categoria_tiles = categoria
+        if anio != "TODOS" and anio not in manifiesto_tiles.get("anios", []):
+            st.warning(f"No hay teselas para el año {anio}. Se muestran todos los años.")
+            anio_tiles = tile_utils.TODOS
+        else:
+            anio_tiles = anio
+        if alcaldia != "TODAS":
+            st.info("Las teselas cubren toda la ciudad; el filtro de alcaldía solo centra el mapa.")
+
+        html_mapa = map_utils.render_folium_map_html(
+            ("teselas", version_mapa, alcaldia, columna_alcaldia, categoria_tiles, anio_tiles),
+            df_filtrado,
+            delegaciones_mapa,
+            show_points=False,
+            show_heatmap=False,
+            tiles_partition=(categoria_tiles, anio_tiles)
+        )
+        components.html(html_mapa, height=500)
+    elif df_filtrado.empty:
         st.warning("⚠️ No hay datos para mostrar con los filtros seleccionados.")
+    elif violencia_hora:
+        horas = list(range(horas_violencia[0], horas_violencia[1] + 1))
+        clave_violencia = (version_mapa, alcaldia, columna_alcaldia, categoria, anio)
+        try:
+            poligonos = map_utils.poligonos_violencia(zoom=ZOOM_MAPA)
+            tabla = map_utils.tabla_violencia_hora(df_filtrado, clave_violencia)
+        except Exception as e:
+            st.error(f"No se pudo calcular el porcentaje de violentos por polígono: {e}")
+        else:
+            st.info(f"% de delitos violentos de {horas[0]:02d}:00 a {horas[-1]:02d}:59.")
+            html_mapa = map_utils.html_mapa_cacheado(
+                ("violencia_hora",) + clave_violencia + (horas_violencia, ZOOM_MAPA),
+                lambda: map_utils.render_violencia_hora_map(
+                    poligonos, tabla, horas, delegaciones_mapa, zoom_start=ZOOM_MAPA
+                )
+            )
+            components.html(html_mapa, height=500)
+    elif vista_dinamica:
+        # El mapa base (límites) se monta una vez; en cada recarga solo se
+        # reemplaza la capa de eventos según el último encuadre reportado.
+        clave_filtros = (data_loader.version_datos(data), alcaldia, columna_alcaldia, categoria, anio)
+        indice = map_utils.indice_espacial(df_filtrado, clave_filtros)
+        vista = st.session_state.get("mapa_vista") or {}
+        zoom_vista = vista.get("zoom") or ZOOM_MAPA
+
+        capa, n_vista, modo = map_utils.capa_por_vista(df_filtrado, indice, vista.get("bounds"), zoom_vista)
+        st.info(f"{n_vista:,} eventos en la vista (zoom {zoom_vista}, {modo}).")
+
+        m = map_utils.render_folium_map(
+            df_filtrado,
+            delegaciones_mapa,
+            show_points=False,
+            show_heatmap=False
+        )
+        with perf_utils.span("st_folium", modo=modo):
+            # Solo la vista dinámica usa el componente: se importa aquí y no al cargar la página
+            from streamlit_folium import st_folium
+            st_folium(
+                m,
+                key="mapa_vista",
+                height=500,
+                use_container_width=True,
+                feature_group_to_add=capa,
+                returned_objects=["bounds", "zoom"]
+            )
     else:
         # Lógica de muestreo para rendimiento
-        total_registros = len(df_filtrado)
-        num_points = int(total_registros * porcentaje_seleccionado)
+        # (solo hace falta si se envían eventos individuales al navegador)
+        # La muestra es estable (rango asignado en la carga): misma muestra en
+        # cada recarga, estratificada por alcaldía.
+        requiere_muestreo = ("Puntos" in tipo_mapa) or not (heatmap_agregado or densidad_kde)
+        fraccion_mapa = porcentaje_seleccionado if requiere_muestreo else 1.0
         
-        if num_points < total_registros:
-            df_mapa = df_filtrado.sample(n=num_points)
-            st.info(f"Visualizando {num_points} eventos (Muestreo: {seleccion_muestreo_texto})")
+        if fraccion_mapa < 1:
+            with perf_utils.span("muestreo"):
+                df_mapa = data_loader.muestra_estable(df_filtrado, fraccion_mapa)
+            st.info(f"Visualizando {len(df_mapa)} eventos (Muestreo: {seleccion_muestreo_texto})")
         else:
-            df_mapa = df_filtrado.copy()
+            df_mapa = df_filtrado
 
-        # Renderizado usando la función robusta
-        m = map_utils.render_folium_map(
+        # Renderizado usando la función robusta; el HTML se reutiliza (entre
+        # sesiones) para la misma combinación de filtros, muestreo y capas.
+        clave_mapa = (
+            version_mapa, alcaldia, columna_alcaldia, categoria, anio, fraccion_mapa,
+            tuple(sorted(tipo_mapa)), heatmap_agregado, densidad_kde, agrupar_puntos, ZOOM_MAPA
+        )
+        html_mapa = map_utils.render_folium_map_html(
+            clave_mapa,
             df_mapa,
-            delegaciones,
+            delegaciones_mapa,
             show_points=("Puntos" in tipo_mapa),
-            show_heatmap=("Heatmap" in tipo_mapa)
+            show_heatmap=("Heatmap" in tipo_mapa),
+            heatmap_mode="kde" if densidad_kde else ("grid" if heatmap_agregado else "raw"),
+            points_mode="cluster" if agrupar_puntos else "canvas"
         )
         
-        # --- AQUÍ ESTÁ EL FIX DEL PARPADEO ---
-        # returned_objects=[] evita que Streamlit recargue la página al hacer zoom/pan
-        st_folium(
-            m, 
-            height=500, 
-            use_container_width=True, 
-            returned_objects=[] 
-        )
+        # HTML estático (sin ida y vuelta de eventos): el zoom/pan no recarga la página
+        components.html(html_mapa, height=500)
 
 # --- Columna Derecha: GRÁFICAS ADICIONALES ---
 with col_charts:
@@ -189,10 +364,15 @@ with st.expander("ℹ️ Información técnica de esta vista"):
     **Resumen de Filtros Activos:**
     - **Alcaldía:** {alcaldia}
     - **Categoría:** {categoria}
+    - **Año:** {anio}
     - **Registros Totales en Pantalla:** {len(df_filtrado):,}
+    - **Filtro de alcaldía por:** {"polígono (ubicación del punto)" if filtro_geografico else "campo capturado"}
+    - **Puntos fuera de CDMX:** {int(df_filtrado["fuera_cdmx"].sum()) if "fuera_cdmx" in df_filtrado.columns else "N/A"}
     
     **Nota sobre el mapa:** Si notas lentitud, reduce el porcentaje de "Densidad de puntos" en la barra lateral.
     """)
 
-# Botón de cerrar sesión al final del sidebar
+# Medición de memoria del rerun; panel de rendimiento (solo privilegiados) y botón de cerrar sesión al final del sidebar
+memory_utils.finalizar_rerun()
+perf_utils.renderizar_panel_sidebar()
 auth_utils.renderizar_logout_sidebar()
\ No newline at end of file
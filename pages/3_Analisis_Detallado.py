@@ -1,5 +1,22 @@
+import os
 import streamlit as st
+import streamlit.components.v1 as components
+import numpy as np
 import auth_utils
+import data_loader    # Módulo local de carga de datos
+import map_utils      # Módulo local de utilidades de mapa
+import cluster_utils  # Clustering geoespacial (zonas críticas)
+import hotspot_utils  # Puntos calientes / fríos (Gi*)
+import forecast_utils # Pronósticos mensuales en lote
+import anomaly_utils  # Detección incremental de anomalías
+import correlation_utils  # Correlación de perfiles temporales entre alcaldías
+import near_repeat_utils  # Prueba de Knox (near-repeat) con Monte Carlo
+import export_utils   # Exportación por bloques (CSV / Parquet)
+import report_utils   # Reportes en segundo plano (cola de trabajos)
+import perf_utils     # Medición de tiempos por tramo
+import memory_utils   # Contabilidad de memoria (datasets, cachés, reruns)
+import plot_utils     # Módulo local de visualizaciones (Altair)
+from config import COLORES_HOTSPOT, CUADRANTES_GEOJSON, EXPORT_URL_PUBLICA
 
 # === 1. Configuración de la Página ===
 st.set_page_config(
@@ -10,44 +27,379 @@ st.set_page_config(
 
 # Control de acceso: solo usuarios privilegiados
 auth_utils.requiere_autenticacion(user_types=["privilegiado"])
+perf_utils.iniciar_rerun("Analisis Detallado")
+memory_utils.iniciar_rerun("Analisis Detallado")
 
 # === 2. Encabezado ===
 st.title("🔍 Análisis Detallado")
 st.subheader("Módulo Avanzado de Análisis")
+st.success(f"✅ Acceso concedido para: **{st.session_state.username}**")
+
+# === 3. Carga de Datos ===
+RUTA_DATOS = "hour_crimes_optimized.csv"
+data = data_loader.load_data(RUTA_DATOS)
+
+if data.empty:
+    st.error("No se pudieron cargar los datos.")
+    st.stop()
+
+delegaciones_mapa = map_utils.load_boundaries(zoom=11)
+
+# === 4. Sidebar: Filtros ===
+st.sidebar.header("⚙️ Filtros del Análisis")
+
+categoria = st.sidebar.selectbox(
+    "Selecciona Categoría:",
+    ["TODAS"] + sorted(data["CATEGORIA"].dropna().unique())
+)
+anio = st.sidebar.selectbox(
+    "Selecciona Año:",
+    ["TODOS"] + sorted(int(a) for a in data["anio_hecho"].dropna().unique())
+)
 
-# === 3. Contenido en Construcción ===
 st.markdown("---")
 
-col1, col2, col3 = st.columns([1, 2, 1])
-
-with col2:
-    st.info("""
-    ### 🚧 Módulo en Construcción
-    
-    Esta página está reservada para análisis avanzados y funcionalidades exclusivas 
-    para usuarios privilegiados.
-    
-    **Próximamente:**
-    - Análisis predictivos
-    - Correlaciones avanzadas
-    - Reportes personalizados
-    - Exportación de datos
-    - Configuraciones del sistema
-    """)
-    
-    st.markdown("---")
-    
-    st.success(f"✅ Acceso concedido para: **{st.session_state.username}**")
+# === 5. Módulos de Análisis ===
+tab_clusters, tab_hotspots, tab_pronosticos, tab_anomalias, tab_correlaciones, tab_near_repeat = st.tabs(
+    ["🔥 Zonas Críticas", "🌡️ Puntos Calientes (Gi*)", "📈 Análisis Predictivo", "🚨 Anomalías",
+     "🔗 Correlaciones", "🔁 Near-repeat"]
+)
+
+# --- Clustering Geoespacial ---
+with tab_clusters:
+    st.markdown("#### Clustering Geoespacial: Identificación de zonas críticas")
+
+    col_param1, col_param2 = st.columns(2)
+    with col_param1:
+        radio_m = st.slider(
+            "Radio de vecindad (m):",
+            min_value=100, max_value=500, value=cluster_utils.RADIO_CLUSTER_M, step=50
+        )
+    with col_param2:
+        min_eventos = st.number_input(
+            "Mínimo de eventos en el vecindario (0 = automático):",
+            min_value=0, value=0, step=10,
+            help=f"Con 0 se usa el percentil {cluster_utils.PERCENTIL_NUCLEO} de la densidad de los datos filtrados."
+        )
+
+    with perf_utils.span("clusters"):
+        clusters = cluster_utils.clusters_por_filtro(
+            data, data_loader.version_datos(data), categoria, anio, radio_m, int(min_eventos) or None
+        )
+
+    if clusters.empty:
+        st.warning("⚠️ No se encontraron zonas críticas con estos parámetros.")
+    else:
+        col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
+        col_kpi1.metric("Zonas detectadas", f"{len(clusters):,}")
+        col_kpi2.metric("Eventos en zonas", f"{int(clusters['eventos'].sum()):,}")
+        col_kpi3.metric("Área total (km²)", f"{clusters['area_km2'].sum():,.1f}")
+
+        col_mapa, col_tabla = st.columns((6, 4))
+        with col_mapa:
+            m = map_utils.render_cluster_map(clusters, delegaciones_mapa)
+            components.html(m.get_root().render(), height=550)
+        with col_tabla:
+            st.dataframe(
+                clusters.drop(columns="geometry").round(
+                    {"area_km2": 2, "densidad_km2": 0, "pct_violentos": 1}
+                ),
+                hide_index=True,
+                use_container_width=True,
+                height=550
+            )
+
+# --- Puntos calientes / fríos (Getis-Ord Gi*) ---
+with tab_hotspots:
+    st.markdown("#### Puntos calientes y fríos estadísticamente significativos")
+    # Los cuadrantes solo se ofrecen si su GeoJSON está configurado
+    unidad_hotspot = "Rejilla"
+    if CUADRANTES_GEOJSON:
+        unidad_hotspot = st.radio("Unidad espacial", ["Rejilla", "Cuadrantes"], horizontal=True, key="unidad_hotspot")
+    poligonos_hotspot = CUADRANTES_GEOJSON if unidad_hotspot == "Cuadrantes" else ""
+    st.caption(
+        ("Cuadrantes" if poligonos_hotspot else f"Rejilla de {hotspot_utils.TAMANO_CELDA_HOTSPOT_M} m")
+        + " con vecindad tipo reina. Se calcula una sola vez para todas las categorías y años."
+    )
+
+    with perf_utils.span("hotspots"):
+        celdas = hotspot_utils.hotspots_filtro(data, categoria, anio, poligonos=poligonos_hotspot)
+    conteo_clases = celdas["clase"].value_counts()
+
+    col_mapa, col_resumen = st.columns((6, 4))
+    with col_mapa:
+        m = map_utils.render_hotspot_map(celdas, delegaciones_mapa)
+        components.html(m.get_root().render(), height=550)
+    with col_resumen:
+        st.dataframe(
+            {
+                "Clase": list(COLORES_HOTSPOT),
+                "Celdas": [int(conteo_clases.get(c, 0)) for c in COLORES_HOTSPOT],
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.markdown("##### Celdas más calientes")
+        st.dataframe(
+            celdas.nlargest(10, "z")[["celda", "eventos", "z", "clase"]].round({"z": 2}),
+            hide_index=True,
+            use_container_width=True
+        )
+
+# --- Análisis Predictivo (pronósticos mensuales) ---
+with tab_pronosticos:
+    st.markdown("#### Pronóstico mensual por alcaldía y categoría")
+    st.caption(
+        "Todas las series alcaldía × categoría se ajustan juntas (Holt-Winters aditivo y "
+        "línea base estacional); se muestra el modelo con menor error en el último año. "
+        "El filtro de año no aplica a esta vista."
+    )
+    try:
+        with perf_utils.span("pronosticos"):
+            resultado = forecast_utils.pronosticos(data)
+    except Exception as e:
+        resultado = None
+        st.warning(f"No se pudieron calcular los pronósticos: {e}")
+
+    if resultado is not None:
+        alcaldia_pron = st.selectbox(
+            "Selecciona Alcaldía:",
+            [forecast_utils.TODAS] + sorted(data["alcaldia_hecho"].dropna().unique().astype(str)),
+            key="alcaldia_pronostico"
+        )
+        i_serie = resultado["etiquetas"].index((alcaldia_pron, categoria))
+        errores = [resultado["mae_hw"][i_serie], resultado["mae_ingenuo"][i_serie]]
+        errores = [e for e in errores if not np.isnan(e)]
+
+        col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
+        col_kpi1.metric("Modelo", resultado["modelo"][i_serie])
+        col_kpi2.metric(
+            "Total pronosticado (12 meses)", f"{resultado['pronostico'][i_serie].sum():,.0f}",
+            delta=f"{resultado['pronostico'][i_serie].sum() - resultado['historia'][i_serie, -12:].sum():,.0f} vs último año"
+        )
+        col_kpi3.metric(
+            "Error medio (validación)",
+            f"{min(errores):,.1f} delitos/mes" if errores else "N/A (historia corta)"
+        )
+
+        st.altair_chart(
+            plot_utils.plot_pronostico(
+                forecast_utils.serie_pronostico(resultado, alcaldia_pron, categoria),
+                titulo=f"Pronóstico Mensual – {alcaldia_pron} / {categoria}"
+            ),
+            use_container_width=True
+        )
+
+# --- Alertas de anomalías (estado incremental EWMA) ---
+with tab_anomalias:
+    st.markdown("#### Alertas: meses con conteos por encima de lo habitual")
+    st.caption(
+        f"Media y varianza exponenciales (α = {anomaly_utils.ALFA_EWMA}) por alcaldía × categoría × "
+        f"franja horaria; se marca un mes si supera la media esperada en más de "
+        f"{anomaly_utils.UMBRAL_Z:g} desviaciones. El estado se actualiza solo con los meses nuevos; "
+        "las alertas del mes más reciente son provisionales (puede estar incompleto)."
+    )
+
+    col_meses, col_categorias = st.columns((3, 7))
+    with col_meses:
+        ultimos_meses = st.slider("Últimos meses:", min_value=1, max_value=36, value=12)
+    with col_categorias:
+        categorias_alerta = (
+            [categoria] if categoria != "TODAS"
+            else st.multiselect(
+                "Categorías:",
+                sorted(data["CATEGORIA"].dropna().unique().astype(str)),
+                default=[c for c in ("Robo", "Homicidio/Feminicidio") if c in set(data["CATEGORIA"].astype(str))]
+            )
+        )
+
+    anomalias = anomaly_utils.anomalias_detectadas(RUTA_DATOS, categorias_alerta, ultimos_meses)
+    if not anomalias:
+        st.info("No se detectaron anomalías en el periodo seleccionado.")
+    else:
+        st.metric("Alertas en el periodo", f"{len(anomalias):,}")
+        st.dataframe(
+            sorted(anomalias, key=lambda a: (a["anio"], a["mes"], a["z"]), reverse=True),
+            hide_index=True,
+            use_container_width=True
+        )
+
+# --- Correlaciones entre alcaldías (perfiles día × hora) ---
+with tab_correlaciones:
+    st.markdown("#### Alcaldías con patrones temporales similares")
+    st.caption(
+        "Correlación entre los perfiles día de la semana × hora (proporción de delitos en cada una "
+        "de las 168 franjas). Las alcaldías se ordenan por agrupamiento jerárquico."
+    )
+    with perf_utils.span("correlaciones"):
+        resultado_corr = correlation_utils.correlaciones_alcaldias(
+            data, data_loader.version_datos(data), categoria, anio
+        )
+
+    if len(resultado_corr["alcaldias"]) < 2:
+        st.warning("⚠️ No hay suficientes alcaldías con datos para este filtro.")
+    else:
+        col_heatmap, col_pares = st.columns((6, 4))
+        with col_heatmap:
+            st.altair_chart(
+                plot_utils.plot_correlacion_alcaldias(
+                    resultado_corr["alcaldias"], resultado_corr["correlacion"]
+                ),
+                use_container_width=True
+            )
+        with col_pares:
+            st.markdown("##### Pares más similares")
+            st.dataframe(
+                correlation_utils.pares_similares(resultado_corr),
+                hide_index=True,
+                use_container_width=True
+            )
+
+# --- Near-repeat (prueba de Knox) ---
+with tab_near_repeat:
+    st.markdown("#### Patrones near-repeat: delitos cercanos en espacio y tiempo")
+    st.caption(
+        "Razón de Knox = pares observados / pares esperados si las fechas fueran aleatorias "
+        f"(permutaciones Monte Carlo). '*' indica p < {near_repeat_utils.NIVEL_SIGNIFICANCIA}. "
+        f"Usa la fecha del hecho de '{near_repeat_utils.RUTA_DATOS_FECHAS}'."
+    )
+
+    col_dist, col_paso, col_perm = st.columns(3)
+    with col_dist:
+        distancia_max = st.selectbox("Distancia máxima (m):", [200, 400, 800], index=1)
+    with col_paso:
+        paso_temporal = st.selectbox("Banda temporal (días):", [1, 7, 14], index=1)
+    with col_perm:
+        n_permutaciones = st.selectbox("Permutaciones:", [19, 99, 199], index=1)
+
+    if st.toggle("Ejecutar análisis near-repeat", key="ejecutar_near_repeat"):
+        data_fechas = data_loader.load_data(near_repeat_utils.RUTA_DATOS_FECHAS)
+        resultado_nr = near_repeat_utils.analisis_near_repeat(
+            data_fechas, data_loader.version_datos(data_fechas), categoria, anio,
+            distancia_max, distancia_max // 4, paso_temporal, n_permutaciones
+        )
+        col_kpi1, col_kpi2 = st.columns(2)
+        col_kpi1.metric("Eventos analizados", f"{resultado_nr['eventos']:,}")
+        col_kpi2.metric(f"Pares a menos de {distancia_max} m", f"{resultado_nr['pares']:,}")
+        if resultado_nr["muestreado"]:
+            st.info(
+                f"ℹ️ Se usó una muestra estable de {near_repeat_utils.MAX_EVENTOS_NEAR_REPEAT:,} eventos; "
+                "filtra por categoría o año para analizar todos."
+            )
+        st.markdown("##### Razón de Knox (distancia × tiempo entre eventos)")
+        st.dataframe(near_repeat_utils.tabla_resumen(resultado_nr), use_container_width=True)
+        with st.expander("Pares observados y esperados"):
+            st.dataframe(resultado_nr["observados"], use_container_width=True)
+            st.dataframe(resultado_nr["esperados"].round(1), use_container_width=True)
+
+# === 6. Exportación de Datos ===
+st.markdown("---")
+st.markdown("#### 💾 Exportación de datos")
+st.caption(
+    f"Se exportan los registros de la selección actual (categoría: {categoria}, año: {anio}). "
+    "El archivo se escribe por bloques en disco y queda disponible durante una hora."
+)
+col_formato, col_boton = st.columns((3, 7))
+with col_formato:
+    formato = st.radio("Formato:", list(export_utils.FORMATOS), horizontal=True)
+with col_boton:
+    parametros_exportacion = (data_loader.version_datos(data), categoria, anio, formato)
+    if st.button("📦 Preparar descarga"):
+        nombre = f"delitos_{categoria}_{anio}{export_utils.FORMATOS[formato]['extension']}".replace("/", "-")
+        try:
+            with st.spinner("Generando archivo..."):
+                ruta = export_utils.preparar_descarga(data, nombre, categoria, anio, formato)
+            st.session_state["descarga_exportacion"] = (parametros_exportacion, ruta)
+        except Exception as e:
+            st.error(f"No se pudo generar la exportación: {e}")
+    descarga = st.session_state.get("descarga_exportacion")
+    # El archivo solo corresponde a la selección con la que se generó y vence
+    if descarga is not None and descarga[0] == parametros_exportacion and os.path.isfile(descarga[1]):
+        if EXPORT_URL_PUBLICA:
+            export_utils.iniciar_servidor_descargas()
+            st.link_button("⬇️ Descargar datos filtrados", export_utils.url_descarga(descarga[1]))
+        else:
+            with open(descarga[1], "rb") as f:
+                contenido = f.read()
+            st.download_button(
+                "⬇️ Descargar datos filtrados",
+                data=contenido,
+                file_name=os.path.basename(descarga[1]),
+                mime=export_utils.FORMATOS[formato]["mime"],
+                on_click="ignore",
+            )
+
+# === 7. Reportes ===
+st.markdown("---")
+st.markdown("#### 📄 Exportación de reportes")
+st.caption(
+    "El reporte se genera en segundo plano; puedes seguir usando la página mientras tanto. "
+    "Un reporte ya generado con los mismos parámetros se entrega de inmediato."
+)
+lista_alcaldias = sorted(data["alcaldia_hecho"].dropna().unique().astype(str))
+with st.form("form_reporte"):
+    alcaldias_reporte = st.multiselect("Alcaldías del reporte:", lista_alcaldias, default=lista_alcaldias)
+    formato_reporte = st.radio("Formato del reporte:", list(report_utils.FORMATOS_REPORTE), horizontal=True)
+    generar = st.form_submit_button("Generar reporte")
+
+if generar:
+    if not alcaldias_reporte:
+        st.warning("⚠️ Selecciona al menos una alcaldía.")
+    else:
+        try:
+            trabajo = report_utils.solicitar_reporte(
+                data, RUTA_DATOS, alcaldias_reporte, categoria, anio, formato_reporte
+            )
+            st.session_state["reporte_clave"] = trabajo.clave
+        except RuntimeError as e:
+            st.error(str(e))
+
+trabajo_actual = report_utils.obtener_trabajo(st.session_state.get("reporte_clave"))
+
+
+# Solo se consulta periódicamente el avance mientras el trabajo sigue activo
+@st.fragment(run_every=1.0 if trabajo_actual is not None and trabajo_actual.activo else None)
+def panel_reporte():
+    trabajo = report_utils.obtener_trabajo(st.session_state.get("reporte_clave"))
+    if trabajo is None:
+        return
+    if trabajo.activo:
+        st.progress(trabajo.progreso, text=trabajo.mensaje)
+    elif trabajo.estado == report_utils.ERROR:
+        st.error(trabajo.mensaje)
+    else:
+        st.download_button(
+            "⬇️ Descargar reporte",
+            data=trabajo.resultado,
+            file_name=trabajo.nombre_archivo,
+            mime=report_utils.FORMATOS_REPORTE[trabajo.parametros["formato"]]["mime"],
+            on_click="ignore"
+        )
+    # Al terminar, un rerun completo redefine el fragmento sin consulta periódica
+    if not trabajo.activo and trabajo_actual is not None and trabajo_actual.activo:
+        st.rerun()
+
+
+panel_reporte()
+
+# === 8. Memoria del Proceso ===
+st.markdown("---")
+st.markdown("#### 🧠 Memoria del proceso")
+st.caption(
+    "Consumo de los datasets cargados, de cada caché y de los reruns. "
+    "Las métricas se exportan en formato Prometheus para fijar presupuestos y detectar fugas."
+)
+if st.toggle("Mostrar contabilidad de memoria", key="ver_memoria"):
+    memory_utils.renderizar_vista_admin()
 
-# === 4. Placeholder para futuras funcionalidades ===
+# === 9. Funcionalidades Futuras ===
 with st.expander("📊 Vista Previa de Funcionalidades Futuras"):
     st.markdown("""
-    - **Análisis Temporal Avanzado**: Series de tiempo con predicciones
-    - **Clustering Geoespacial**: Identificación de zonas críticas
-    - **Análisis de Patrones**: Detección de tendencias y anomalías
+    - **Análisis de Patrones**: Detección de tendencias estacionales
     - **Dashboard Personalizado**: Configuración de métricas y alertas
-    - **Exportación de Reportes**: Generación de informes en PDF/Excel
     """)
 
-# Botón de cerrar sesión al final del sidebar
+# Medición de memoria del rerun; panel de rendimiento (solo privilegiados) y botón de cerrar sesión al final del sidebar
+memory_utils.finalizar_rerun()
+perf_utils.renderizar_panel_sidebar()
 auth_utils.renderizar_logout_sidebar()
@@ -0,0 +1,266 @@
+# perf_utils.py
+# -----------------------------------------------------------------------------
+# INSTRUMENTACIÓN DE TIEMPOS (TRAMOS / SPANS)
+# -----------------------------------------------------------------------------
+# 'span' (context manager) y 'medir' (decorador) miden tramos anidados del
+# rerun: cada tramo conoce a su padre, de modo que el panel muestra el árbol
+# completo del último rerun. Cada tramo terminado se escribe como una línea
+# JSON en PERF_LOG y su duración entra a una ventana móvil por nombre para
+# calcular p50 / p95.
+#
+# Desactivada, 'span' devuelve un contexto nulo compartido y 'medir' llama
+# directamente a la función: el costo es una sola lectura de variable global.
+#
+# 'python perf_utils.py arranque' mide, en procesos nuevos, cuánto tarda en
+# importarse cada punto de entrada (login y páginas) y qué módulos pesados
+# carga, además del costo diferido del primer gráfico y del primer mapa.
+# -----------------------------------------------------------------------------
+import argparse
+import ast
+import contextlib
+import functools
+import glob
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import auth_utils
+from config import PERF_HABILITADO, PERF_LOG, PERF_VENTANA
+
+_HABILITADO = PERF_HABILITADO
+_NULO = contextlib.nullcontext()
+_estado = threading.local()   # árbol del rerun en curso (Streamlit usa un hilo por sesión)
+_MUESTRAS = {}                # nombre -> deque de duraciones (s), compartido por el proceso
+_MUESTRAS_LOCK = threading.Lock()
+_logger = logging.getLogger("dashboard.perf")
+
+
+def activar(valor=True):
+    """Activa o desactiva la medición para todo el proceso."""
+    global _HABILITADO
+    if valor and not _logger.handlers:
+        os.makedirs(os.path.dirname(PERF_LOG) or ".", exist_ok=True)
+        manejador = logging.FileHandler(PERF_LOG, encoding="utf-8")
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(manejador)
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+    _HABILITADO = bool(valor)
+
+
+if _HABILITADO:
+    activar(True)
+
+
+class _Tramo:
+    __slots__ = ("nombre", "atributos", "inicio", "duracion", "hijos")
+
+    def __init__(self, nombre, atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+        self.duracion = None
+        self.hijos = []
+
+    def __enter__(self):
+        pila = getattr(_estado, "pila", None)
+        if pila is None:
+            iniciar_rerun()
+            pila = _estado.pila
+        (pila[-1].hijos if pila else _estado.raices).append(self)
+        pila.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        self.duracion = time.perf_counter() - self.inicio
+        pila = _estado.pila
+        ruta = "/".join(t.nombre for t in pila)
+        pila.pop()
+        with _MUESTRAS_LOCK:
+            muestras = _MUESTRAS.get(self.nombre)
+            if muestras is None:
+                muestras = _MUESTRAS[self.nombre] = deque(maxlen=PERF_VENTANA)
+            muestras.append(self.duracion)
+        if _logger.handlers:
+            _logger.info(json.dumps({
+                "ts": time.time(), "rerun": _estado.rerun, "pagina": _estado.pagina,
+                "span": self.nombre, "ruta": ruta, "ms": round(self.duracion * 1000, 3),
+                "error": tipo_error.__name__ if tipo_error else None, **self.atributos,
+            }, ensure_ascii=False, default=str))
+        return False
+
+
+def span(nombre, **atributos):
+    """Context manager que mide un tramo: ``with perf_utils.span("filtro_anio"): ...``"""
+    if not _HABILITADO:
+        return _NULO
+    return _Tramo(nombre, atributos)
+
+
+def medir(nombre=None):
+    """Decorador que mide cada llamada a la función (por defecto 'modulo.funcion')."""
+    def decorador(funcion):
+        etiqueta = nombre or f"{funcion.__module__}.{funcion.__name__}"
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _HABILITADO:
+                return funcion(*args, **kwargs)
+            with _Tramo(etiqueta, {}):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def iniciar_rerun(pagina=None):
+    """Descarta el árbol del rerun anterior de esta sesión (llamar al inicio de cada página)."""
+    _estado.pila = []
+    _estado.raices = []
+    _estado.rerun = uuid.uuid4().hex[:8]
+    _estado.pagina = pagina
+
+
+def arbol_rerun():
+    """Líneas (nivel, nombre, ms) del árbol de tramos del rerun actual, en orden de inicio."""
+    lineas = []
+
+    def recorrer(tramos, nivel):
+        for t in tramos:
+            lineas.append((nivel, t.nombre, None if t.duracion is None else t.duracion * 1000))
+            recorrer(t.hijos, nivel + 1)
+
+    recorrer(getattr(_estado, "raices", []), 0)
+    return lineas
+
+
+def estadisticas():
+    """DataFrame con n, p50 y p95 (ms) de la ventana móvil de cada tramo."""
+    with _MUESTRAS_LOCK:
+        copias = {nombre: np.fromiter(m, dtype=np.float64) for nombre, m in _MUESTRAS.items()}
+    filas = [
+        {"span": nombre, "n": m.size,
+         "p50_ms": round(float(np.percentile(m, 50)) * 1000, 1),
+         "p95_ms": round(float(np.percentile(m, 95)) * 1000, 1)}
+        for nombre, m in copias.items() if m.size
+    ]
+    return pd.DataFrame(filas, columns=["span", "n", "p50_ms", "p95_ms"]).sort_values("p95_ms", ascending=False)
+
+
+def renderizar_panel_sidebar():
+    """Panel de rendimiento en el sidebar, solo para usuarios privilegiados."""
+    if not auth_utils.es_privilegiado():
+        return
+    with st.sidebar.expander("⏱️ Rendimiento"):
+        # Sin 'key': el control refleja el estado global aunque otra sesión lo cambie
+        activo = st.toggle("Medir tiempos", value=_HABILITADO)
+        if activo != _HABILITADO:
+            activar(activo)
+            st.rerun()
+        if not _HABILITADO:
+            st.caption("Medición desactivada (se activa para todo el proceso).")
+            return
+
+        st.markdown("**Último rerun**")
+        st.code(
+            "\n".join(
+                f"{'  ' * nivel}{nombre:<{40 - 2 * nivel}} "
+                f"{'...' if ms is None else f'{ms:8.1f} ms'}"
+                for nivel, nombre, ms in arbol_rerun()
+            ) or "(sin tramos)",
+            language=None
+        )
+        st.markdown("**Percentiles (ventana móvil)**")
+        st.dataframe(estadisticas(), hide_index=True, use_container_width=True)
+        st.caption(f"Registro JSON: {PERF_LOG}")
+
+
+# --- Tiempo de arranque (importaciones) ---
+
+MODULOS_PESADOS = (
+    "pandas", "altair", "folium", "branca", "geopandas", "shapely",
+    "streamlit_folium", "requests", "scipy", "pyarrow", "matplotlib",
+)
+# Importaciones diferidas hasta el primer uso (ver plot_utils y map_utils)
+IMPORTACIONES_DIFERIDAS = {
+    "primer gráfico": ["altair"],
+    "primer mapa": ["folium", "folium.plugins", "map_layers"],
+    "vista dinámica del mapa": ["streamlit_folium"],
+}
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+def modulos_importados(ruta):
+    """Módulos que importa 'ruta' al nivel superior del archivo (en orden)."""
+    with open(ruta, encoding="utf-8") as f:
+        arbol = ast.parse(f.read(), filename=ruta)
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos.extend(alias.name for alias in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module and not nodo.level:
+            modulos.append(nodo.module)
+    return modulos
+
+
+def tiempo_importacion(modulos, previos=(), repeticiones=3):
+    """
+    Milisegundos (mínimo de 'repeticiones' procesos nuevos) que tarda en
+    importarse 'modulos' después de 'previos', y los MODULOS_PESADOS cargados.
+    """
+    codigo = (
+        "import json, sys, time\n"
+        f"sys.path.insert(0, {_RAIZ!r})\n"
+        f"for m in {list(previos)!r}: __import__(m)\n"
+        "t = time.perf_counter()\n"
+        f"for m in {list(modulos)!r}: __import__(m)\n"
+        "ms = (time.perf_counter() - t) * 1000\n"
+        f"print(json.dumps({{'ms': ms, 'pesados': [m for m in {list(MODULOS_PESADOS)!r} if m in sys.modules]}}))\n"
+    )
+    mediciones = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", codigo], cwd=_RAIZ, capture_output=True, text=True, check=True
+        ).stdout
+        mediciones.append(json.loads(salida.strip().splitlines()[-1]))
+    return min(m["ms"] for m in mediciones), mediciones[-1]["pesados"]
+
+
+def reporte_arranque(repeticiones=3):
+    """DataFrame con el tiempo de importación y los módulos pesados de cada punto de entrada."""
+    entradas = [("login (app_dashboard.py)", modulos_importados(os.path.join(_RAIZ, "app_dashboard.py")), ())]
+    for ruta in sorted(glob.glob(os.path.join(_RAIZ, "pages", "*.py"))):
+        entradas.append((os.path.basename(ruta), modulos_importados(ruta), ()))
+    # El costo diferido se mide sobre un proceso que ya importó streamlit y pandas
+    for nombre, modulos in IMPORTACIONES_DIFERIDAS.items():
+        entradas.append((nombre, modulos, ("streamlit", "pandas")))
+
+    filas = []
+    for nombre, modulos, previos in entradas:
+        ms, pesados = tiempo_importacion(modulos, previos, repeticiones)
+        filas.append({"entrada": nombre, "ms": round(ms, 1), "modulos_pesados": ", ".join(pesados) or "-"})
+    return pd.DataFrame(filas, columns=["entrada", "ms", "modulos_pesados"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentación de rendimiento del dashboard")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_arranque = sub.add_parser("arranque", help="Mide el tiempo de importación de cada página")
+    p_arranque.add_argument("--repeticiones", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.comando == "arranque":
+        print(reporte_arranque(args.repeticiones).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,28 @@
 # Librería necesaria para el funcionamiento de este archivo
-import altair as alt
+# Altair se importa dentro de cada función: solo se carga al dibujar el
+# primer gráfico, no al importar este módulo (p. ej. desde report_utils).
 import pandas as pd
 import numpy as np
 from config import PALETA_PRINCIPAL, ESCALA_ROJOS, COLORES_STACK
+import perf_utils
 
 # Definición estándar del eje X para los gráficos
-EJE_X_HORAS = alt.Axis(
-    values=list(range(0, 24, 2)), 
-    labelAngle=0, 
-    title='Hora del Día'
-)
+def eje_x_horas():
+    import altair as alt
+    return alt.Axis(
+        values=list(range(0, 24, 2)),
+        labelAngle=0,
+        title='Hora del Día'
+    )
 
 # GRÁFICOS AUXILIARES
 
 # Gráfico complemento de página Mapa
+@perf_utils.medir()
 def plot_delitos_por_alcaldia(data):
     """Gráfica de barras: Conteo de delitos por alcaldía."""
+    import altair as alt
+
     if data.empty:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -44,8 +51,11 @@ def plot_delitos_por_alcaldia(data):
 # GRÁFICOS DASHBOARD INICIAL
 
 # Gráfico 1: Barras Apiladas
+@perf_utils.medir()
 def plot_crimenes_violentos_por_hora(data):
     """Gráfico 1: Barras apiladas."""
+    import altair as alt
+
     if data.empty or 'CATEGORIA' not in data.columns:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -71,7 +81,7 @@ def plot_crimenes_violentos_por_hora(data):
     )
     
     bars = alt.Chart(df_aggregated).mark_bar().encode(
-        x=alt.X('hora_hecho_h:O', axis=EJE_X_HORAS),
+        x=alt.X('hora_hecho_h:O', axis=eje_x_horas()),
         y=alt.Y('Total:Q', title='Número de Crímenes', stack='zero'),
         color=alt.Color('CATEGORIA:N', 
                         title='Categoría de crimen',
@@ -123,8 +133,11 @@ def plot_crimenes_violentos_por_hora(data):
         return bars.properties(height=300).configure_view(strokeWidth=0).configure_axis(labelFontSize=11, titleFontSize=12)
 
 # Gráfico 2: Áreas apiladas
+@perf_utils.medir()
 def plot_volumen_total_violencia_hora(data):
     """Gráfico 2: Área apilada."""
+    import altair as alt
+
     if data.empty or 'CATEGORIA' not in data.columns:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -139,7 +152,7 @@ def plot_volumen_total_violencia_hora(data):
     df_grouped = df_plot.groupby(['hora_hecho_h', 'Violento']).size().reset_index(name='Total')
     
     base = alt.Chart(df_grouped).encode(
-        x=alt.X('hora_hecho_h:Q', axis=EJE_X_HORAS),
+        x=alt.X('hora_hecho_h:Q', axis=eje_x_horas()),
         tooltip=[alt.Tooltip('hora_hecho_h'), alt.Tooltip('Violento'), alt.Tooltip('Total', format=',')]
     )
     
@@ -186,8 +199,11 @@ def plot_volumen_total_violencia_hora(data):
     )
 
 # Gráfico 3: Linea + Promedios Móviles
+@perf_utils.medir()
 def plot_ratio_violencia_hora(data):
     """Gráfico 3: Línea de Ratio con Leyenda corregida (sin título)."""
+    import altair as alt
+
     if data.empty or 'CATEGORIA' not in data.columns:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -209,7 +225,7 @@ def plot_ratio_violencia_hora(data):
     
     # Gráfico base
     base = alt.Chart(ratio_df).encode(
-        x=alt.X("hora:Q", axis=EJE_X_HORAS)
+        x=alt.X("hora:Q", axis=eje_x_horas())
     )
 
     # Se define la escala con los nuevos nombres
@@ -281,8 +297,11 @@ def plot_ratio_violencia_hora(data):
     )
 
 # Gráfico 4: Heatmap
+@perf_utils.medir()
 def plot_heatmap_dia_hora(data):
     """Heatmap: Porcentaje de delitos violentos por día de la semana y hora."""
+    import altair as alt
+
     if data.empty:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -322,7 +341,7 @@ def plot_heatmap_dia_hora(data):
     df_plot['Porcentaje_Violentos'] = df_plot['Porcentaje_Violentos'].fillna(0)
 
     heatmap = alt.Chart(df_plot).mark_rect().encode(
-        x=alt.X('hora_hecho_h:O', axis=EJE_X_HORAS),
+        x=alt.X('hora_hecho_h:O', axis=eje_x_horas()),
         y=alt.Y('dia_semana:O', title='Día de la Semana', sort=dias_ordenados),
         color=alt.Color('Porcentaje_Violentos:Q', 
                         title='% Violentos',
@@ -342,8 +361,11 @@ def plot_heatmap_dia_hora(data):
     )
 
 # Gráfico 5: Reloj o Polar
+@perf_utils.medir()
 def plot_polar_violencia_hora(data):
     """Gráfico 5: Gráfico polar."""
+    import altair as alt
+
     if data.empty or 'CATEGORIA' not in data.columns:
         return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
 
@@ -406,4 +428,89 @@ def plot_polar_violencia_hora(data):
         color=PALETA_PRINCIPAL[0]
     )
 
-    return chart
\ No newline at end of file
+    return chart
+# GRÁFICOS ANÁLISIS DETALLADO
+
+# Pronóstico mensual con intervalo
+@perf_utils.medir()
+def plot_pronostico(df_serie, titulo='Pronóstico Mensual de Delitos'):
+    """Línea observada + pronóstico punteado con banda de intervalo (95%)."""
+    import altair as alt
+
+    if df_serie.empty:
+        return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
+
+    color_scale = alt.Scale(
+        domain=['Observado', 'Pronóstico'],
+        range=[PALETA_PRINCIPAL[1], PALETA_PRINCIPAL[0]]
+    )
+
+    banda = alt.Chart(df_serie.dropna(subset=['inferior'])).mark_area(
+        opacity=0.25,
+        color=ESCALA_ROJOS[0]
+    ).encode(
+        x=alt.X('fecha:T', title='Mes'),
+        y=alt.Y('inferior:Q', title='Número de Delitos'),
+        y2='superior:Q'
+    )
+
+    lineas = alt.Chart(df_serie).mark_line(point=True).encode(
+        x=alt.X('fecha:T', title='Mes'),
+        y=alt.Y('valor:Q', title='Número de Delitos'),
+        color=alt.Color('tipo:N', title='', scale=color_scale, legend=alt.Legend(orient='top')),
+        strokeDash=alt.condition(
+            alt.datum.tipo == 'Pronóstico', alt.value([6, 4]), alt.value([1, 0])
+        ),
+        tooltip=[
+            alt.Tooltip('fecha:T', title='Mes', format='%Y-%m'),
+            alt.Tooltip('tipo:N', title='Tipo'),
+            alt.Tooltip('valor:Q', title='Delitos', format=',.0f'),
+            alt.Tooltip('inferior:Q', title='Límite inferior', format=',.0f'),
+            alt.Tooltip('superior:Q', title='Límite superior', format=',.0f')
+        ]
+    )
+
+    return (banda + lineas).properties(
+        title=titulo,
+        height=350
+    ).configure_axis(
+        labelFontSize=11,
+        titleFontSize=12
+    )
+
+# Heatmap de correlación entre alcaldías (orden jerárquico)
+@perf_utils.medir()
+def plot_correlacion_alcaldias(alcaldias, correlacion):
+    """Heatmap: Correlación de los perfiles día × hora entre alcaldías."""
+    import altair as alt
+
+    if len(alcaldias) == 0:
+        return alt.Chart(pd.DataFrame()).mark_text(text="No hay datos").encode()
+
+    n = len(alcaldias)
+    df_plot = pd.DataFrame({
+        'Alcaldía A': np.repeat(alcaldias, n),
+        'Alcaldía B': np.tile(alcaldias, n),
+        'Correlacion': np.asarray(correlacion).ravel()
+    })
+    minimo = float(min(df_plot['Correlacion'].min(), 0.0))
+
+    heatmap = alt.Chart(df_plot).mark_rect().encode(
+        x=alt.X('Alcaldía B:O', title=None, sort=list(alcaldias), axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('Alcaldía A:O', title=None, sort=list(alcaldias)),
+        color=alt.Color('Correlacion:Q',
+                        title='Correlación',
+                        scale=alt.Scale(range=ESCALA_ROJOS, domain=[minimo, 1])),
+        tooltip=[
+            alt.Tooltip('Alcaldía A', title='Alcaldía'),
+            alt.Tooltip('Alcaldía B', title='Alcaldía'),
+            alt.Tooltip('Correlacion', title='Correlación', format='.3f')
+        ]
+    ).interactive()
+
+    return heatmap.properties(
+        height=500
+    ).configure_axis(
+        labelFontSize=11,
+        titleFontSize=12
+    )
@@ -0,0 +1,242 @@
+# report_utils.py
+# -----------------------------------------------------------------------------
+# GENERACIÓN DE REPORTES EN SEGUNDO PLANO (COLA DE TRABAJOS)
+# -----------------------------------------------------------------------------
+# Los reportes (Excel / HTML) por alcaldía se construyen en un grupo de hilos
+# compartido por todo el proceso, fuera del hilo del script de Streamlit: la
+# página solo encola el trabajo y consulta su avance. Los trabajos se
+# identifican por un hash de sus parámetros, de modo que pedir el mismo
+# reporte dos veces devuelve el resultado (o el trabajo en curso) existente.
+# -----------------------------------------------------------------------------
+import hashlib
+import html
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import plot_utils
+
+MAX_TRABAJOS_REPORTE = 2      # reportes generándose a la vez
+MAX_TRABAJOS_EN_COLA = 8      # trabajos pendientes (en cola + generando)
+MAX_REPORTES_GUARDADOS = 16   # resultados terminados que se conservan (LRU)
+TOP_DELITOS = 10
+# Columnas que usan las tablas y los gráficos del reporte
+COLUMNAS_REPORTE = ("alcaldia_hecho", "CATEGORIA", "anio_hecho", "hora_hecho_h", "delito", "dia_semana")
+
+EN_COLA = "En cola"
+GENERANDO = "Generando"
+LISTO = "Listo"
+ERROR = "Error"
+
+FORMATOS_REPORTE = {
+    "Excel": {
+        "extension": ".xlsx",
+        "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    },
+    "HTML": {"extension": ".html", "mime": "text/html"},
+}
+
+
+class TrabajoReporte:
+    """Estado de un reporte: lo escribe el hilo trabajador y lo lee la página."""
+
+    def __init__(self, clave, parametros):
+        self.clave = clave
+        self.parametros = parametros
+        self.estado = EN_COLA
+        self.progreso = 0.0
+        self.mensaje = "Esperando un hilo disponible..."
+        self.resultado = None   # bytes del archivo final
+        self.error = None
+        self.creado = time.time()
+
+    @property
+    def activo(self):
+        return self.estado in (EN_COLA, GENERANDO)
+
+    @property
+    def nombre_archivo(self):
+        return f"reporte_delitos_{self.clave[:8]}{FORMATOS_REPORTE[self.parametros['formato']]['extension']}"
+
+
+_EJECUTOR = ThreadPoolExecutor(max_workers=MAX_TRABAJOS_REPORTE, thread_name_prefix="reporte")
+_TRABAJOS = OrderedDict()   # clave -> TrabajoReporte (más reciente al final)
+_TRABAJOS_LOCK = threading.Lock()
+
+
+def clave_reporte(parametros):
+    """Hash estable de los parámetros del reporte."""
+    texto = json.dumps(parametros, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def solicitar_reporte(data, fuente, alcaldias, categoria="TODAS", anio="TODOS", formato="Excel"):
+    """
+    Encola un reporte y devuelve su TrabajoReporte. Si ya existe uno con los
+    mismos parámetros (y los datos no han cambiado) se reutiliza. Lanza
+    RuntimeError si la cola está llena.
+    """
+    parametros = {
+        "fuente": fuente,
+        "version": data_loader.version_datos(data),
+        "alcaldias": sorted(str(a) for a in alcaldias),
+        "categoria": categoria,
+        "anio": anio,
+        "formato": formato,
+    }
+    clave = clave_reporte(parametros)
+
+    with _TRABAJOS_LOCK:
+        trabajo = _TRABAJOS.get(clave)
+        if trabajo is not None and trabajo.estado != ERROR:
+            _TRABAJOS.move_to_end(clave)
+            return trabajo
+        if sum(t.activo for t in _TRABAJOS.values()) >= MAX_TRABAJOS_EN_COLA:
+            raise RuntimeError("Hay demasiados reportes en proceso; intenta de nuevo en unos momentos.")
+
+        trabajo = TrabajoReporte(clave, parametros)
+        _TRABAJOS[clave] = trabajo
+        _TRABAJOS.move_to_end(clave)
+        # Desalojar los resultados terminados más antiguos (nunca los activos)
+        terminados = [c for c, t in _TRABAJOS.items() if not t.activo]
+        for c in terminados[:max(0, len(terminados) - MAX_REPORTES_GUARDADOS)]:
+            del _TRABAJOS[c]
+
+    # La cola retiene solo las filas y columnas del reporte, no el dataset completo
+    _EJECUTOR.submit(_ejecutar, trabajo, seleccion_reporte(data, parametros))
+    return trabajo
+
+
+def obtener_trabajo(clave):
+    """TrabajoReporte asociado a 'clave' (o None si ya fue desalojado)."""
+    with _TRABAJOS_LOCK:
+        return _TRABAJOS.get(clave)
+
+
+def _ejecutar(trabajo, data):
+    trabajo.estado = GENERANDO
+    try:
+        trabajo.resultado = generar_reporte(data, trabajo.parametros, trabajo)
+        trabajo.progreso, trabajo.mensaje = 1.0, "Reporte listo."
+        trabajo.estado = LISTO
+    except Exception as e:
+        trabajo.error = str(e)
+        trabajo.mensaje = f"Error al generar el reporte: {e}"
+        trabajo.estado = ERROR
+
+
+# --- Contenido del reporte ---
+
+def seleccion_reporte(data, parametros):
+    """Filas de las alcaldías, categoría y año del reporte, solo con COLUMNAS_REPORTE."""
+    mascara = data["alcaldia_hecho"].isin(parametros["alcaldias"]).to_numpy(dtype=bool, na_value=False, copy=True)
+    if parametros["categoria"] != "TODAS":
+        mascara &= (data["CATEGORIA"] == parametros["categoria"]).to_numpy(dtype=bool, na_value=False)
+    if parametros["anio"] != "TODOS":
+        mascara &= (data["anio_hecho"] == parametros["anio"]).to_numpy(dtype=bool, na_value=False)
+    return data.loc[mascara, [c for c in COLUMNAS_REPORTE if c in data.columns]]
+
+
+def filtrar(data, alcaldia, categoria, anio):
+    mascara = (data["alcaldia_hecho"] == alcaldia).to_numpy(dtype=bool, na_value=False, copy=True)
+    if categoria != "TODAS":
+        mascara &= (data["CATEGORIA"] == categoria).to_numpy(dtype=bool, na_value=False)
+    if anio != "TODOS":
+        mascara &= (data["anio_hecho"] == anio).to_numpy(dtype=bool, na_value=False)
+    return data.loc[mascara]
+
+
+def agregados_alcaldia(sub):
+    """Tablas resumen de una alcaldía: por categoría, por año, por hora y delitos principales."""
+    violento = sub["CATEGORIA"].astype(str).str.upper().ne("NO VIOLENTOS")
+    por_hora = (
+        pd.DataFrame({"hora": sub["hora_hecho_h"], "violento": violento})
+        .query("0 <= hora <= 23")
+        .groupby("hora")["violento"].agg(Total="size", Violentos="sum")
+    )
+    por_hora["% Violentos"] = (100 * por_hora["Violentos"] / por_hora["Total"]).round(1)
+    return {
+        "Por categoría": sub["CATEGORIA"].value_counts().rename_axis("Categoría").reset_index(name="Total"),
+        "Por año": sub["anio_hecho"].value_counts().sort_index().rename_axis("Año").reset_index(name="Total"),
+        "Por hora": por_hora.reset_index().rename(columns={"hora": "Hora"}),
+        "Delitos principales": (
+            sub["delito"].value_counts().head(TOP_DELITOS).rename_axis("Delito").reset_index(name="Total")
+        ),
+    }
+
+
+def generar_reporte(data, parametros, trabajo=None):
+    """Construye el archivo del reporte (bytes). Actualiza el avance de 'trabajo' si se indica."""
+    alcaldias = parametros["alcaldias"]
+    secciones = []
+    for i, alcaldia in enumerate(alcaldias):
+        if trabajo is not None:
+            trabajo.progreso = i / (len(alcaldias) + 1)
+            trabajo.mensaje = f"Procesando {alcaldia} ({i + 1}/{len(alcaldias)})..."
+        sub = filtrar(data, alcaldia, parametros["categoria"], parametros["anio"])
+        secciones.append((alcaldia, sub, agregados_alcaldia(sub)))
+
+    if trabajo is not None:
+        trabajo.progreso = len(alcaldias) / (len(alcaldias) + 1)
+        trabajo.mensaje = "Escribiendo archivo..."
+    if parametros["formato"] == "HTML":
+        return reporte_html(secciones, parametros)
+    return reporte_excel(secciones, parametros)
+
+
+def reporte_excel(secciones, parametros):
+    """Libro de Excel: una hoja de resumen y una hoja por tabla (con columna de alcaldía)."""
+    resumen = pd.DataFrame({
+        "Alcaldía": [a for a, _, _ in secciones],
+        "Total": [len(sub) for _, sub, _ in secciones],
+        "% Violentos": [
+            round(100 * float(np.mean(sub["CATEGORIA"].astype(str).str.upper() != "NO VIOLENTOS")), 1)
+            if len(sub) else 0.0
+            for _, sub, _ in secciones
+        ],
+    })
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as escritor:
+        resumen.to_excel(escritor, sheet_name="Resumen", index=False)
+        for nombre_tabla in ("Por categoría", "Por año", "Por hora", "Delitos principales"):
+            pd.concat(
+                [tablas[nombre_tabla].assign(Alcaldía=a) for a, _, tablas in secciones], ignore_index=True
+            ).to_excel(escritor, sheet_name=nombre_tabla, index=False)
+        pd.DataFrame(
+            {"Parámetro": list(parametros), "Valor": [str(v) for v in parametros.values()]}
+        ).to_excel(escritor, sheet_name="Parámetros", index=False)
+    return buffer.getvalue()
+
+
+def reporte_html(secciones, parametros):
+    """Documento HTML autocontenido con tablas y los gráficos Altair de plot_utils (vega-embed)."""
+    partes, graficos = [], []
+    for a, sub, tablas in secciones:
+        partes.append(f"<h2>{html.escape(a)}</h2><p>Total de delitos: <b>{len(sub):,}</b></p>")
+        for nombre_tabla in ("Por categoría", "Delitos principales"):
+            partes.append(f"<h3>{nombre_tabla}</h3>" + tablas[nombre_tabla].to_html(index=False, border=0))
+        for grafico in (plot_utils.plot_crimenes_violentos_por_hora(sub), plot_utils.plot_heatmap_dia_hora(sub)):
+            id_div = f"grafico{len(graficos)}"
+            graficos.append((id_div, grafico.to_json()))
+            partes.append(f'<div id="{id_div}"></div>')
+
+    titulo = f"Reporte de delitos – {parametros['categoria']} / {parametros['anio']}"
+    scripts = "\n".join(f'vegaEmbed("#{i}", {spec}, {{"actions": false}});' for i, spec in graficos)
+    return f"""<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>{html.escape(titulo)}</title>
+<script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+<style>body{{font-family:sans-serif;margin:2em}} table{{border-collapse:collapse}}
+td,th{{padding:2px 8px;border-bottom:1px solid #ddd}} h2{{color:#9F2241;page-break-before:always}}</style>
+</head><body><h1>{html.escape(titulo)}</h1>
+{"".join(partes)}
+<script>{scripts}</script>
+</body></html>""".encode("utf-8")
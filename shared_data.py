@@ -0,0 +1,219 @@
+# shared_data.py
+# -----------------------------------------------------------------------------
+# DATASET COMPARTIDO ENTRE PROCESOS (ARCHIVOS .npy MAPEADOS EN MEMORIA)
+# -----------------------------------------------------------------------------
+# Con varios servidores de Streamlit detrás de un balanceador, cada proceso
+# cargaba y procesaba su propia copia de los CSV. Aquí un solo proceso
+# cargador materializa las columnas ya procesadas en archivos .npy (las
+# categorías se guardan como códigos + lista de categorías en el manifiesto) y
+# los servidores las abren con np.load(mmap_mode='r'): las páginas de los
+# archivos viven en la caché del sistema operativo y se comparten entre todos
+# los procesos, así que la memoria residente no crece con cada servidor.
+#
+# Cada materialización se escribe en un directorio temporal que se publica
+# con un rename atómico; el archivo '<nombre>.actual' (reemplazo atómico)
+# apunta a la versión vigente. Los lectores ven la versión anterior completa
+# o la nueva completa, nunca una a medias.
+#
+# Uso (proceso cargador):
+#   python shared_data.py materializar --datos hour_crimes_optimized.csv df_streamlit.csv
+#   python shared_data.py materializar --datos hour_crimes_optimized.csv --cada 300
+# y en los servidores: DASHBOARD_DATOS_COMPARTIDOS=<directorio> streamlit run app_dashboard.py
+# -----------------------------------------------------------------------------
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from config import DATOS_COMPARTIDOS_DIR
+
+MANIFIESTO = "manifiesto.json"
+CONSERVAR_VERSIONES = 2   # la anterior sigue disponible para procesos que aún la abren
+
+
+def nombre_dataset(path):
+    """Nombre de archivo seguro para el dataset de 'path' ('hour_crimes_optimized.csv' -> 'hour_crimes_optimized')."""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", os.path.splitext(os.path.basename(path))[0])
+
+
+def firma_fuente(path):
+    """Tamaño y mtime del archivo fuente (None si no existe): detecta materializaciones desactualizadas."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return {"tamano": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+# --- Escritura (proceso cargador) ---
+
+def _escribir_columna(serie, destino):
+    """Guarda una columna en 'destino' y devuelve su descripción para el manifiesto."""
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = serie.to_numpy()
+        if valores.dtype != object:
+            np.save(destino, valores, allow_pickle=False)
+            return {"tipo": "numpy", "dtype": str(valores.dtype)}
+        # Texto (object / str): se comparte como categoría, no como objetos de Python
+        serie = serie.astype("category")
+    np.save(destino, serie.cat.codes.to_numpy(), allow_pickle=False)
+    return {
+        "tipo": "categoria",
+        "categorias": serie.cat.categories.tolist(),
+        "ordenada": bool(serie.cat.ordered),
+    }
+
+
+def materializar(data, path, directorio=DATOS_COMPARTIDOS_DIR):
+    """
+    Escribe las columnas de 'data' (el dataset ya procesado de 'path') en una
+    nueva versión bajo 'directorio' y la publica. Devuelve la ruta de la versión.
+    """
+    if not directorio:
+        raise ValueError("No hay directorio de datos compartidos (DASHBOARD_DATOS_COMPARTIDOS).")
+    os.makedirs(directorio, exist_ok=True)
+    nombre = nombre_dataset(path)
+    temporal = os.path.join(directorio, f".{nombre}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(temporal)
+    try:
+        columnas = []
+        for i, columna in enumerate(data.columns):
+            archivo = f"c{i:03d}.npy"
+            descripcion = _escribir_columna(data[columna], os.path.join(temporal, archivo))
+            columnas.append({"nombre": columna, "archivo": archivo, **descripcion})
+
+        if isinstance(data.index, pd.RangeIndex):
+            indice = {"tipo": "rango", "inicio": data.index.start, "paso": data.index.step}
+        else:
+            np.save(os.path.join(temporal, "indice.npy"), data.index.to_numpy(), allow_pickle=False)
+            indice = {"tipo": "numpy", "archivo": "indice.npy"}
+
+        with open(os.path.join(temporal, MANIFIESTO), "w", encoding="utf-8") as f:
+            json.dump({
+                "fuente": os.path.basename(path), "firma": firma_fuente(path), "filas": len(data),
+                "creado": time.time(), "indice": indice, "columnas": columnas,
+            }, f, ensure_ascii=False)
+
+        version = os.path.join(directorio, f"{nombre}.v{time.time_ns()}")
+        os.rename(temporal, version)
+    except BaseException:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    puntero = os.path.join(directorio, f"{nombre}.actual")
+    with open(f"{puntero}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version))
+    os.replace(f"{puntero}.{os.getpid()}.tmp", puntero)
+
+    # Versiones antiguas: en POSIX borrar un archivo mapeado no afecta a quien ya lo abrió
+    for vieja in sorted(glob.glob(os.path.join(directorio, f"{nombre}.v*")))[:-CONSERVAR_VERSIONES]:
+        shutil.rmtree(vieja, ignore_errors=True)
+    return version
+
+
+# --- Lectura (servidores) ---
+
+def version_vigente(path, directorio=DATOS_COMPARTIDOS_DIR):
+    """
+    Directorio de la versión publicada para 'path', o None si no hay una o si
+    el archivo fuente cambió desde que se materializó.
+    """
+    if not directorio:
+        return None
+    try:
+        with open(os.path.join(directorio, f"{nombre_dataset(path)}.actual"), encoding="utf-8") as f:
+            version = os.path.join(directorio, f.read().strip())
+        with open(os.path.join(version, MANIFIESTO), encoding="utf-8") as f:
+            firma = json.load(f)["firma"]
+    except (OSError, ValueError, KeyError):
+        return None
+    actual = firma_fuente(path)
+    if actual is not None and actual != firma:
+        return None
+    return version
+
+
+@st.cache_resource(max_entries=4)
+def adjuntar(version):
+    """
+    DataFrame de solo lectura sobre los .npy de 'version' (sin copiar los
+    datos). Uno por versión y por proceso, compartido por todas las sesiones.
+    """
+    with open(os.path.join(version, MANIFIESTO), encoding="utf-8") as f:
+        manifiesto = json.load(f)
+
+    def abrir(archivo):
+        return np.load(os.path.join(version, archivo), mmap_mode="r", allow_pickle=False)
+
+    columnas = {}
+    for c in manifiesto["columnas"]:
+        if c["tipo"] == "categoria":
+            columnas[c["nombre"]] = pd.Categorical.from_codes(
+                abrir(c["archivo"]), categories=pd.Index(c["categorias"]), ordered=c["ordenada"]
+            )
+        else:
+            columnas[c["nombre"]] = abrir(c["archivo"])
+
+    indice = manifiesto["indice"]
+    if indice["tipo"] == "rango":
+        index = pd.RangeIndex(indice["inicio"], indice["inicio"] + manifiesto["filas"] * indice["paso"], indice["paso"])
+    else:
+        index = pd.Index(abrir(indice["archivo"]), copy=False)
+
+    # copy=False: las columnas quedan respaldadas por los archivos mapeados
+    data = pd.DataFrame(columnas, index=index, copy=False)
+    data.attrs["compartido"] = os.path.basename(version)
+    return data
+
+
+def dataset_compartido(path, directorio=DATOS_COMPARTIDOS_DIR):
+    """DataFrame compartido vigente de 'path', o None si hay que cargarlo en este proceso."""
+    version = version_vigente(path, directorio)
+    if version is None:
+        return None
+    try:
+        return adjuntar(version)
+    except (OSError, ValueError, KeyError):
+        # La versión se desalojó entre la lectura del puntero y la apertura
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materializa los datasets procesados para compartirlos entre procesos")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_materializar = sub.add_parser("materializar", help="Carga, procesa y publica los datasets")
+    p_materializar.add_argument("--datos", nargs="+", default=["hour_crimes_optimized.csv", "df_streamlit.csv"])
+    p_materializar.add_argument("--directorio", default=DATOS_COMPARTIDOS_DIR or os.path.join(".cache", "compartido"))
+    p_materializar.add_argument("--cada", type=int, default=0,
+                                help="Segundos entre revisiones de los archivos fuente (0 = una sola vez)")
+
+    args = parser.parse_args()
+    import data_loader
+
+    while True:
+        for path in args.datos:
+            if version_vigente(path, args.directorio) is not None and args.cada:
+                continue
+            # La caché de la carga es por ruta: se descarta para leer el archivo actualizado
+            data_loader._load_data_local.clear()
+            data = data_loader._load_data_local(path)
+            if data.empty:
+                print(f"No se pudo cargar '{path}'.")
+                continue
+            version = materializar(data, path, args.directorio)
+            print(f"{path}: {len(data):,} filas, {data.shape[1]} columnas -> {version}")
+        if not args.cada:
+            break
+        time.sleep(args.cada)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# spatial_utils.py
+# -----------------------------------------------------------------------------
+# ASIGNACIÓN ESPACIAL DE EVENTOS A POLÍGONOS (VECTORIZADA)
+# -----------------------------------------------------------------------------
+# Asigna cada evento al polígono que lo contiene (alcaldía, cuadrante, ...)
+# con una consulta masiva sobre un STRtree, sin verificar punto por punto.
+# Los polígonos se subdividen en celdas pequeñas antes de indexarlos: cada
+# prueba de contención se hace contra una pieza de pocos vértices.
+# -----------------------------------------------------------------------------
+import os
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+import boundary_utils
+from kde_utils import EXTENSION_CDMX
+
+TAMANO_CELDA_INDICE = 0.01   # grados (~1 km)
+TAMANO_BLOQUE = 1_000_000    # puntos por consulta (acota la memoria de objetos Point)
+
+
+class IndicePoligonos:
+    """STRtree sobre las piezas de un conjunto de polígonos cortados en una rejilla."""
+
+    def __init__(self, geoms, tamano_celda=TAMANO_CELDA_INDICE):
+        geoms = np.asarray(geoms, dtype=object)
+        minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+        xs = np.arange(minx, maxx + tamano_celda, tamano_celda)
+        ys = np.arange(miny, maxy + tamano_celda, tamano_celda)
+        bx, by = np.meshgrid(xs[:-1], ys[:-1])
+        cajas = shapely.box(bx.ravel(), by.ravel(), bx.ravel() + tamano_celda, by.ravel() + tamano_celda)
+
+        # Pares (polígono, caja) que se tocan -> piezas = intersección
+        idx_geom, idx_caja = shapely.STRtree(cajas).query(geoms, predicate="intersects")
+        piezas = shapely.intersection(geoms[idx_geom], cajas[idx_caja])
+        validas = ~shapely.is_empty(piezas)
+
+        self.piezas = piezas[validas]
+        self.propietario = idx_geom[validas].astype(np.int32)
+        self.arbol = shapely.STRtree(self.piezas)
+        self.n_poligonos = len(geoms)
+
+    def asignar(self, lon, lat, bloque=TAMANO_BLOQUE):
+        """
+        Devuelve, para cada punto, el índice del polígono que lo contiene
+        (-1 si no cae en ninguno). Coordenadas NaN se consideran fuera.
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        codigos = np.full(lon.size, -1, dtype=np.int32)
+
+        for inicio in range(0, lon.size, bloque):
+            fin = min(inicio + bloque, lon.size)
+            puntos = shapely.points(lon[inicio:fin], lat[inicio:fin])
+            idx_punto, idx_pieza = self.arbol.query(puntos, predicate="intersects")
+            codigos[inicio + idx_punto] = self.propietario[idx_pieza]
+        return codigos
+
+
+@lru_cache(maxsize=4)
+def _indice_binario(path, mtime):
+    propiedades, geoms = boundary_utils.cargar_binario(path)
+    return propiedades, IndicePoligonos(geoms)
+
+
+def indice_alcaldias(local_backup="limite-de-las-alcaldias.json"):
+    """
+    (propiedades, IndicePoligonos) de las alcaldías, desde la copia binaria
+    persistente. El índice se reconstruye solo si el archivo cambia.
+    """
+    boundary_utils.asegurar_cache_local(local_backup)
+    path = boundary_utils.RUTA_BINARIO_CACHE
+    return _indice_binario(path, os.path.getmtime(path))
+
+
+# --- Conteos por polígono y hora (una sola asignación espacial) ---
+
+HORAS_DIA = 24
+
+
+def tabla_poligono_hora(codigos, horas, violento, n_poligonos):
+    """
+    Tabla de conteos int32 de forma (n_poligonos, 24, 2): [..., 0] = no
+    violentos, [..., 1] = violentos. Se omiten los eventos fuera de los
+    polígonos (código -1) y los que no tienen hora válida (0-23).
+    """
+    codigos = np.asarray(codigos)
+    horas = np.asarray(horas, dtype=np.float64)
+    violento = np.asarray(violento, dtype=bool)
+
+    validos = (codigos >= 0) & (horas >= 0) & (horas < HORAS_DIA)
+    celda = (codigos[validos].astype(np.int64) * HORAS_DIA + horas[validos].astype(np.int64)) * 2 \
+        + violento[validos]
+    conteos = np.bincount(celda, minlength=n_poligonos * HORAS_DIA * 2)
+    return conteos.reshape(n_poligonos, HORAS_DIA, 2).astype(np.int32)
+
+
+def porcentaje_violento(tabla, horas=None):
+    """
+    Total, violentos y % de violentos por polígono a partir de la tabla de
+    'tabla_poligono_hora'. 'horas' puede ser una hora, una lista o None (todas).
+    """
+    if horas is not None:
+        tabla = tabla[:, np.atleast_1d(horas)]
+    violentos = tabla[..., 1].sum(axis=1)
+    total = violentos + tabla[..., 0].sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        porcentaje = np.where(total > 0, violentos / total * 100, 0.0)
+    return total, violentos, porcentaje
+
+
+# --- Índice de puntos por rejilla (consultas por encuadre) ---
+
+TAMANO_CELDA_PUNTOS = 0.005  # grados (~500 m)
+
+
+class IndiceRejilla:
+    """
+    Índice espacial de puntos en formato CSR: los eventos se ordenan por celda
+    (fila-mayor) y 'offsets' marca dónde empieza cada celda. Una consulta por
+    rectángulo toma, fila por fila, el tramo contiguo de celdas que lo cubre.
+
+    La rejilla es FIJA sobre 'extension' (la CDMX): un punto atípico, p. ej.
+    en (0, 0), no la agranda. Los puntos fuera de la extensión o con
+    'validos' en False se guardan al final de 'orden', fuera de toda celda,
+    y nunca se devuelven; las posiciones siguen alineadas con el arreglo
+    original.
+    """
+
+    def __init__(self, lat, lon, tamano_celda=TAMANO_CELDA_PUNTOS, extension=EXTENSION_CDMX, validos=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.tamano_celda = tamano_celda
+
+        self.oeste, self.sur, este, norte = extension
+        self.n_filas = int(np.ceil((norte - self.sur) / tamano_celda))
+        self.n_cols = int(np.ceil((este - self.oeste) / tamano_celda))
+        n_celdas = self.n_filas * self.n_cols
+
+        fila = np.floor((self.lat - self.sur) / tamano_celda)
+        col = np.floor((self.lon - self.oeste) / tamano_celda)
+        dentro = (fila >= 0) & (fila < self.n_filas) & (col >= 0) & (col < self.n_cols)
+        if validos is not None:
+            dentro &= np.asarray(validos, dtype=bool)
+        celda = np.full(self.lat.size, n_celdas, dtype=np.int64)
+        celda[dentro] = fila[dentro].astype(np.int64) * self.n_cols + col[dentro].astype(np.int64)
+
+        self.orden = np.argsort(celda, kind="stable").astype(np.int64)
+        conteos = np.bincount(celda, minlength=n_celdas + 1)[:n_celdas]
+        self.offsets = np.concatenate(([0], np.cumsum(conteos)))
+
+    def _fila(self, lat):
+        return np.clip(((lat - self.sur) // self.tamano_celda).astype(np.int64), 0, self.n_filas - 1)
+
+    def _col(self, lon):
+        return np.clip(((lon - self.oeste) // self.tamano_celda).astype(np.int64), 0, self.n_cols - 1)
+
+    def consultar(self, sur, oeste, norte, este):
+        """Posiciones (en el arreglo original) de los puntos dentro del rectángulo."""
+        if self.offsets[-1] == 0 or norte < self.sur or este < self.oeste:
+            return np.empty(0, dtype=np.int64)
+        f0, f1 = self._fila(np.array([sur, norte]))
+        c0, c1 = self._col(np.array([oeste, este]))
+
+        tramos = [
+            self.orden[self.offsets[f * self.n_cols + c0]:self.offsets[f * self.n_cols + c1 + 1]]
+            for f in range(f0, f1 + 1)
+        ]
+        candidatos = np.concatenate(tramos) if tramos else np.empty(0, dtype=np.int64)
+        # Filtro exacto sobre las celdas del borde
+        lat, lon = self.lat[candidatos], self.lon[candidatos]
+        dentro = (lat >= sur) & (lat <= norte) & (lon >= oeste) & (lon <= este)
+        return np.sort(candidatos[dentro])
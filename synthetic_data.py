@@ -0,0 +1,479 @@
+# synthetic_data.py
+# -----------------------------------------------------------------------------
+# GENERADOR DE DATOS SINTÉTICOS (PRUEBAS DE RENDIMIENTO)
+# -----------------------------------------------------------------------------
+# Genera archivos con el mismo esquema que esperan las funciones de
+# data_loader, sin depender de los extractos reales:
+#   - "hour_crimes": esquema de 'hour_crimes_optimized.csv' (columnas *_N)
+#   - "streamlit":   esquema de 'df_streamlit.csv'
+#   - "crudo":       esquema de producción (carpetas de investigación FGJ),
+#                    con coordenadas "SIN DATO" para ejercitar
+#                    'preparedata' / 'imputar_centroides'.
+#
+# Los puntos se muestrean DENTRO de los polígonos reales de
+# 'limite-de-las-alcaldias.json' y las distribuciones de hora, día y
+# categoría imitan las del dataset real.
+#
+# Uso:
+#   python synthetic_data.py --filas 1000000 --esquema hour_crimes \
+#       --salida hour_crimes_optimized.csv
+# -----------------------------------------------------------------------------
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from data_loader import categorizar_dummy, normalizar_nombre_alcaldia
+
+# --- Peso relativo de cada alcaldía (participación aproximada en denuncias) ---
+PESOS_ALCALDIA = {
+    "IZTAPALAPA": 0.155,
+    "CUAUHTEMOC": 0.125,
+    "GUSTAVO A MADERO": 0.105,
+    "BENITO JUAREZ": 0.075,
+    "COYOACAN": 0.070,
+    "ALVARO OBREGON": 0.065,
+    "MIGUEL HIDALGO": 0.065,
+    "TLALPAN": 0.060,
+    "VENUSTIANO CARRANZA": 0.055,
+    "AZCAPOTZALCO": 0.045,
+    "IZTACALCO": 0.040,
+    "XOCHIMILCO": 0.035,
+    "TLAHUAC": 0.030,
+    "LA MAGDALENA CONTRERAS": 0.020,
+    "CUAJIMALPA DE MORELOS": 0.018,
+    "MILPA ALTA": 0.010,
+}
+
+# --- Catálogo de delitos: (delito, categoria_delito FGJ, peso) ---
+# La columna CATEGORIA se deriva con 'categorizar_dummy' para que sea
+# idéntica a la que calcula la App.
+CATALOGO_DELITOS = [
+    ("VIOLENCIA FAMILIAR", "DELITO DE BAJO IMPACTO", 0.110),
+    ("FRAUDE", "DELITO DE BAJO IMPACTO", 0.070),
+    ("AMENAZAS", "DELITO DE BAJO IMPACTO", 0.060),
+    ("DENUNCIA DE HECHOS", "HECHO NO DELICTIVO", 0.060),
+    ("DAÑO EN PROPIEDAD AJENA INTENCIONAL", "DELITO DE BAJO IMPACTO", 0.050),
+    ("ABUSO DE CONFIANZA", "DELITO DE BAJO IMPACTO", 0.030),
+    ("NARCOMENUDEO POSESION SIMPLE", "DELITO DE BAJO IMPACTO", 0.030),
+    ("LESIONES CULPOSAS POR TRANSITO VEHICULAR", "DELITO DE BAJO IMPACTO", 0.030),
+    ("DESPOJO", "DELITO DE BAJO IMPACTO", 0.025),
+    ("USURPACION DE IDENTIDAD", "DELITO DE BAJO IMPACTO", 0.020),
+    ("INCUMPLIMIENTO DE OBLIGACIONES DE ASISTENCIA FAMILIAR", "DELITO DE BAJO IMPACTO", 0.020),
+    ("PERDIDA DE LA VIDA POR OTRAS CAUSAS", "HECHO NO DELICTIVO", 0.020),
+    ("FALSIFICACION DE TITULOS AL PORTADOR Y DOCUMENTOS DE CREDITO PUBLICO", "DELITO DE BAJO IMPACTO", 0.015),
+    ("ALLANAMIENTO DE MORADA", "DELITO DE BAJO IMPACTO", 0.010),
+    ("EXTORSION", "DELITO DE BAJO IMPACTO", 0.010),
+    ("PRIVACION DE LA LIBERTAD PERSONAL", "DELITO DE BAJO IMPACTO", 0.003),
+    ("ROBO DE OBJETOS", "DELITO DE BAJO IMPACTO", 0.050),
+    ("ROBO A NEGOCIO SIN VIOLENCIA", "DELITO DE BAJO IMPACTO", 0.040),
+    ("ROBO A TRANSEUNTE EN VIA PUBLICA CON VIOLENCIA", "ROBO A TRANSEUNTE EN VIA PUBLICA CON Y SIN VIOLENCIA", 0.025),
+    ("ROBO DE ACCESORIOS DE AUTO", "DELITO DE BAJO IMPACTO", 0.020),
+    ("ROBO DE VEHICULO DE SERVICIO PARTICULAR SIN VIOLENCIA", "ROBO DE VEHICULO CON Y SIN VIOLENCIA", 0.020),
+    ("ROBO A TRANSEUNTE DE CELULAR SIN VIOLENCIA", "ROBO A TRANSEUNTE EN VIA PUBLICA CON Y SIN VIOLENCIA", 0.015),
+    ("ROBO A CASA HABITACION SIN VIOLENCIA", "DELITO DE BAJO IMPACTO", 0.012),
+    ("ROBO A NEGOCIO CON VIOLENCIA", "ROBO A NEGOCIO CON VIOLENCIA", 0.008),
+    ("ROBO DE VEHICULO DE SERVICIO PARTICULAR CON VIOLENCIA", "ROBO DE VEHICULO CON Y SIN VIOLENCIA", 0.006),
+    ("ROBO A PASAJERO A BORDO DEL METRO SIN VIOLENCIA", "ROBO A PASAJERO A BORDO DEL METRO CON Y SIN VIOLENCIA", 0.006),
+    ("ROBO A PASAJERO A BORDO DE MICROBUS CON VIOLENCIA", "ROBO A PASAJERO A BORDO DE MICROBUS CON Y SIN VIOLENCIA", 0.004),
+    ("ROBO A CASA HABITACION CON VIOLENCIA", "ROBO A CASA HABITACION CON VIOLENCIA", 0.002),
+    ("ROBO A REPARTIDOR CON VIOLENCIA", "ROBO A REPARTIDOR CON Y SIN VIOLENCIA", 0.002),
+    ("LESIONES INTENCIONALES POR GOLPES", "DELITO DE BAJO IMPACTO", 0.020),
+    ("LESIONES INTENCIONALES POR ARMA BLANCA", "DELITO DE BAJO IMPACTO", 0.004),
+    ("LESIONES DOLOSAS POR DISPARO DE ARMA DE FUEGO", "LESIONES DOLOSAS POR DISPARO DE ARMA DE FUEGO", 0.002),
+    ("HOMICIDIO POR ARMA DE FUEGO", "HOMICIDIO DOLOSO", 0.003),
+    ("HOMICIDIO CULPOSO POR TRANSITO VEHICULAR (ATROPELLADO)", "DELITO DE BAJO IMPACTO", 0.002),
+    ("HOMICIDIO POR ARMA BLANCA", "HOMICIDIO DOLOSO", 0.001),
+    ("FEMINICIDIO", "HOMICIDIO DOLOSO", 0.0003),
+    ("SECUESTRO", "SECUESTRO", 0.0003),
+    ("ABUSO SEXUAL", "DELITO DE BAJO IMPACTO", 0.010),
+    ("ACOSO SEXUAL", "DELITO DE BAJO IMPACTO", 0.004),
+    ("VIOLACION", "VIOLACION", 0.002),
+    ("TRATA DE PERSONAS", "DELITO DE BAJO IMPACTO", 0.0002),
+]
+
+# --- Perfiles horarios (peso relativo por hora 0..23) ---
+# Los picos en 00:00 y 12:00 reproducen el registro por omisión de la hora.
+PERFIL_HORA_GENERAL = [
+    4.0, 1.5, 1.2, 1.0, 0.8, 0.7, 1.0, 1.8, 2.8, 3.6, 4.2, 4.6,
+    7.5, 5.0, 5.0, 4.9, 4.8, 4.9, 5.3, 5.4, 5.2, 4.6, 3.6, 2.6,
+]
+PERFIL_HORA_ROBO = [
+    2.5, 1.6, 1.3, 1.1, 1.2, 1.9, 3.4, 4.8, 5.2, 4.6, 4.3, 4.4,
+    5.2, 4.8, 4.9, 5.0, 5.3, 5.7, 6.2, 6.4, 6.1, 5.2, 4.1, 3.1,
+]
+PERFIL_HORA_NOCTURNO = [
+    6.0, 5.4, 4.6, 3.6, 2.6, 1.8, 1.5, 1.6, 2.0, 2.3, 2.6, 2.9,
+    3.6, 3.2, 3.4, 3.6, 3.9, 4.2, 4.8, 5.4, 6.0, 6.4, 6.6, 6.4,
+]
+PERFIL_HORA_CATEGORIA = {
+    "No violentos": PERFIL_HORA_GENERAL,
+    "Robo": PERFIL_HORA_ROBO,
+    "Lesiones": PERFIL_HORA_NOCTURNO,
+    "Homicidio/Feminicidio": PERFIL_HORA_NOCTURNO,
+    "Secuestro": PERFIL_HORA_ROBO,
+    "Otros": PERFIL_HORA_NOCTURNO,
+}
+
+# --- Peso relativo por día de la semana (lunes..domingo) ---
+PESOS_DIA_GENERAL = [1.00, 1.00, 1.00, 1.02, 1.08, 1.00, 0.85]
+PESOS_DIA_VIOLENTO = [0.90, 0.85, 0.88, 0.90, 1.05, 1.25, 1.20]
+
+# --- Peso relativo por año (caída en 2020 por la pandemia) ---
+PESOS_ANIO = {
+    2016: 0.85, 2017: 0.95, 2018: 1.05, 2019: 1.10, 2020: 0.85,
+    2021: 0.95, 2022: 1.00, 2023: 0.98, 2024: 0.95,
+}
+
+DIAS_ES = ["LUNES", "MARTES", "MIÉRCOLES", "JUEVES", "VIERNES", "SÁBADO", "DOMINGO"]
+DIAS_EN = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MESES_ES = [
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+    "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+]
+
+# --- Nombres de colonias (sintéticos, estables por celda geográfica) ---
+TAMANO_CELDA_COLONIA = 0.009  # ~1 km², produce del orden de 1,800 colonias
+PREFIJOS_COLONIA = [
+    "", "AMPLIACION ", "BARRIO ", "PUEBLO ", "UNIDAD HABITACIONAL ",
+    "FRACCIONAMIENTO ", "LOMAS DE ", "JARDINES DE ", "PRADOS DE ", "VILLA ",
+]
+RAICES_COLONIA = [
+    "SAN JUAN", "SANTA MARIA", "SAN MIGUEL", "EL ROSARIO", "LA JOYA",
+    "DEL VALLE", "SAN ANTONIO", "SANTA CRUZ", "GUADALUPE", "SAN PEDRO",
+    "LOS REYES", "SAN LORENZO", "SANTA CECILIA", "EL CARMEN", "LA PALMA",
+    "SAN ANDRES", "SANTA URSULA", "LA MAGDALENA", "SAN FRANCISCO", "LAS AGUILAS",
+    "EL TRIUNFO", "MORELOS", "JUAREZ", "HIDALGO", "INDEPENDENCIA",
+    "REFORMA", "LA ESPERANZA", "EL PARAISO", "SAN RAFAEL", "SANTA ANITA",
+    "LA PAZ", "EL MIRADOR", "SAN BERNABE", "SANTIAGO", "SAN BARTOLO",
+]
+
+FRACCION_HOTSPOTS = 0.55      # Proporción de eventos concentrados en zonas críticas
+HOTSPOTS_POR_KM2 = 0.08       # Densidad de zonas críticas por alcaldía
+SIGMA_HOTSPOT_GRADOS = (0.002, 0.008)  # ~200 m a ~900 m
+
+
+class ModeloEspacial:
+    """Polígonos de alcaldías y zonas críticas fijas para un generador."""
+
+    def __init__(self, geojson_path, rng):
+        with open(geojson_path, encoding="utf-8") as f:
+            geojson = json.load(f)
+
+        nombres, geoms = [], []
+        for feature in geojson["features"]:
+            nombres.append(normalizar_nombre_alcaldia(feature["properties"]["NOMGEO"]))
+            geoms.append(shapely.geometry.shape(feature["geometry"]))
+
+        self.nombres = nombres
+        self.geoms = np.array(geoms, dtype=object)
+        shapely.prepare(self.geoms)
+        self.bounds = shapely.bounds(self.geoms)
+
+        pesos = np.array([PESOS_ALCALDIA.get(n, 0.01) for n in nombres], dtype=float)
+        self.pesos = pesos / pesos.sum()
+
+        # Zonas críticas: centros uniformes dentro de cada polígono
+        self.hotspots = []
+        for i, geom in enumerate(self.geoms):
+            area_km2 = geom.area * (111.32 ** 2) * np.cos(np.radians(19.4))
+            k = max(3, int(area_km2 * HOTSPOTS_POR_KM2))
+            centros = self._uniforme_en_poligono(i, k, rng)
+            sigmas = rng.uniform(*SIGMA_HOTSPOT_GRADOS, size=k)
+            intensidades = rng.pareto(1.5, size=k) + 1.0
+            self.hotspots.append((centros, sigmas, intensidades / intensidades.sum()))
+
+    def _uniforme_en_poligono(self, i, n, rng):
+        """Muestreo por rechazo dentro del bounding box del polígono i."""
+        minx, miny, maxx, maxy = self.bounds[i]
+        salida = np.empty((0, 2))
+        while len(salida) < n:
+            faltan = n - len(salida)
+            x = rng.uniform(minx, maxx, size=int(faltan * 2.5) + 16)
+            y = rng.uniform(miny, maxy, size=x.size)
+            dentro = shapely.contains_xy(self.geoms[i], x, y)
+            salida = np.vstack([salida, np.column_stack([x[dentro], y[dentro]])])
+        return salida[:n]
+
+    def _hotspots_en_poligono(self, i, n, rng):
+        """Muestreo gaussiano alrededor de las zonas críticas, recortado al polígono."""
+        centros, sigmas, probs = self.hotspots[i]
+        salida = np.empty((0, 2))
+        while len(salida) < n:
+            faltan = n - len(salida)
+            m = int(faltan * 1.3) + 16
+            idx = rng.choice(len(centros), size=m, p=probs)
+            x = centros[idx, 0] + rng.normal(0, 1, m) * sigmas[idx]
+            y = centros[idx, 1] + rng.normal(0, 1, m) * sigmas[idx]
+            dentro = shapely.contains_xy(self.geoms[i], x, y)
+            salida = np.vstack([salida, np.column_stack([x[dentro], y[dentro]])])
+        return salida[:n]
+
+    def muestrear(self, alcaldia_idx, rng):
+        """Devuelve (lon, lat) para cada evento según su alcaldía asignada."""
+        lon = np.empty(alcaldia_idx.size)
+        lat = np.empty(alcaldia_idx.size)
+        for i in range(len(self.geoms)):
+            filas = np.flatnonzero(alcaldia_idx == i)
+            if filas.size == 0:
+                continue
+            en_hotspot = rng.random(filas.size) < FRACCION_HOTSPOTS
+            n_hot = int(en_hotspot.sum())
+            pts = np.empty((filas.size, 2))
+            pts[en_hotspot] = self._hotspots_en_poligono(i, n_hot, rng)
+            pts[~en_hotspot] = self._uniforme_en_poligono(i, filas.size - n_hot, rng)
+            lon[filas], lat[filas] = pts[:, 0], pts[:, 1]
+        return lon, lat
+
+
+def _catalogo_categorizado():
+    """Catálogo de delitos con la CATEGORIA que asigna la App."""
+    catalogo = pd.DataFrame(CATALOGO_DELITOS, columns=["delito", "categoria_delito", "peso"])
+    catalogo = categorizar_dummy(catalogo)
+    catalogo["peso"] = catalogo["peso"] / catalogo["peso"].sum()
+    return catalogo
+
+
+def _nombres_colonia(alcaldia_idx, lon, lat):
+    """Asigna un nombre de colonia estable según la celda geográfica del evento."""
+    cx = np.floor((lon + 99.4) / TAMANO_CELDA_COLONIA).astype(np.int64)
+    cy = np.floor((lat - 19.0) / TAMANO_CELDA_COLONIA).astype(np.int64)
+    clave = (alcaldia_idx.astype(np.int64) * 1_000_000) + cx * 1_000 + cy
+    claves_unicas, inversa = np.unique(clave, return_inverse=True)
+
+    nombres = []
+    for c in claves_unicas:
+        a, resto = divmod(int(c), 1_000_000)
+        x, y = divmod(resto, 1_000)
+        h = (x * 7919 + y * 104729 + a * 31) % (len(RAICES_COLONIA) * len(PREFIJOS_COLONIA))
+        raiz = RAICES_COLONIA[h % len(RAICES_COLONIA)]
+        prefijo = PREFIJOS_COLONIA[h // len(RAICES_COLONIA)]
+        # Sufijo de sección para distinguir colonias homónimas en la misma alcaldía
+        seccion = (x + y) % 4
+        sufijo = ["", " SECCION II", " SECCION III", " NORTE"][seccion]
+        nombres.append(f"{prefijo}{raiz}{sufijo}")
+    return np.array(nombres, dtype=object)[inversa]
+
+
+def _fechas(n, categorias_violentas, rng):
+    """Fechas de hecho con pesos por año y por día de la semana."""
+    anios = np.array(sorted(PESOS_ANIO))
+    pesos_anio = np.array([PESOS_ANIO[a] for a in anios], dtype=float)
+    pesos_anio /= pesos_anio.sum()
+
+    fechas = np.empty(n, dtype="datetime64[D]")
+    pendientes = np.arange(n)
+    p_general = np.array(PESOS_DIA_GENERAL) / max(PESOS_DIA_GENERAL)
+    p_violento = np.array(PESOS_DIA_VIOLENTO) / max(PESOS_DIA_VIOLENTO)
+
+    # Rechazo vectorizado: se aceptan fechas según el peso de su día de la semana
+    while pendientes.size:
+        anio = rng.choice(anios, size=pendientes.size, p=pesos_anio)
+        inicio = (anio - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+        dias_en_anio = np.where((anio % 4 == 0) & ((anio % 100 != 0) | (anio % 400 == 0)), 366, 365)
+        candidato = inicio + (rng.random(pendientes.size) * dias_en_anio).astype("timedelta64[D]")
+        dow = (candidato.astype(np.int64) - 4) % 7  # 1970-01-01 fue jueves
+        p = np.where(categorias_violentas[pendientes], p_violento[dow], p_general[dow])
+        acepta = rng.random(pendientes.size) < p
+        fechas[pendientes[acepta]] = candidato[acepta]
+        pendientes = pendientes[~acepta]
+    return fechas
+
+
+def generar_eventos(n, modelo, rng, catalogo=None, frac_alcaldia_erronea=0.005):
+    """
+    Genera 'n' eventos sintéticos con columnas canónicas:
+    latitud, longitud, alcaldia_hecho, colonia_catalogo, delito,
+    categoria_delito, CATEGORIA, fecha_hecho, hora, minuto, segundo.
+    """
+    if catalogo is None:
+        catalogo = _catalogo_categorizado()
+
+    # 1. Delito (y su categoría)
+    idx_delito = rng.choice(len(catalogo), size=n, p=catalogo["peso"].to_numpy())
+    categoria = catalogo["CATEGORIA"].to_numpy()[idx_delito]
+
+    # 2. Alcaldía y coordenadas dentro del polígono
+    alcaldia_idx = rng.choice(len(modelo.nombres), size=n, p=modelo.pesos)
+    lon, lat = modelo.muestrear(alcaldia_idx, rng)
+    nombres_alcaldia = np.array(modelo.nombres, dtype=object)
+    colonia = _nombres_colonia(alcaldia_idx, lon, lat)
+
+    # Una fracción pequeña queda registrada en una alcaldía vecina (error de captura)
+    etiqueta_idx = alcaldia_idx.copy()
+    erroneos = rng.random(n) < frac_alcaldia_erronea
+    etiqueta_idx[erroneos] = rng.integers(0, len(modelo.nombres), size=int(erroneos.sum()))
+
+    # 3. Fecha y hora
+    fechas = _fechas(n, categoria != "No violentos", rng)
+    hora = np.empty(n, dtype=np.int8)
+    for cat, perfil in PERFIL_HORA_CATEGORIA.items():
+        filas = np.flatnonzero(categoria == cat)
+        if filas.size:
+            p = np.array(perfil) / np.sum(perfil)
+            hora[filas] = rng.choice(24, size=filas.size, p=p)
+    # Las horas "redondas" (picos de 00:00 y 12:00) se registran con minuto 0
+    minuto = np.where((hora == 0) | (hora == 12), 0, rng.integers(0, 60, size=n)).astype(np.int8)
+    segundo = np.zeros(n, dtype=np.int8)
+
+    return pd.DataFrame({
+        "latitud": np.round(lat, 6),
+        "longitud": np.round(lon, 6),
+        "alcaldia_hecho": nombres_alcaldia[etiqueta_idx],
+        "colonia_catalogo": colonia,
+        "delito": catalogo["delito"].to_numpy()[idx_delito],
+        "categoria_delito": catalogo["categoria_delito"].to_numpy()[idx_delito],
+        "CATEGORIA": categoria,
+        "fecha_hecho": pd.to_datetime(fechas),
+        "hora": hora,
+        "minuto": minuto,
+        "segundo": segundo,
+    })
+
+
+# --- Conversión a cada esquema de salida ---
+
+def a_esquema_hour_crimes(eventos):
+    """Esquema de 'hour_crimes_optimized.csv' (ver 'load_data')."""
+    fecha = eventos["fecha_hecho"]
+    return pd.DataFrame({
+        "latitud_N": eventos["latitud"],
+        "longitud_N": eventos["longitud"],
+        "alcaldia_hecho_N": eventos["alcaldia_hecho"],
+        "colonia_catalogo_N": eventos["colonia_catalogo"],
+        "delito_N": eventos["delito"],
+        "fecha_hecho": fecha.dt.strftime("%Y-%m-%d"),
+        "anio_hecho_N": fecha.dt.year,
+        "mes_hecho_N": fecha.dt.month,
+        "hora": eventos["hora"].astype(float),
+        "dia_semana": np.array(DIAS_ES, dtype=object)[fecha.dt.dayofweek.to_numpy()],
+        "CATEGORIA": eventos["CATEGORIA"],
+    })
+
+
+def a_esquema_streamlit(eventos):
+    """Esquema de 'df_streamlit.csv' (ver 'process_dummy_data')."""
+    fecha = eventos["fecha_hecho"]
+    return pd.DataFrame({
+        "fecha_hecho": fecha.dt.strftime("%Y-%m-%d"),
+        "anio_hecho_i": fecha.dt.year,
+        "mes_hecho_num": fecha.dt.month,
+        "hora_hecho_h": eventos["hora"],
+        "dia_semana": np.array(DIAS_EN, dtype=object)[fecha.dt.dayofweek.to_numpy()],
+        "categoria_delito": eventos["categoria_delito"],
+        "alcaldia_hecho": eventos["alcaldia_hecho"],
+        "colonia_catalogo": eventos["colonia_catalogo"],
+        "latitud": eventos["latitud"],
+        "longitud": eventos["longitud"],
+    })
+
+
+def a_esquema_crudo(eventos, rng, frac_sin_dato=0.03):
+    """
+    Esquema de producción (entrada de 'preparedata'). Una fracción de las
+    coordenadas se reemplaza por "SIN DATO" para ejercitar 'imputar_centroides'.
+    """
+    n = len(eventos)
+    fecha = eventos["fecha_hecho"]
+    retraso = pd.to_timedelta(np.minimum(rng.exponential(4.0, size=n), 365).astype(int), unit="D")
+    fecha_inicio = fecha + retraso
+    hora_hecho = (
+        eventos["hora"].astype(str).str.zfill(2) + ":"
+        + eventos["minuto"].astype(str).str.zfill(2) + ":00"
+    )
+    hora_inicio = pd.Series(rng.integers(0, 24, size=n)).astype(str).str.zfill(2) + ":" + \
+        pd.Series(rng.integers(0, 60, size=n)).astype(str).str.zfill(2) + ":00"
+
+    lat = eventos["latitud"].map("{:.6f}".format).to_numpy(dtype=object)
+    lon = eventos["longitud"].map("{:.6f}".format).to_numpy(dtype=object)
+    sin_dato = rng.random(n) < frac_sin_dato
+    lat[sin_dato] = "SIN DATO"
+    lon[sin_dato] = "SIN DATO"
+
+    alcaldia = eventos["alcaldia_hecho"]
+    return pd.DataFrame({
+        "anio_inicio": fecha_inicio.dt.year,
+        "mes_inicio": np.array(MESES_ES, dtype=object)[fecha_inicio.dt.month.to_numpy() - 1],
+        "fecha_inicio": fecha_inicio.dt.strftime("%Y-%m-%d"),
+        "hora_inicio": hora_inicio.to_numpy(),
+        "anio_hecho": fecha.dt.year,
+        "mes_hecho": np.array(MESES_ES, dtype=object)[fecha.dt.month.to_numpy() - 1],
+        "fecha_hecho": fecha.dt.strftime("%Y-%m-%d"),
+        "hora_hecho": hora_hecho.to_numpy(),
+        "delito": eventos["delito"],
+        "categoria": eventos["categoria_delito"],
+        "competencia": "FUERO COMUN",
+        "fiscalia": "INVESTIGACION EN " + alcaldia,
+        "agencia": "AGENCIA " + alcaldia.str[:3],
+        "unidad_investigacion": "UI-" + pd.Series(rng.integers(1, 4, size=n)).astype(str).to_numpy() + "CD",
+        "colonia_hecho": eventos["colonia_catalogo"],
+        "colonia_catalogo": eventos["colonia_catalogo"],
+        "alcaldia_hecho": alcaldia,
+        "alcaldia_catalogo": alcaldia,
+        "municipio_hecho": alcaldia,
+        "sector": "SECTOR " + pd.Series(rng.integers(1, 9, size=n)).astype(str).to_numpy(),
+        "latitud": lat,
+        "longitud": lon,
+    })
+
+
+def generar_archivo(salida, filas, esquema="hour_crimes", semilla=42,
+                    geojson_path="limite-de-las-alcaldias.json",
+                    tamano_chunk=1_000_000, frac_sin_dato=0.03):
+    """
+    Escribe 'filas' eventos sintéticos en 'salida' por bloques, de modo que
+    la memoria se mantiene acotada aun para 50M de registros.
+    """
+    if esquema not in ("hour_crimes", "streamlit", "crudo"):
+        raise ValueError(f"Esquema desconocido: {esquema}")
+
+    rng = np.random.default_rng(semilla)
+    modelo = ModeloEspacial(geojson_path, rng)
+    catalogo = _catalogo_categorizado()
+
+    escritas = 0
+    inicio = time.perf_counter()
+    with open(salida, "w", encoding="utf-8", newline="") as f:
+        while escritas < filas:
+            n = min(tamano_chunk, filas - escritas)
+            eventos = generar_eventos(n, modelo, rng, catalogo)
+            if esquema == "hour_crimes":
+                bloque = a_esquema_hour_crimes(eventos)
+            elif esquema == "streamlit":
+                bloque = a_esquema_streamlit(eventos)
+            else:
+                bloque = a_esquema_crudo(eventos, rng, frac_sin_dato)
+            bloque.to_csv(f, header=(escritas == 0), index=False)
+            escritas += n
+            print(f"  {escritas:,}/{filas:,} registros ({time.perf_counter() - inicio:.1f} s)")
+    return salida
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de delitos CDMX")
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Número de registros a generar")
+    parser.add_argument("--esquema", choices=["hour_crimes", "streamlit", "crudo"], default="hour_crimes")
+    parser.add_argument("--salida", default=None, help="Archivo CSV de salida")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--geojson", default="limite-de-las-alcaldias.json")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="Registros por bloque escrito")
+    parser.add_argument("--frac-sin-dato", type=float, default=0.03,
+                        help="Fracción de coordenadas 'SIN DATO' (solo esquema crudo)")
+    args = parser.parse_args()
+
+    salida = args.salida or {
+        "hour_crimes": "hour_crimes_optimized.csv",
+        "streamlit": "df_streamlit.csv",
+        "crudo": "df_delitos_final_para_proyecto.csv",
+    }[args.esquema]
+
+    print(f"Generando {args.filas:,} registros con esquema '{args.esquema}' en {salida}...")
+    generar_archivo(salida, args.filas, args.esquema, args.semilla, args.geojson,
+                    args.chunk, args.frac_sin_dato)
+
+
+if __name__ == "__main__":
+    main()
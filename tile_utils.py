@@ -0,0 +1,301 @@
+# tile_utils.py
+# -----------------------------------------------------------------------------
+# PIRÁMIDE DE TESELAS PRECALCULADAS (PUNTOS Y DENSIDAD)
+# -----------------------------------------------------------------------------
+# Construye, fuera de línea, teselas XYZ (Web Mercator) a partir del dataset
+# de eventos, particionadas por CATEGORIA y año:
+#   tiles/densidad/{categoria}/{anio}/{z}/{x}/{y}.png
+#   tiles/puntos/{categoria}/{anio}/{z}/{x}/{y}.json
+# e incluye un servidor estático local para que el navegador descargue solo
+# las teselas visibles al zoom actual. Todo funciona sin conexión a internet.
+#
+# Uso:
+#   python tile_utils.py construir --datos hour_crimes_optimized.csv
+#   python tile_utils.py servir
+# -----------------------------------------------------------------------------
+import argparse
+import functools
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from config import ESCALA_ROJOS, TILES_DIR, TILES_HOST, TILES_PUERTO, TILES_URL_PUBLICA
+
+TAMANO_TESELA = 256
+PIXELES_POR_CELDA = 4          # Resolución de la rejilla de densidad (64x64 por tesela)
+ZOOMS_DENSIDAD = range(10, 16)
+ZOOMS_PUNTOS = range(13, 17)
+MAX_PUNTOS_TESELA = 4000
+TODAS = "TODAS"
+TODOS = "TODOS"
+
+
+# --- Utilidades de proyección (Web Mercator / XYZ) ---
+
+def lonlat_a_pixel(lon, lat, zoom):
+    """Convierte lon/lat a coordenadas de pixel globales al zoom indicado."""
+    escala = TAMANO_TESELA * (2 ** zoom)
+    lat_rad = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * escala
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * escala
+    return x, y
+
+
+def slug(texto):
+    """Nombre seguro para directorios/URLs (ej. 'Homicidio/Feminicidio' -> 'homicidio-feminicidio')."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r"[^a-z0-9]+", "-", texto).strip("-")
+
+
+def colorear_densidad(valores):
+    """
+    Aplica la paleta ESCALA_ROJOS a valores normalizados en [0, 1] y devuelve
+    un arreglo RGBA uint8. La transparencia crece con la densidad.
+    """
+    colores = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in ESCALA_ROJOS], dtype=np.float64)
+    posiciones = np.linspace(0, 1, len(colores))
+    v = np.clip(np.asarray(valores, dtype=np.float64), 0, 1)
+
+    rgba = np.empty(v.shape + (4,), dtype=np.uint8)
+    for canal in range(3):
+        rgba[..., canal] = np.interp(v, posiciones, colores[:, canal]).astype(np.uint8)
+    rgba[..., 3] = np.where(v > 0, (60 + 160 * np.sqrt(v)), 0).astype(np.uint8)
+    return rgba
+
+
+def _suavizar(rejilla, pasadas=2):
+    """Suavizado gaussiano aproximado con un núcleo binomial separable [1,4,6,4,1]/16."""
+    pesos = np.array([1, 4, 6, 4, 1], dtype=np.float64) / 16.0
+    margen = 2 * pasadas
+    # Margen de ceros para que np.roll no mezcle bordes opuestos
+    salida = np.pad(rejilla.astype(np.float64), margen)
+    for _ in range(pasadas):
+        for eje in (0, 1):
+            acumulado = np.zeros_like(salida)
+            for desplazamiento, w in zip(range(-2, 3), pesos):
+                acumulado += w * np.roll(salida, desplazamiento, axis=eje)
+            salida = acumulado
+    return salida[margen:-margen, margen:-margen]
+
+
+def url_tiles(tipo, categoria=TODAS, anio=TODOS, base_url=TILES_URL_PUBLICA):
+    """Plantilla XYZ de la capa ('densidad' o 'puntos') para una partición."""
+    extension = "png" if tipo == "densidad" else "json"
+    return f"{base_url}/{tipo}/{slug(categoria)}/{slug(anio)}/{{z}}/{{x}}/{{y}}.{extension}"
+
+
+def leer_manifiesto(directorio=TILES_DIR):
+    """Devuelve el manifiesto de la pirámide o None si no se ha construido."""
+    ruta = os.path.join(directorio, "manifest.json")
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- Construcción de la pirámide ---
+
+def _escribir_densidad(px, py, zoom, zoom_base, carpeta):
+    """Rasteriza la densidad de una partición a un zoom y la corta en teselas PNG."""
+    from PIL import Image
+
+    factor = 2 ** (zoom_base - zoom)
+    x = px / factor
+    y = py / factor
+    tx0, ty0 = int(x.min() // TAMANO_TESELA), int(y.min() // TAMANO_TESELA)
+    tx1, ty1 = int(x.max() // TAMANO_TESELA), int(y.max() // TAMANO_TESELA)
+
+    celdas_por_tesela = TAMANO_TESELA // PIXELES_POR_CELDA
+    ancho = (tx1 - tx0 + 1) * celdas_por_tesela
+    alto = (ty1 - ty0 + 1) * celdas_por_tesela
+
+    # Rejilla global de la partición: el suavizado no deja costuras entre teselas
+    cx = ((x - tx0 * TAMANO_TESELA) // PIXELES_POR_CELDA).astype(np.int64)
+    cy = ((y - ty0 * TAMANO_TESELA) // PIXELES_POR_CELDA).astype(np.int64)
+    rejilla = np.bincount(cy * ancho + cx, minlength=alto * ancho).reshape(alto, ancho)
+    densidad = _suavizar(rejilla)
+
+    positivos = densidad[densidad > 1e-3]
+    if positivos.size == 0:
+        return 0
+    referencia = np.log1p(np.percentile(positivos, 99.5))
+    normalizada = np.log1p(densidad) / referencia
+    normalizada[densidad <= 1e-3] = 0
+
+    escritas = 0
+    for ty in range(ty0, ty1 + 1):
+        for tx in range(tx0, tx1 + 1):
+            r0 = (ty - ty0) * celdas_por_tesela
+            c0 = (tx - tx0) * celdas_por_tesela
+            bloque = normalizada[r0:r0 + celdas_por_tesela, c0:c0 + celdas_por_tesela]
+            if not bloque.any():
+                continue
+            imagen = Image.fromarray(colorear_densidad(bloque), mode="RGBA")
+            imagen = imagen.resize((TAMANO_TESELA, TAMANO_TESELA), Image.BILINEAR)
+            ruta = os.path.join(carpeta, str(zoom), str(tx))
+            os.makedirs(ruta, exist_ok=True)
+            imagen.save(os.path.join(ruta, f"{ty}.png"))
+            escritas += 1
+    return escritas
+
+
+def _escribir_puntos(px, py, zoom, zoom_base, carpeta, max_puntos):
+    """
+    Escribe una tesela JSON por celda XYZ con las coordenadas locales (0-255)
+    de sus eventos: {"n": total, "p": [x0, y0, x1, y1, ...]}. Los eventos ya
+    vienen en orden aleatorio, así que truncar a 'max_puntos' es una muestra.
+    """
+    factor = 2 ** (zoom_base - zoom)
+    x = px / factor
+    y = py / factor
+    tx = (x // TAMANO_TESELA).astype(np.int64)
+    ty = (y // TAMANO_TESELA).astype(np.int64)
+    lx = (x - tx * TAMANO_TESELA).astype(np.int16)
+    ly = (y - ty * TAMANO_TESELA).astype(np.int16)
+
+    clave = tx * (2 ** 24) + ty
+    orden = np.argsort(clave, kind="stable")
+    claves, inicios, conteos = np.unique(clave[orden], return_index=True, return_counts=True)
+
+    for k, inicio, n in zip(claves, inicios, conteos):
+        filas = orden[inicio:inicio + min(n, max_puntos)]
+        pares = np.column_stack([lx[filas], ly[filas]]).ravel().tolist()
+        ruta = os.path.join(carpeta, str(zoom), str(int(k // (2 ** 24))))
+        os.makedirs(ruta, exist_ok=True)
+        with open(os.path.join(ruta, f"{int(k % (2 ** 24))}.json"), "w") as f:
+            json.dump({"n": int(n), "p": pares}, f, separators=(",", ":"))
+    return len(claves)
+
+
+def construir_piramide(df, salida=TILES_DIR, zooms_densidad=ZOOMS_DENSIDAD,
+                       zooms_puntos=ZOOMS_PUNTOS, max_puntos=MAX_PUNTOS_TESELA,
+                       semilla=42):
+    """
+    Construye la pirámide de teselas de densidad y puntos para cada partición
+    (CATEGORIA x año, incluyendo TODAS/TODOS) y escribe 'manifest.json'.
+    """
+    datos = df[["latitud", "longitud", "CATEGORIA", "anio_hecho"]].dropna()
+    # Orden aleatorio fijo: truncar una tesela equivale a muestrear
+    datos = datos.iloc[np.random.default_rng(semilla).permutation(len(datos))]
+
+    zoom_base = max(list(zooms_densidad) + list(zooms_puntos))
+    px, py = lonlat_a_pixel(datos["longitud"].to_numpy(), datos["latitud"].to_numpy(), zoom_base)
+    categorias = datos["CATEGORIA"].astype(str).to_numpy()
+    anios = datos["anio_hecho"].astype(int).to_numpy()
+
+    lista_categorias = [TODAS] + sorted(set(categorias))
+    lista_anios = [TODOS] + sorted(set(anios.tolist()))
+
+    inicio = time.perf_counter()
+    total = 0
+    for categoria in lista_categorias:
+        mascara_cat = np.ones(len(datos), dtype=bool) if categoria == TODAS else (categorias == categoria)
+        for anio in lista_anios:
+            mascara = mascara_cat if anio == TODOS else (mascara_cat & (anios == anio))
+            if not mascara.any():
+                continue
+            px_p, py_p = px[mascara], py[mascara]
+            base = os.path.join(salida, "{tipo}", slug(categoria), slug(anio))
+            for z in zooms_densidad:
+                total += _escribir_densidad(px_p, py_p, z, zoom_base, base.format(tipo="densidad"))
+            for z in zooms_puntos:
+                total += _escribir_puntos(px_p, py_p, z, zoom_base, base.format(tipo="puntos"), max_puntos)
+            print(f"  {categoria} / {anio}: {int(mascara.sum()):,} eventos "
+                  f"({total:,} teselas, {time.perf_counter() - inicio:.1f} s)")
+
+    manifiesto = {
+        "generado": datetime.now().isoformat(timespec="seconds"),
+        "registros": int(len(datos)),
+        "categorias": lista_categorias,
+        "anios": [a if a == TODOS else int(a) for a in lista_anios],
+        "zooms_densidad": list(zooms_densidad),
+        "zooms_puntos": list(zooms_puntos),
+        "teselas": total,
+    }
+    os.makedirs(salida, exist_ok=True)
+    with open(os.path.join(salida, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    return manifiesto
+
+
+# --- Servidor estático local ---
+
+class _ManejadorTeselas(SimpleHTTPRequestHandler):
+    """Sirve archivos del directorio de teselas con CORS y caché de navegador."""
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=86400")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+_SERVIDOR = None
+_SERVIDOR_LOCK = threading.Lock()
+
+
+def iniciar_servidor_tiles(directorio=TILES_DIR, host=TILES_HOST, puerto=TILES_PUERTO):
+    """
+    Inicia (una sola vez por proceso) un servidor HTTP estático en segundo
+    plano para el directorio de teselas. Si el puerto ya está ocupado se
+    asume que otro proceso del dashboard ya lo sirve.
+    """
+    global _SERVIDOR
+    with _SERVIDOR_LOCK:
+        if _SERVIDOR is not None:
+            return _SERVIDOR
+        manejador = functools.partial(_ManejadorTeselas, directory=os.path.abspath(directorio))
+        try:
+            _SERVIDOR = ThreadingHTTPServer((host, puerto), manejador)
+        except OSError:
+            return None
+        hilo = threading.Thread(target=_SERVIDOR.serve_forever, name="servidor-teselas", daemon=True)
+        hilo.start()
+        return _SERVIDOR
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pirámide de teselas de delitos CDMX")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_construir = sub.add_parser("construir", help="Genera las teselas a partir del dataset")
+    p_construir.add_argument("--datos", default="hour_crimes_optimized.csv")
+    p_construir.add_argument("--salida", default=TILES_DIR)
+    p_construir.add_argument("--max-puntos", type=int, default=MAX_PUNTOS_TESELA)
+
+    p_servir = sub.add_parser("servir", help="Sirve el directorio de teselas por HTTP")
+    p_servir.add_argument("--directorio", default=TILES_DIR)
+    p_servir.add_argument("--host", default=TILES_HOST)
+    p_servir.add_argument("--puerto", type=int, default=TILES_PUERTO)
+
+    args = parser.parse_args()
+    if args.comando == "construir":
+        import data_loader
+        df = data_loader.load_data(args.datos)
+        print(f"Construyendo teselas para {len(df):,} eventos en '{args.salida}'...")
+        manifiesto = construir_piramide(df, args.salida, max_puntos=args.max_puntos)
+        print(f"Listo: {manifiesto['teselas']:,} teselas.")
+    else:
+        servidor = iniciar_servidor_tiles(args.directorio, args.host, args.puerto)
+        if servidor is None:
+            raise SystemExit(f"El puerto {args.puerto} ya está en uso.")
+        print(f"Sirviendo '{args.directorio}' en http://{args.host}:{args.puerto} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()